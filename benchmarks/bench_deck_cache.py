@@ -0,0 +1,78 @@
+"""Compare cold and warm deck loads with the compiled deck cache.
+
+Usage::
+
+    python -m benchmarks.bench_deck_cache --deck res/ListBook/WordBook.json --repeat 5
+
+The deck is copied to a temporary directory so the real deck's cache is left
+alone. The script times a plain JSON parse, a cold start (JSON parse plus
+writing the cache) and warm starts that read the cache.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from scripts.deck_cache import cache_path, load_deck
+
+
+def _timed(label: str, func: Callable[[], object], results: Dict[str, float]) -> None:
+    start = time.perf_counter()
+    func()
+    results[label] = time.perf_counter() - start
+
+
+def _parse_json(path: Path) -> object:
+    with path.open("r", encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def run(deck: Path, repeat: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / deck.name
+        shutil.copyfile(deck, path)
+        results: Dict[str, float] = {}
+        _timed("json only", lambda: _parse_json(path), results)
+        _timed("cold start", lambda: load_deck(path), results)
+        warm: Dict[str, float] = {}
+        for index in range(repeat):
+            _timed(f"warm start #{index + 1}", lambda: load_deck(path), warm)
+        results["warm start (best)"] = min(warm.values())
+        cache_size = cache_path(path).stat().st_size
+
+    print(f"\n== {deck.name} ({deck.stat().st_size:,} bytes, cache {cache_size:,} bytes) ==")
+    for label, seconds in results.items():
+        print(f"{label:<20} | {seconds * 1000:10.1f} ms")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--deck",
+        type=Path,
+        default=ROOT / "res" / "ListBook" / "WordBook.json",
+        help="Deck JSON file to load.",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="Number of warm loads to time.",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    run(args.deck, args.repeat)
@@ -0,0 +1,193 @@
+"""Compare the card state backends with the original whole-file JSONL path.
+
+Usage::
+
+    python -m benchmarks.bench_state_backends --sizes 10000 100000 1000000
+
+For each collection size the script bulk loads synthetic card states into a
+fresh store and then times the operations the app performs: a cold open of
+the store, single-card upserts as produced by grading, point lookups and a
+full read of one user's cards. The ``rewrite`` baseline is the state
+handling ``FileWork_v3`` had before the log-structured store: every save
+reads the whole ``card_state.jsonl`` and writes it back, and every lookup
+parses the whole file. It runs ``--baseline-updates`` upserts and lookups
+instead of ``--updates`` because each one costs a full pass.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from scripts.sqlite_store import SQLiteStateStore
+from scripts.state_store import CardStateStore
+
+
+def _key(record):
+    return record["user_id"], record["card_id"]
+
+
+class RewriteJSONLStore:
+    """The original ``FileWork_v3`` JSONL path, kept as a baseline.
+
+    ``put``/``put_many`` follow the old ``save_card_state(s)``: read every
+    line, update the matching records and rewrite the file. ``get`` and
+    ``records_for_user`` parse the whole file like the old
+    ``_index_states_for_user``.
+    """
+
+    def __init__(self, path: Path, *, key: Callable[[Mapping[str, Any]], Any]) -> None:
+        self.path = Path(path)
+        self._key = key
+
+    def _read(self) -> List[Dict[str, Any]]:
+        if not self.path.exists():
+            return []
+        with self.path.open("r", encoding="utf-8") as handle:
+            return [json.loads(line) for line in handle if line.strip()]
+
+    def _write(self, records: Iterable[Mapping[str, Any]]) -> None:
+        with self.path.open("w", encoding="utf-8") as handle:
+            for record in records:
+                handle.write(json.dumps(record, ensure_ascii=False))
+                handle.write("\n")
+
+    def put(self, record: Mapping[str, Any]) -> None:
+        records = self._read()
+        key = self._key(record)
+        for stored in records:
+            if self._key(stored) == key:
+                stored.update(record)
+                break
+        else:
+            records.append(dict(record))
+        self._write(records)
+
+    def put_many(self, records: Iterable[Mapping[str, Any]]) -> None:
+        merged = {self._key(record): record for record in self._read()}
+        merged.update((self._key(record), dict(record)) for record in records)
+        self._write(merged.values())
+
+    def get(self, key: Any) -> Optional[Dict[str, Any]]:
+        found = None
+        for record in self._read():
+            if self._key(record) == key:
+                found = record
+        return found
+
+    def records_for_user(self, user_id: str) -> List[Dict[str, Any]]:
+        return [record for record in self._read() if record["user_id"] == user_id]
+
+    def close(self) -> None:
+        pass
+
+
+def _make_record(index: int, user_id: str = "default") -> Dict[str, object]:
+    card_id = f"card-{index:07d}"
+    return {
+        "user_id": user_id,
+        "card_id": card_id,
+        "word": card_id,
+        "state": {
+            "definition:": "[n.] placeholder definition",
+            "example:": "[1] Placeholder example sentence.",
+            "card_id": card_id,
+            "stability": round(random.uniform(0.1, 50.0), 2),
+            "difficulty": round(random.uniform(1.0, 10.0), 2),
+            "due_at": f"2024-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}T00:00:00Z",
+            "last_review_at": None,
+            "lapses": random.randint(0, 5),
+            "repetitions": random.randint(0, 20),
+            "new_buried": False,
+            "history": [],
+            "phase": random.choice(["new", "learning", "review", "relearning"]),
+            "same_day_success": 0,
+        },
+    }
+
+
+def _timed(label: str, func: Callable[[], object], results: Dict[str, float]) -> None:
+    start = time.perf_counter()
+    func()
+    results[label] = time.perf_counter() - start
+
+
+def _run_backend(factory: Callable[[], object], size: int, updates: int) -> Dict[str, float]:
+    results: Dict[str, float] = {}
+    store = factory()
+    records = [_make_record(index) for index in range(size)]
+    _timed("bulk load", lambda: store.put_many(records), results)
+    if isinstance(store, CardStateStore):
+        store.compact()
+    store.close()
+
+    store = factory()
+    lookup_keys = [("default", f"card-{random.randrange(size):07d}") for _ in range(updates)]
+    _timed("cold open + lookup", lambda: store.get(lookup_keys[0]), results)
+    _timed(
+        f"{updates} upserts",
+        lambda: [store.put(_make_record(random.randrange(size))) for _ in range(updates)],
+        results,
+    )
+    _timed(f"{updates} lookups", lambda: [store.get(key) for key in lookup_keys], results)
+    _timed("read user", lambda: store.records_for_user("default"), results)
+    if isinstance(store, CardStateStore):
+        store.background = False
+    store.close()
+    return results
+
+
+def run(sizes: List[int], updates: int, baseline_updates: int) -> None:
+    random.seed(0)
+    for size in sizes:
+        print(f"\n== {size:,} cards ==")
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp_path = Path(tmp)
+            backends = {
+                "rewrite": (lambda: RewriteJSONLStore(tmp_path / "baseline.jsonl", key=_key), baseline_updates),
+                "jsonl": (lambda: CardStateStore(tmp_path / "card_state.jsonl", key=_key), updates),
+                "sqlite": (lambda: SQLiteStateStore(tmp_path / "card_state.sqlite3", key=_key), updates),
+            }
+            for name, (factory, count) in backends.items():
+                results = _run_backend(factory, size, count)
+                for label, seconds in results.items():
+                    print(f"{name:>7} | {label:<20} | {seconds * 1000:10.1f} ms")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        type=int,
+        default=[10_000, 100_000, 1_000_000],
+        help="Collection sizes to benchmark.",
+    )
+    parser.add_argument(
+        "--updates",
+        type=int,
+        default=500,
+        help="Number of single-card upserts and lookups per size.",
+    )
+    parser.add_argument(
+        "--baseline-updates",
+        type=int,
+        default=20,
+        help="Number of single-card upserts and lookups for the rewrite baseline.",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    run(args.sizes, args.updates, args.baseline_updates)
@@ -2,25 +2,53 @@
 
 from __future__ import annotations
 
+import itertools
 import json
+import math
 import os
+import tempfile
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
+from functools import partial
 from pathlib import Path
-from typing import Any, Dict, Iterable, Iterator, List, Mapping, MutableMapping, Optional, Sequence, Tuple
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, MutableMapping, Optional, Sequence, Tuple, Union
+from urllib.parse import quote
 
 import pandas as pd
 
-from scripts.card_state import CardState
+from scripts.card_state import CardState, set_history_loader
+from scripts.card_table import TABLE_FILENAME, CardTable
+from scripts.content_store import REF_KEY, SOURCE_KEY, ContentStore, is_reference_entry
+from scripts.deck_cache import load_deck
+from scripts.deck_catalog import DeckCatalog, build_entry, entry_info
+from scripts.history_store import CardHistoryStore
+from scripts.log_codec import encode_log_record, expand_log_record, is_delta_record
+from scripts.review_log import SegmentedReviewLog, TimeBound
+from scripts.sqlite_store import SQLiteStateStore
+from scripts.state_index import StateOffsetIndex
+from scripts.state_store import DEFAULT_RUN_SIZE, CardStateStore, register_store
 
 # ---------------------------------------------------------------------------
 # Paths and constants
 # ---------------------------------------------------------------------------
 REPO_ROOT = Path(os.getcwd())
 DECK_ROOTS = [Path("res/ListBook"), Path("res/Vocab List")]
+DECK_CATALOG_FILE = Path("res/deck_catalog.json")
+DECK_CACHE_ENABLED = True
+DECK_LOAD_WORKERS = 4
 STATE_ROOT = Path("res/state")
 STATE_FILE = STATE_ROOT / "card_state.jsonl"
+HISTORY_FILENAME = "card_history.jsonl"
+PROGRESS_FILENAME = "deck_progress.jsonl"
+PROGRESS_FIELDS = ("CurrentNum", "Completed", "Learning")
+STATE_DB_FILE = STATE_ROOT / "card_state.sqlite3"
+STATE_BACKENDS = ("jsonl", "sqlite")
+STATE_BACKEND = "jsonl"
 LOG_ROOT = Path("res/log")
 LOG_FILE = LOG_ROOT / "review_log.jsonl"
+LOG_FORMATS = ("full", "delta")
+LOG_FORMAT = "delta"
 DEFAULT_USER_ID = "default"
 
 # ---------------------------------------------------------------------------
@@ -50,17 +78,19 @@ def _write_json(path: Path, payload: Mapping[str, Any]) -> None:
         json.dump(payload, handle, indent=4, ensure_ascii=False)
 
 
-def _read_jsonl(path: Path) -> List[Dict[str, Any]]:
+def _iter_jsonl(path: Path) -> Iterator[Dict[str, Any]]:
     if not path.exists():
-        return []
-    records: List[Dict[str, Any]] = []
+        return
     with path.open("r", encoding="utf-8") as handle:
         for line in handle:
             line = line.strip()
             if not line:
                 continue
-            records.append(json.loads(line))
-    return records
+            yield json.loads(line)
+
+
+def _read_jsonl(path: Path) -> List[Dict[str, Any]]:
+    return list(_iter_jsonl(path))
 
 
 def _write_jsonl(path: Path, records: Iterable[Mapping[str, Any]]) -> None:
@@ -71,6 +101,12 @@ def _write_jsonl(path: Path, records: Iterable[Mapping[str, Any]]) -> None:
             handle.write("\n")
 
 
+def _append_jsonl(path: Path, records: Iterable[Mapping[str, Any]]) -> None:
+    _ensure_parent(path)
+    with path.open("a", encoding="utf-8") as handle:
+        handle.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records))
+
+
 def _state_record_key(record: Mapping[str, Any]) -> Tuple[str, str]:
     user_id = _normalise_user_id(record.get("user_id"))
     card_id = record.get("card_id") or record.get("word")
@@ -121,8 +157,99 @@ def _record_to_state(record: Mapping[str, Any]) -> CardState:
 # Deck import helpers
 # ---------------------------------------------------------------------------
 
-def importFromExcel(path: str) -> List[str]:
-    """Import Excel vocabulary lists from *path* into JSON decks."""
+EXCEL_COLUMNS = ("Vocab:", "Translation:", "Example sentence:")
+EMPTY_LIST_ENTRY = ["This vocab list is empty", "N/A", "N/A"]
+
+
+def _excel_cell(value: Any) -> str:
+    """Render a worksheet cell the same way on the pandas and openpyxl paths.
+
+    Blank cells become ``""`` and whole numbers are written without the
+    ``.0`` pandas gives them in float columns, so ``1`` reads as ``"1"``
+    whichever path loaded it.
+    """
+
+    if value is None or value is pd.NaT:
+        return ""
+    if isinstance(value, float):
+        if math.isnan(value):
+            return ""
+        if value.is_integer():
+            return str(int(value))
+    return str(value)
+
+
+def _excel_column(frame: pd.DataFrame, name: str, stop: int) -> List[str]:
+    if name not in frame:
+        return [""] * stop
+    return [_excel_cell(value) for value in frame[name].iloc[:stop].tolist()]
+
+
+def _read_excel_frame(path: Path) -> List[List[str]]:
+    # keep_default_na=False: words such as "NA" or "null" stay words and
+    # blank cells read as "".
+    frame = pd.read_excel(
+        path, usecols=lambda column: column in EXCEL_COLUMNS, keep_default_na=False
+    )
+    if EXCEL_COLUMNS[0] in frame:
+        vocab = frame[EXCEL_COLUMNS[0]]
+        missing = (vocab.isin([""]) | vocab.isna()).to_numpy()
+        stop = int(missing.argmax()) if missing.any() else len(missing)
+    else:
+        stop = 0
+    columns = [_excel_column(frame, name, stop) for name in EXCEL_COLUMNS]
+    return [list(row) for row in zip(*columns)]
+
+
+def _read_excel_streaming(path: Path) -> List[List[str]]:
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.active
+        header = next(sheet.iter_rows(max_row=1, values_only=True), ())
+        positions = [header.index(name) if name in header else None for name in EXCEL_COLUMNS]
+        if positions[0] is None:
+            return []
+        # Only the three vocab columns are parsed, never the rest of each row
+        last_column = max(index for index in positions if index is not None) + 1
+        rows = sheet.iter_rows(min_row=2, max_col=last_column, values_only=True)
+        entries: List[List[str]] = []
+        for row in rows:
+            cells = [
+                _excel_cell(row[index]) if index is not None and index < len(row) else ""
+                for index in positions
+            ]
+            if not cells[0]:
+                break
+            entries.append(cells)
+        return entries
+    finally:
+        workbook.close()
+
+
+def read_excel_vocab(path: Path, *, streaming: bool = False) -> List[List[str]]:
+    """Return the ``[vocab, translation, example]`` rows of one workbook.
+
+    Rows stop at the first empty ``Vocab:`` cell. Cells are rendered by
+    :func:`_excel_cell`, so both readers return identical rows. By default
+    the sheet is read with pandas and the three columns are sliced as whole
+    arrays. With *streaming* the sheet is read row by row through openpyxl's
+    read-only mode, which never holds the whole sheet and stops reading at
+    the first empty vocab.
+    """
+
+    path = Path(path)
+    return _read_excel_streaming(path) if streaming else _read_excel_frame(path)
+
+
+def importFromExcel(path: str, *, jobs: Optional[int] = None, streaming: bool = False) -> List[str]:
+    """Import Excel vocabulary lists from *path* into JSON decks.
+
+    Workbooks are read concurrently on *jobs* worker processes (default one
+    per CPU; ``1`` reads them in this process). *streaming* is passed on to
+    :func:`read_excel_vocab` for very large sheets.
+    """
 
     folder_path = REPO_ROOT / path
     if not folder_path.exists():
@@ -136,25 +263,18 @@ def importFromExcel(path: str) -> List[str]:
             raise FileNotFoundError(f"Vocab list file '{name}' is missing")
         vocab_paths.append(file_path)
 
-    vocab_lists: List[List[Sequence[str]]] = []
-    for excel_path in vocab_paths:
-        frame = pd.read_excel(excel_path)
-        entries: List[Sequence[str]] = []
-        for _, row in frame.iterrows():
-            vocab = row.get("Vocab:")
-            if pd.isna(vocab):
-                break
-            translation = row.get("Translation:")
-            example = row.get("Example sentence:")
-            entries.append([str(vocab), str(translation or ""), str(example or "")])
-        if not entries:
-            entries.append(["This vocab list is empty", "N/A", "N/A"])
-        vocab_lists.append(entries)
+    read = partial(read_excel_vocab, streaming=streaming)
+    jobs = min(jobs or os.cpu_count() or 1, len(vocab_paths))
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            vocab_lists = list(executor.map(read, vocab_paths))
+    else:
+        vocab_lists = list(map(read, vocab_paths))
 
     created_files: List[str] = []
     for vocab_list, name in zip(vocab_lists, excel_names):
         output = Path("res/Vocab List") / f"{name}.json"
-        writeIntoJson(vocab_list, str(output))
+        writeIntoJson(vocab_list or [EMPTY_LIST_ENTRY], str(output))
         created_files.append(str(output))
     return created_files
 
@@ -182,49 +302,297 @@ def _ensure_card_state(entry: Any) -> CardState:
     raise TypeError("Unsupported vocab entry format")
 
 
-def writeIntoJson(vocab_list: Iterable[Any], path: str) -> None:
-    vocab: Dict[str, Any] = {}
-    for entry in vocab_list:
-        card_state = _ensure_card_state(entry)
-        vocab[card_state.word] = {
-            "definition": card_state.definition,
-            "example": card_state.example,
-            "card_id": card_state.card_id,
-        }
-    deck_path = Path(path)
-    deck_info = {
+def _deck_entry(card_state: CardState) -> Dict[str, Any]:
+    """Return the deck JSON value stored under *card_state*'s word."""
+
+    return {
+        "definition": card_state.definition,
+        "example": card_state.example,
+        "card_id": card_state.card_id,
+    }
+
+
+def _deck_header(deck_path: Path) -> Dict[str, Any]:
+    """Return the ``"XXX"`` header of a new deck at *deck_path*."""
+
+    return {
         "Name": deck_path.stem,
         "CurrentNum": 1,
         "Completed": False,
         "Learning": False,
     }
-    vocab["XXX"] = deck_info
+
+
+def writeIntoJson(vocab_list: Iterable[Any], path: str) -> None:
+    vocab: Dict[str, Any] = {}
+    for entry in vocab_list:
+        card_state = _ensure_card_state(entry)
+        vocab[card_state.word] = _deck_entry(card_state)
+    deck_path = Path(path)
+    vocab["XXX"] = _deck_header(deck_path)
+    _write_json(deck_path, vocab)
+
+
+def write_reference_deck(card_ids: Iterable[str], path: str, *, source: str) -> None:
+    """Write a deck at *path* whose cards are references into *source*.
+
+    Each card is stored as ``{"ref": card_id}`` under its word and the
+    header records the source deck, so the deck holds ids only and its
+    content is resolved through the shared :class:`ContentStore`.
+    """
+
+    store = get_content_store()
+    deck_path = Path(path)
+    vocab: Dict[str, Any] = {"XXX": {**_deck_header(deck_path), SOURCE_KEY: Path(source).as_posix()}}
+    for card_id in card_ids:
+        word = store.word(source, card_id)
+        if word is None:
+            raise KeyError(f"Card '{card_id}' not found in {source}")
+        vocab[word] = {REF_KEY: str(card_id)}
     _write_json(deck_path, vocab)
 
 
+_CONTENT_STORE: Optional[ContentStore] = None
+
+
+def get_content_store() -> ContentStore:
+    """Return the content store shared by every reference deck."""
+
+    global _CONTENT_STORE
+    if _CONTENT_STORE is None:
+        _CONTENT_STORE = ContentStore(use_cache=DECK_CACHE_ENABLED)
+    return _CONTENT_STORE
+
+
+def deck_card_ids(path: str) -> List[str]:
+    """Return the card ids of the deck at *path* in deck order."""
+
+    return get_content_store().card_ids(path)
+
+
+def _deck_source(payload: Mapping[str, Any]) -> Optional[str]:
+    header = payload.get("XXX")
+    return header.get(SOURCE_KEY) if isinstance(header, Mapping) else None
+
+
+def _entry_to_state(word: str, data: Any, source: Optional[str]) -> CardState:
+    """Build the card for one deck entry, resolving ``{"ref": ...}`` entries."""
+
+    if not isinstance(data, Mapping):
+        return CardState.from_storage(word, {})
+    if not is_reference_entry(data):
+        return CardState.from_storage(word, data)
+    if source is None:
+        raise ValueError(f"Card '{word}' is a reference but its deck names no {SOURCE_KEY}")
+    card_id = str(data[REF_KEY])
+    content = get_content_store().get(source, card_id) or {}
+    overrides = {key: value for key, value in data.items() if key != REF_KEY}
+    return CardState.from_storage(word, {**content, **overrides, "card_id": card_id})
+
+
 def _load_vocab_payload(path: str) -> MutableMapping[str, Any]:
-    return _load_json(Path(path))
+    return load_deck(Path(path), use_cache=DECK_CACHE_ENABLED)
 
 
 def _write_vocab_payload(path: str, payload: Mapping[str, Any]) -> None:
     _write_json(Path(path), payload)
 
 
-def _index_states_for_user(user_id: Optional[str]) -> Dict[Tuple[str, str], CardState]:
-    records = _read_jsonl(STATE_FILE)
+def _index_records(records: Iterable[Mapping[str, Any]]) -> Dict[Tuple[str, str], CardState]:
     indexed: Dict[Tuple[str, str], CardState] = {}
     for record in records:
-        state = _record_to_state(record)
-        key_user = _normalise_user_id(user_id)
-        record_user = _normalise_user_id(state.user_id)
-        if user_id is not None and record_user != key_user:
-            continue
-        card_key = state.card_id or state.word
-        indexed[(record_user, card_key)] = state
+        _index_state(indexed, _record_to_state(record))
+    return indexed
+
+
+def _index_state(indexed: MutableMapping[Tuple[str, str], CardState], state: CardState) -> None:
+    record_user = _normalise_user_id(state.user_id)
+    card_key = state.card_id or state.word
+    indexed[(record_user, card_key)] = state
+    if state.word != card_key:
+        # Word alias so decks that only know the word still resolve.
         indexed[(record_user, state.word)] = state
+
+
+def _detach_state(state: CardState) -> CardState:
+    """Copy a cached state so callers can mutate it without touching the cache."""
+
+    return state.replace(
+        history=[dict(entry) for entry in state.history],
+        custom_data=dict(state.custom_data),
+        metadata=dict(state.metadata),
+    )
+
+
+class _StateCache:
+    """Process-wide index of parsed :class:`CardState` objects per user.
+
+    Each user's index is tied to the store it was built from and to that
+    store's version token, which changes when the backing file's mtime or
+    size changes. Writes made through :func:`save_card_state` and
+    :func:`save_card_states` update it in place.
+    """
+
+    def __init__(self) -> None:
+        self.entries: Dict[str, Tuple[Any, Any, Dict[Tuple[str, str], CardState]]] = {}
+        self.lock = threading.RLock()
+
+    def cached(self, user_key: str) -> Optional[Dict[Tuple[str, str], CardState]]:
+        """Return the user's index as cached, without checking freshness."""
+
+        with self.lock:
+            entry = self.entries.get(user_key)
+            return entry[2] if entry is not None else None
+
+    def user_index(self, user_key: str) -> Dict[Tuple[str, str], CardState]:
+        store = _get_state_store(user_key)
+        with self.lock:
+            version = store.version
+            entry = self.entries.get(user_key)
+            if entry is not None and entry[0] is store and entry[1] == version:
+                return entry[2]
+            indexed = _index_records(store.records_for_user(user_key))
+            self.entries[user_key] = (store, version, indexed)
+            return indexed
+
+    def peek(self, user_key: str) -> Optional[Dict[Tuple[str, str], CardState]]:
+        """Return the user's index only if it has already been loaded."""
+
+        with self.lock:
+            entry = self.entries.get(user_key)
+            if entry is None or entry[0] is not _get_state_store(user_key):
+                return None
+        return self.user_index(user_key)
+
+    def is_current(self, store: Any, user_key: str) -> bool:
+        with self.lock:
+            entry = self.entries.get(user_key)
+            return entry is not None and entry[0] is store and entry[1] == store.version
+
+    def discard(self, user_key: str) -> None:
+        with self.lock:
+            self.entries.pop(user_key, None)
+
+    def apply(self, store: Any, user_key: str, states: Iterable[CardState]) -> None:
+        """Record *states* just written to *store* and adopt its new version.
+
+        The user's index is copied rather than mutated so readers iterating
+        it on another thread never see it change.
+        """
+
+        with self.lock:
+            entry = self.entries.get(user_key)
+            if entry is None:
+                return
+            indexed = dict(entry[2])
+            for state in states:
+                _index_state(indexed, state)
+            self.entries[user_key] = (store, store.version, indexed)
+
+
+_STATE_CACHE = _StateCache()
+
+
+def _index_states_for_user(user_id: Optional[str]) -> Dict[Tuple[str, str], CardState]:
+    """Return the cached ``(user_id, card_id|word)`` index for *user_id*.
+
+    ``None`` resolves to :data:`DEFAULT_USER_ID`. The returned states are
+    shared with the cache and must be copied before they are modified.
+    """
+
+    return _STATE_CACHE.user_index(_normalise_user_id(user_id))
+
+
+_OFFSET_INDEXES: Dict[Path, StateOffsetIndex] = {}
+
+
+def _get_offset_index(user_id: Optional[str] = None) -> StateOffsetIndex:
+    path = _user_state_file(user_id)
+    index = _OFFSET_INDEXES.get(path)
+    if index is None:
+        _migrate_legacy_state()
+        index = StateOffsetIndex(path, key=_state_record_key)
+        _OFFSET_INDEXES[path] = index
+    return index
+
+
+PendingStates = Callable[[Iterable[str], str], Mapping[str, CardState]]
+_PENDING_STATES: Optional[PendingStates] = None
+
+
+def set_pending_state_source(source: Optional[PendingStates]) -> None:
+    """Register where deck reads find states that are not written yet.
+
+    *source* is called as ``source(names, user_id)`` and returns the pending
+    states whose card id or word is in *names*. :mod:`scripts.persistence_queue`
+    registers its default write-behind queue when it is imported.
+    """
+
+    global _PENDING_STATES
+    _PENDING_STATES = source
+
+
+def _fetch_deck_states(
+    user_id: Optional[str],
+    card_ids: Iterable[str],
+    words: Iterable[str] = (),
+) -> Dict[Tuple[str, str], CardState]:
+    """Return stored states for just *card_ids* and *words*.
+
+    The result is keyed by ``(user_id, card_id)`` and ``(user_id, word)`` like
+    the full index, but only holds the requested cards. A warm process-wide
+    cache answers directly; otherwise the JSONL backend reads the records
+    through the byte-offset index and SQLite through its primary key and
+    word indexes. States still waiting in the write-behind queue (see
+    :func:`set_pending_state_source`) replace the stored ones.
+    """
+
+    key_user = _normalise_user_id(user_id)
+    requested = {(key_user, str(card_id)) for card_id in card_ids if card_id}
+    requested.update((key_user, str(word)) for word in words if word)
+    if not requested:
+        return {}
+    cached = _STATE_CACHE.peek(key_user)
+    if cached is not None:
+        indexed = {key: cached[key] for key in requested if key in cached}
+    else:
+        store = _get_state_store(key_user)
+        if isinstance(store, CardStateStore):
+            records = _get_offset_index(key_user).lookup(requested).values()
+        else:
+            records = store.find(key_user, [key[1] for key in requested])
+        indexed = _index_records(records)
+    if _PENDING_STATES is not None:
+        pending = _PENDING_STATES([key[1] for key in requested], key_user)
+        indexed.update(((key_user, name), state) for name, state in pending.items())
     return indexed
 
 
+def load_card_states_for(
+    card_ids: Iterable[str],
+    words: Iterable[str] = (),
+    *,
+    user_id: Optional[str] = None,
+) -> Dict[str, CardState]:
+    """Load stored states for the given card ids and words only.
+
+    The result maps each requested id or word that has a stored state to a
+    copy of that state, so the cost scales with the request rather than with
+    the size of the state store.
+    """
+
+    card_ids = list(card_ids)
+    words = list(words)
+    indexed = _fetch_deck_states(user_id, card_ids, words)
+    key_user = _normalise_user_id(user_id)
+    found: Dict[str, CardState] = {}
+    for name in [*card_ids, *words]:
+        state = indexed.get((key_user, str(name)))
+        if state is not None and name not in found:
+            found[str(name)] = _detach_state(state)
+    return found
+
+
 def _resolve_stored_state(
     indexed: Mapping[Tuple[str, str], CardState],
     user_id: Optional[str],
@@ -238,11 +606,29 @@ def _resolve_stored_state(
     return indexed.get(secondary_key)
 
 
+def _merge_stored_states(vocab_list: List[CardState], user_id: Optional[str]) -> None:
+    """Replace deck cards in *vocab_list* with their stored scheduling state."""
+
+    stored_states = _fetch_deck_states(
+        user_id,
+        (card.card_id for card in vocab_list),
+        (card.word for card in vocab_list),
+    )
+    for position, card_state in enumerate(vocab_list):
+        stored = _resolve_stored_state(stored_states, user_id, card_state)
+        if stored:
+            stored = _detach_state(stored)
+            stored.definition = card_state.definition or stored.definition
+            stored.example = card_state.example or stored.example
+            stored.word = card_state.word or stored.word
+            vocab_list[position] = stored
+
+
 def readFromJson(path: str, user_id: Optional[str] = None):
     payload = _load_vocab_payload(path)
+    source = _deck_source(payload)
     vocab_list: List[CardState] = []
     list_info = None
-    stored_states = _index_states_for_user(user_id)
 
     for word, data in payload.items():
         if word == "XXX":
@@ -253,21 +639,119 @@ def readFromJson(path: str, user_id: Optional[str] = None):
                 data.get("Learning", False),
             ]
             continue
-        card_state = CardState.from_storage(word, data if isinstance(data, Mapping) else {})
-        if user_id is not None:
-            stored = _resolve_stored_state(stored_states, user_id, card_state)
-        else:
-            stored = _resolve_stored_state(stored_states, DEFAULT_USER_ID, card_state)
-        if stored:
-            stored.definition = card_state.definition or stored.definition
-            stored.example = card_state.example or stored.example
-            stored.word = card_state.word or stored.word
-            card_state = stored
-        vocab_list.append(card_state)
+        vocab_list.append(_entry_to_state(word, data, source))
+
+    _merge_stored_states(vocab_list, user_id)
 
     if list_info is None:
         return vocab_list
-    return vocab_list, list_info
+    return vocab_list, _apply_progress(list_info, path, user_id)
+
+
+_DECK_READ_CHUNK = 1 << 16
+
+
+def _iter_json_object_items(path: Path, chunk_size: Optional[int] = None) -> Iterator[Tuple[str, Any]]:
+    """Yield the top-level ``(key, value)`` pairs of a JSON object file.
+
+    The file is read in chunks and each member is decoded as soon as it is
+    complete, so memory holds one chunk plus the member being decoded.
+    """
+
+    chunk_size = chunk_size or _DECK_READ_CHUNK
+    decoder = json.JSONDecoder()
+    whitespace = " \t\r\n"
+    with path.open("r", encoding="utf-8") as handle:
+        buffer = ""
+        position = 0
+        eof = False
+
+        def fill() -> bool:
+            nonlocal buffer, position, eof
+            chunk = handle.read(chunk_size)
+            if not chunk:
+                eof = True
+                return False
+            buffer = buffer[position:] + chunk
+            position = 0
+            return True
+
+        def skip_whitespace() -> str:
+            nonlocal position
+            while True:
+                while position < len(buffer) and buffer[position] in whitespace:
+                    position += 1
+                if position < len(buffer):
+                    return buffer[position]
+                if not fill():
+                    raise ValueError(f"Unexpected end of deck file: {path}")
+
+        def decode() -> Any:
+            nonlocal position
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if not fill():
+                        raise
+                    continue
+                if end == len(buffer) and not eof and fill():
+                    # A number may continue in the next chunk; decode again.
+                    continue
+                position = end
+                return value
+
+        if skip_whitespace() != "{":
+            raise ValueError(f"Deck file is not a JSON object: {path}")
+        position += 1
+        if skip_whitespace() == "}":
+            return
+        while True:
+            skip_whitespace()
+            key = decode()
+            if skip_whitespace() != ":":
+                raise ValueError(f"Malformed deck file: {path}")
+            position += 1
+            skip_whitespace()
+            yield key, decode()
+            separator = skip_whitespace()
+            position += 1
+            if separator == "}":
+                return
+            if separator != ",":
+                raise ValueError(f"Malformed deck file: {path}")
+
+
+def iter_deck(
+    path: str,
+    user_id: Optional[str] = None,
+    *,
+    batch_size: int = 64,
+) -> Iterator[CardState]:
+    """Yield the cards of the deck at *path* one at a time.
+
+    The deck is parsed incrementally and stored scheduling state is fetched
+    for *batch_size* cards at a time, so the first cards are available
+    without reading the whole deck. Cards come back in deck order and match
+    what :func:`readFromJson` returns; the ``"XXX"`` header is skipped.
+    Reference decks must have their header first, which
+    :func:`write_reference_deck` guarantees.
+    """
+
+    batch: List[CardState] = []
+    source: Optional[str] = None
+    for word, data in _iter_json_object_items(Path(path)):
+        if word == "XXX":
+            source = _deck_source({"XXX": data})
+            continue
+        batch.append(_entry_to_state(word, data, source))
+        if len(batch) >= batch_size:
+            _merge_stored_states(batch, user_id)
+            yield from batch
+            batch = []
+    if batch:
+        _merge_stored_states(batch, user_id)
+        yield from batch
 
 
 def update_card_state(path: str, word_id: str, state: Any) -> None:
@@ -275,15 +759,128 @@ def update_card_state(path: str, word_id: str, state: Any) -> None:
     payload = _load_vocab_payload(path)
     if word_id not in payload:
         raise KeyError(f"Card '{word_id}' not found in {path}")
-    payload[word_id] = card_state.to_storage_dict()
+    entry = card_state.to_storage_dict()
+    if is_reference_entry(payload[word_id]):
+        # Keep the reference; the content stays in the source deck.
+        entry = {REF_KEY: payload[word_id][REF_KEY], **entry}
+        for key in ("definition:", "example:", "card_id"):
+            entry.pop(key, None)
+    payload[word_id] = entry
     _write_vocab_payload(path, payload)
 
 
-def getListInfo(path: str):
-    result = readFromJson(path)
-    if isinstance(result, tuple):
-        return result[1]
-    return None
+_DECK_CATALOGS: Dict[Path, DeckCatalog] = {}
+
+
+def _get_deck_catalog() -> DeckCatalog:
+    catalog = _DECK_CATALOGS.get(DECK_CATALOG_FILE)
+    if catalog is None:
+        catalog = _DECK_CATALOGS[DECK_CATALOG_FILE] = DeckCatalog(DECK_CATALOG_FILE)
+    return catalog
+
+
+def get_deck_entry(path: str) -> Optional[Dict[str, Any]]:
+    """Return the catalog entry (header, card count, hash) for the deck at *path*.
+
+    The deck is only parsed when it changed since the entry was built.
+    """
+
+    return _get_deck_catalog().get(path)
+
+
+def _progress_record_key(record: Mapping[str, Any]) -> Tuple[str, str]:
+    return _normalise_user_id(record.get("user_id")), str(record["deck"])
+
+
+def _get_progress_store(user_id: Optional[str]) -> CardStateStore:
+    path = _user_state_file(user_id).with_name(PROGRESS_FILENAME)
+    key = ("progress", path)
+    store = _STATE_STORES.get(key)
+    if store is None:
+        store = CardStateStore(path, key=_progress_record_key)
+        _STATE_STORES[key] = register_store(store)
+    return store
+
+
+def get_deck_progress(path: str, user_id: Optional[str] = None) -> Dict[str, Any]:
+    """Return *user_id*'s ``CurrentNum``/``Completed``/``Learning`` for a deck.
+
+    Progress recorded with :func:`writeListInfo` wins over the deck header.
+    """
+
+    info = getListInfo(path, user_id) or [None, 1, False, False]
+    return dict(zip(PROGRESS_FIELDS, info[1:]))
+
+
+def _apply_progress(info: List[Any], path: str, user_id: Optional[str]) -> List[Any]:
+    user_key = _normalise_user_id(user_id)
+    record = _get_progress_store(user_key).get((user_key, Path(path).as_posix()))
+    if record is not None:
+        for position, field in enumerate(PROGRESS_FIELDS, start=1):
+            if field in record:
+                info[position] = record[field]
+    return info
+
+
+def getListInfo(path: str, user_id: Optional[str] = None):
+    entry = get_deck_entry(path)
+    if entry is None:
+        return None
+    return _apply_progress(entry_info(entry), path, user_id)
+
+
+def iter_list_infos(
+    paths: Sequence[str],
+    user_id: Optional[str] = None,
+    *,
+    executor: Optional[Executor] = None,
+) -> Iterator[Tuple[int, Optional[List[Any]]]]:
+    """Yield ``(position, info)`` for the decks in *paths* as each becomes ready.
+
+    Decks with an up-to-date catalog entry come first, in order. The rest
+    are parsed concurrently and yielded as they finish, so a caller can show
+    every deck it already knows while the others load. *executor* defaults
+    to a thread pool of :data:`DECK_LOAD_WORKERS`; a process pool also works,
+    since the workers only run :func:`~scripts.deck_catalog.build_entry`.
+    ``info`` is ``None`` for a deck that is missing or unreadable.
+    """
+
+    catalog = _get_deck_catalog()
+    paths = [str(path) for path in paths]
+    stale = {path.as_posix() for path in catalog.stale(paths)}
+    pending: List[int] = []
+    for position, path in enumerate(paths):
+        if Path(path).as_posix() in stale:
+            pending.append(position)
+        else:
+            yield position, getListInfo(path, user_id)
+    if not pending:
+        return
+
+    own_executor = executor is None
+    if executor is None:
+        executor = ThreadPoolExecutor(
+            max_workers=min(DECK_LOAD_WORKERS, len(pending)), thread_name_prefix="deck-load"
+        )
+    stored = False
+    try:
+        futures = {executor.submit(build_entry, Path(paths[position])): position for position in pending}
+        for future in as_completed(futures):
+            position = futures[future]
+            path = paths[position]
+            try:
+                entry = future.result()
+            except (OSError, ValueError):
+                yield position, None
+                continue
+            catalog.store(path, entry, save=False)
+            stored = True
+            yield position, _apply_progress(entry_info(entry), path, user_id)
+    finally:
+        if own_executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+        if stored:
+            catalog.save()
 
 
 def writeListInfo(
@@ -292,26 +889,38 @@ def writeListInfo(
     currentNum: Optional[int] = None,
     completed: Optional[bool] = None,
     learning: Optional[bool] = None,
+    *,
+    user_id: Optional[str] = None,
 ) -> None:
-    data = _load_vocab_payload(path)
-    deck_info = data.setdefault(
-        "XXX",
-        {
-            "Name": Path(path).stem,
-            "CurrentNum": 1,
-            "Completed": False,
-            "Learning": False,
-        },
-    )
+    """Record *user_id*'s progress through a deck.
+
+    Progress goes to the user's ``deck_progress.jsonl`` as one appended line,
+    and nothing is written when it is unchanged. Only renaming the deck
+    rewrites the deck file's header.
+    """
+
     if name is not None:
+        data = _load_vocab_payload(path)
+        deck_info = data.setdefault(
+            "XXX",
+            {"Name": Path(path).stem, "CurrentNum": 1, "Completed": False, "Learning": False},
+        )
         deck_info["Name"] = name
-    if currentNum is not None:
-        deck_info["CurrentNum"] = currentNum
-    if completed is not None:
-        deck_info["Completed"] = completed
-    if learning is not None:
-        deck_info["Learning"] = learning
-    _write_vocab_payload(path, data)
+        _write_vocab_payload(path, data)
+    changes = {
+        field: value
+        for field, value in zip(PROGRESS_FIELDS, (currentNum, completed, learning))
+        if value is not None
+    }
+    if not changes:
+        return
+    user_key = _normalise_user_id(user_id)
+    deck_key = Path(path).as_posix()
+    store = _get_progress_store(user_key)
+    current = store.get((user_key, deck_key)) or {}
+    if all(current.get(field) == value for field, value in changes.items()):
+        return
+    store.put({**current, "user_id": user_key, "deck": deck_key, **changes})
 
 
 def checkExist(path: str) -> bool:
@@ -319,56 +928,282 @@ def checkExist(path: str) -> bool:
 
 
 def getFileName() -> List[str]:
-    files: List[str] = []
-    for root in DECK_ROOTS[1:]:
-        if not root.exists():
-            continue
-        for file_path in root.iterdir():
-            if file_path.is_file() and file_path.suffix == ".json":
-                files.append(str(file_path))
-    return files
+    """List the user deck files from the deck catalog.
+
+    The catalog rescans a deck directory only when its mtime changed (see
+    :meth:`DeckCatalog.list_decks`). Deck entries are brought up to date on
+    demand by :func:`getListInfo` and :func:`iter_list_infos`, so listing
+    never parses a deck.
+    """
+
+    return _get_deck_catalog().list_decks(DECK_ROOTS[1:])
 
 
 # ---------------------------------------------------------------------------
 # Card state store (JSONL)
 # ---------------------------------------------------------------------------
 
+_STATE_STORES: Dict[Tuple[str, Path], Any] = {}
+_LEGACY_CHECKED: set = set()
+_REVIEW_LOGS: Dict[Path, SegmentedReviewLog] = {}
+_HISTORY_STORES: Dict[Path, CardHistoryStore] = {}
+
+
+def configure_state_backend(backend: str = "jsonl", *, path: Optional[Path] = None) -> None:
+    """Select the storage backend used for card states and review logs.
+
+    ``"jsonl"`` keeps append-only ``card_state.jsonl``/``review_log.jsonl``
+    files sharded per user. ``"sqlite"`` stores both in
+    :data:`STATE_DB_FILE`, or in *path* when given.
+    """
+
+    global STATE_BACKEND, STATE_DB_FILE
+    if backend not in STATE_BACKENDS:
+        raise ValueError(f"Unknown state backend '{backend}', expected one of {STATE_BACKENDS}")
+    STATE_BACKEND = backend
+    if backend == "sqlite" and path is not None:
+        STATE_DB_FILE = Path(path)
+
+
+def _shard_name(user_key: str) -> str:
+    name = quote(user_key, safe="-_@")
+    if name in (".", ".."):
+        name = name.replace(".", "%2E")
+    return name
+
+
+def _user_state_file(user_id: Optional[str]) -> Path:
+    """Return ``<STATE_FILE dir>/<user>/card_state.jsonl`` for *user_id*."""
+
+    return STATE_FILE.parent / _shard_name(_normalise_user_id(user_id)) / STATE_FILE.name
+
+
+def _user_log_file(user_id: Optional[str]) -> Path:
+    return LOG_FILE.parent / _shard_name(_normalise_user_id(user_id)) / LOG_FILE.name
+
+
+def _review_log_at(directory: Path) -> SegmentedReviewLog:
+    log = _REVIEW_LOGS.get(directory)
+    if log is None:
+        log = SegmentedReviewLog(
+            directory, stem=LOG_FILE.stem, legacy_path=directory / LOG_FILE.name
+        )
+        _REVIEW_LOGS[directory] = log
+    return log
+
+
+def _get_review_log(user_id: Optional[str]) -> SegmentedReviewLog:
+    """Return the segmented review log stored in *user_id*'s log shard.
+
+    An unsegmented ``<user>/review_log.jsonl`` left by an earlier layout is
+    split into monthly segments on first use.
+    """
+
+    return _review_log_at(_user_log_file(user_id).parent)
+
+
+def _iter_log_shards() -> Iterator[SegmentedReviewLog]:
+    if LOG_FILE.parent.exists():
+        for directory in sorted(LOG_FILE.parent.iterdir()):
+            if directory.is_dir():
+                yield _review_log_at(directory)
+
+
+def _iter_shard_files(template: Path) -> Iterator[Path]:
+    if template.parent.exists():
+        yield from sorted(template.parent.glob(f"*/{template.name}"))
+
+
+def _get_state_store(user_id: Optional[str] = None) -> Union[CardStateStore, SQLiteStateStore]:
+    """Return the shared store holding *user_id*'s card states.
+
+    The JSONL backend keeps one store per user shard; the SQLite backend
+    serves every user from one database.
+    """
+
+    if STATE_BACKEND == "sqlite":
+        key = ("sqlite", STATE_DB_FILE)
+    else:
+        _migrate_legacy_state()
+        key = ("jsonl", _user_state_file(user_id))
+    store = _STATE_STORES.get(key)
+    if store is None:
+        if STATE_BACKEND == "sqlite":
+            store = SQLiteStateStore(STATE_DB_FILE, key=_state_record_key)
+        else:
+            store = CardStateStore(key[1], key=_state_record_key)
+        _STATE_STORES[key] = register_store(store)
+    return store
+
+
 def load_card_states(user_id: Optional[str] = None) -> Dict[str, CardState]:
     indexed = _index_states_for_user(user_id)
     key_user = _normalise_user_id(user_id)
     return {
-        card_key: state
+        card_key: _detach_state(state)
         for (user_key, card_key), state in indexed.items()
         if user_key == key_user
     }
 
 
+def _write_state_records(user_key: str, records: List[Dict[str, Any]]) -> None:
+    store = _get_state_store(user_key)
+    cache_current = _STATE_CACHE.is_current(store, user_key)
+    store.put_many(records)
+    if cache_current:
+        _STATE_CACHE.apply(store, user_key, [_record_to_state(record) for record in records])
+
+
+def _get_history_store(user_id: Optional[str]) -> CardHistoryStore:
+    path = _user_state_file(user_id).with_name(HISTORY_FILENAME)
+    store = _HISTORY_STORES.get(path)
+    if store is None:
+        store = _HISTORY_STORES[path] = CardHistoryStore(path)
+    return store
+
+
+def _load_archived_history(state: CardState) -> List[Dict[str, Any]]:
+    return _get_history_store(state.user_id).get(state.card_id or state.word)
+
+
+set_history_loader(_load_archived_history)
+
+
+def _archive_history(states: Iterable[CardState], user_id: Optional[str]) -> List[CardState]:
+    """Move history beyond the recent window of *states* to the history store.
+
+    Returns the states to write: trimmed copies where history was moved, the
+    caller's objects otherwise. Runs before the states are written so a
+    stored ``history_offset`` never points past the archived entries.
+    """
+
+    runs: Dict[str, List[Tuple[str, int, List[Dict[str, Any]]]]] = {}
+    kept: List[CardState] = []
+    for state in states:
+        trimmed = state.replace()
+        start, spilled = trimmed.trim_history()
+        if spilled:
+            state = trimmed
+            user_key = _normalise_user_id(user_id or state.user_id)
+            runs.setdefault(user_key, []).append((state.card_id or state.word, start, spilled))
+        kept.append(state)
+    for user_key, user_runs in runs.items():
+        _get_history_store(user_key).extend_many(user_runs)
+    return kept
+
+
 def save_card_state(state: CardState, *, user_id: Optional[str] = None) -> CardState:
+    (state,) = _archive_history([state], user_id)
     record = _state_to_record(state, user_id=user_id)
-    records = _read_jsonl(STATE_FILE)
-    key = _state_record_key(record)
-    updated = False
-    for stored in records:
-        if _state_record_key(stored) == key:
-            stored.update(record)
-            updated = True
-            break
-    if not updated:
-        records.append(record)
-    _write_jsonl(STATE_FILE, records)
+    _write_state_records(record["user_id"], [record])
     return _record_to_state(record)
 
 
 def save_card_states(states: Iterable[CardState], *, user_id: Optional[str] = None) -> None:
-    records = _read_jsonl(STATE_FILE)
-    record_map = {_state_record_key(record): record for record in records}
+    states = _archive_history(states, user_id)
+    by_user: Dict[str, List[Dict[str, Any]]] = {}
     for state in states:
         record = _state_to_record(state, user_id=user_id)
-        record_map[_state_record_key(record)] = record
-    _write_jsonl(STATE_FILE, record_map.values())
+        by_user.setdefault(record["user_id"], []).append(record)
+    for user_key, records in by_user.items():
+        _write_state_records(user_key, records)
 
 
-def append_review_log(log_entry: Mapping[str, Any]) -> Dict[str, Any]:
+def bulk_save_card_states(
+    states: Iterable[CardState],
+    *,
+    user_id: Optional[str] = None,
+    presorted: bool = False,
+    run_size: int = DEFAULT_RUN_SIZE,
+) -> int:
+    """Upsert a large stream of states for one user with bounded memory.
+
+    Unlike :func:`save_card_states`, *states* may be a generator of any
+    length: the JSONL backend merges them into the user's state log in one
+    streaming pass (see :meth:`CardStateStore.bulk_upsert`) and SQLite
+    receives them in chunks of *run_size*. Every state is stored under
+    *user_id* (default :data:`DEFAULT_USER_ID`). Set *presorted* when the
+    states are already ordered by ``card_id`` to skip the external sort.
+    Returns the number of states written.
+    """
+
+    user_key = _normalise_user_id(user_id)
+    written = 0
+
+    def chunks() -> Iterator[List[Dict[str, Any]]]:
+        nonlocal written
+        iterator = iter(states)
+        while True:
+            chunk = list(itertools.islice(iterator, max(int(run_size), 1)))
+            if not chunk:
+                return
+            chunk = _archive_history(chunk, user_key)
+            written += len(chunk)
+            yield [_state_to_record(state, user_id=user_key) for state in chunk]
+
+    store = _get_state_store(user_key)
+    if isinstance(store, CardStateStore):
+        store.bulk_upsert(
+            (record for chunk in chunks() for record in chunk),
+            presorted=presorted,
+            run_size=run_size,
+        )
+    else:
+        for chunk in chunks():
+            store.put_many(chunk)
+    _STATE_CACHE.discard(user_key)
+    return written
+
+
+def load_card_history(card_id: str, *, user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Return the complete review history of *card_id*, oldest entry first."""
+
+    found = load_card_states_for([card_id], user_id=user_id)
+    state = found.get(card_id)
+    if state is None:
+        return _get_history_store(user_id).get(card_id)
+    return state.full_history()
+
+
+def compact_card_states() -> None:
+    """Rewrite every open state log so it holds a single record per card."""
+
+    for store in list(_STATE_STORES.values()):
+        store.compact()
+
+
+def export_card_table(user_id: Optional[str] = None, *, save: bool = True) -> CardTable:
+    """Return *user_id*'s card states as a columnar :class:`CardTable`.
+
+    The table is stored as ``card_table.npz`` in the user's state directory.
+    With the JSONL backend an existing snapshot is refreshed from the bytes
+    appended to the state log since it was written; SQLite rebuilds it from
+    the user's rows.
+    """
+
+    key_user = _normalise_user_id(user_id)
+    store = _get_state_store(key_user)
+    if isinstance(store, CardStateStore):
+        table_path = _user_state_file(key_user).with_name(TABLE_FILENAME)
+        table = CardTable()
+        if table_path.exists():
+            try:
+                table = CardTable.load(table_path)
+            except (OSError, KeyError, ValueError):
+                table = CardTable()
+        before = (table.source_inode, table.source_offset)
+        table.refresh(store.path)
+        changed = (table.source_inode, table.source_offset) != before
+    else:
+        table_path = STATE_DB_FILE.parent / _shard_name(key_user) / TABLE_FILENAME
+        table = CardTable.from_records(store.records_for_user(key_user))
+        changed = True
+    if save and changed:
+        table.save(table_path)
+    return table
+
+
+def _prepare_log_record(log_entry: Mapping[str, Any]) -> Dict[str, Any]:
     if not isinstance(log_entry, Mapping):
         raise TypeError("log_entry must be a mapping containing card metadata")
     record = dict(log_entry)
@@ -383,17 +1218,202 @@ def append_review_log(log_entry: Mapping[str, Any]) -> Dict[str, Any]:
         record["before_state"] = before.to_storage_dict()
     if isinstance(after, CardState):
         record["after_state"] = after.to_storage_dict()
-    _ensure_parent(LOG_FILE)
-    with LOG_FILE.open("a", encoding="utf-8") as handle:
-        handle.write(json.dumps(record, ensure_ascii=False))
-        handle.write("\n")
+    if LOG_FORMAT == "delta":
+        record = encode_log_record(record)
     return record
 
 
+def append_review_log(log_entry: Mapping[str, Any]) -> Dict[str, Any]:
+    return append_review_logs([log_entry])[0]
+
+
+def append_review_logs(log_entries: Iterable[Mapping[str, Any]]) -> List[Dict[str, Any]]:
+    """Validate and append several review log entries with a single write."""
+
+    records = [_prepare_log_record(entry) for entry in log_entries]
+    if not records:
+        return records
+    if STATE_BACKEND == "sqlite":
+        _get_state_store().append_logs(records)
+        return records
+    by_user: Dict[str, List[Dict[str, Any]]] = {}
+    for record in records:
+        by_user.setdefault(_normalise_user_id(record["user_id"]), []).append(record)
+    for user_key, user_records in by_user.items():
+        _get_review_log(user_key).append(user_records)
+    return records
+
+
+def iter_review_log(
+    user_id: Optional[str] = None,
+    *,
+    card_id: Optional[str] = None,
+    since: TimeBound = None,
+    until: TimeBound = None,
+    expand: bool = False,
+) -> Iterator[Dict[str, Any]]:
+    """Yield *user_id*'s review log entries, optionally filtered.
+
+    Parameters
+    ----------
+    user_id:
+        Owner of the log. Defaults to :data:`DEFAULT_USER_ID`.
+    card_id:
+        Only return entries for this card.
+    since / until:
+        Inclusive ``logged_at`` bounds as datetimes or ISO-8601 strings.
+    expand:
+        Rebuild ``before_state``/``after_state`` for delta encoded entries
+        from the card's current stored content.
+
+    With the JSONL backend only the monthly segments whose index can match
+    the filters are read.
+    """
+
+    user_key = _normalise_user_id(user_id)
+    if STATE_BACKEND == "sqlite":
+        entries = _get_state_store().iter_logs(
+            user_id=user_key, card_id=card_id, since=since, until=until
+        )
+    else:
+        entries = _get_review_log(user_key).query(card_id=card_id, since=since, until=until)
+    if not expand:
+        return entries
+    return _expand_log_entries(user_key, entries)
+
+
+def _expand_log_entries(
+    user_key: str, entries: Iterable[Dict[str, Any]]
+) -> Iterator[Dict[str, Any]]:
+    content: Dict[str, Optional[Dict[str, Any]]] = {}
+    for entry in entries:
+        if not is_delta_record(entry):
+            yield entry
+            continue
+        entry_card = str(entry.get("card_id"))
+        if entry_card not in content:
+            found = load_card_states_for([entry_card], user_id=user_key)
+            state = found.get(entry_card)
+            content[entry_card] = state.to_storage_dict() if state is not None else None
+        yield expand_log_record(entry, content[entry_card])
+
+
+def _expand_log_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+    return next(_expand_log_entries(_normalise_user_id(entry.get("user_id")), [entry]))
+
+
+def convert_review_logs(*, user_id: Optional[str] = None) -> int:
+    """Rewrite stored review log entries in the configured :data:`LOG_FORMAT`.
+
+    Full entries are delta encoded (or delta entries expanded when
+    ``LOG_FORMAT == "full"``). With the JSONL backend every user's segments
+    are rewritten unless *user_id* is given. Returns the number of entries
+    changed.
+    """
+
+    transform = encode_log_record if LOG_FORMAT == "delta" else _expand_log_entry
+    if STATE_BACKEND == "sqlite":
+        return _get_state_store().rewrite_logs(transform)
+    logs = [_get_review_log(user_id)] if user_id is not None else list(_iter_log_shards())
+    return sum(log.rewrite(transform) for log in logs)
+
+
 # ---------------------------------------------------------------------------
 # Migration utilities
 # ---------------------------------------------------------------------------
 
+def migrate_state_to_sqlite(
+    db_path: Optional[Path] = None,
+    *,
+    state_path: Optional[Path] = None,
+    log_path: Optional[Path] = None,
+) -> Tuple[int, int]:
+    """Copy the JSONL state store and review log into a SQLite database.
+
+    Returns the number of state and log lines imported. Call
+    :func:`configure_state_backend` afterwards to start using the database.
+    """
+
+    _migrate_legacy_state()
+    state_paths = [Path(state_path)] if state_path else list(_iter_shard_files(STATE_FILE))
+    store = SQLiteStateStore(Path(db_path or STATE_DB_FILE), key=_state_record_key)
+    state_count = log_count = 0
+    try:
+        for path in state_paths:
+            state_count += store.import_jsonl(path, None)[0]
+        if log_path:
+            log_count += store.import_jsonl(None, Path(log_path))[1]
+        else:
+            for review_log in _iter_log_shards():
+                batch: List[Dict[str, Any]] = []
+                for record in review_log.query():
+                    batch.append(record)
+                    if len(batch) >= 5000:
+                        store.append_logs(batch)
+                        log_count += len(batch)
+                        batch = []
+                store.append_logs(batch)
+                log_count += len(batch)
+    finally:
+        store.close()
+    return state_count, log_count
+
+
+def _migrate_legacy_state() -> None:
+    """Split pre-sharding files the first time the JSONL backend is used."""
+
+    key = (STATE_FILE, LOG_FILE)
+    if key in _LEGACY_CHECKED:
+        return
+    _LEGACY_CHECKED.add(key)
+    if STATE_FILE.exists() or LOG_FILE.exists():
+        migrate_to_sharded_state()
+
+
+def migrate_to_sharded_state(*, batch_size: int = 5000) -> Dict[str, int]:
+    """Split the shared ``card_state.jsonl``/``review_log.jsonl`` per user.
+
+    Records are appended to ``<user>/card_state.jsonl`` and the user's
+    monthly ``<user>/review_log-YYYY-MM.jsonl`` segments next to the original
+    files, which are then
+    renamed with a ``.migrated`` suffix. Records without a ``user_id`` go to
+    the :data:`DEFAULT_USER_ID` shard. Returns the number of state records
+    moved per user.
+    """
+
+    _LEGACY_CHECKED.add((STATE_FILE, LOG_FILE))
+    counts: Dict[str, int] = {}
+    if STATE_FILE.exists():
+        pending: Dict[str, List[Dict[str, Any]]] = {}
+        for record in _iter_jsonl(STATE_FILE):
+            user_key = _state_record_key(record)[0]
+            batch = pending.setdefault(user_key, [])
+            batch.append(record)
+            counts[user_key] = counts.get(user_key, 0) + 1
+            if len(batch) >= batch_size:
+                _get_state_store(user_key).put_many(batch)
+                pending[user_key] = []
+        for user_key, batch in pending.items():
+            _get_state_store(user_key).put_many(batch)
+        STATE_FILE.replace(STATE_FILE.with_name(STATE_FILE.name + ".migrated"))
+        stale_index = STATE_FILE.with_name(STATE_FILE.name + ".idx")
+        if stale_index.exists():
+            stale_index.unlink()
+    if LOG_FILE.exists():
+        pending_logs: Dict[str, List[Dict[str, Any]]] = {}
+        for record in _iter_jsonl(LOG_FILE):
+            user_key = _normalise_user_id(record.get("user_id"))
+            batch = pending_logs.setdefault(user_key, [])
+            batch.append(record)
+            if len(batch) >= batch_size:
+                _get_review_log(user_key).append(batch)
+                pending_logs[user_key] = []
+        for user_key, batch in pending_logs.items():
+            _get_review_log(user_key).append(batch)
+        LOG_FILE.replace(LOG_FILE.with_name(LOG_FILE.name + ".migrated"))
+    return counts
+
+
 def _iter_deck_files(paths: Optional[Iterable[Path]] = None) -> Iterator[Path]:
     roots = list(paths) if paths is not None else DECK_ROOTS
     for root in roots:
@@ -407,48 +1427,145 @@ def _iter_deck_files(paths: Optional[Iterable[Path]] = None) -> Iterator[Path]:
                     yield candidate
 
 
+def _read_deck_entries(path: Path) -> Tuple[Optional[str], List[Tuple[str, Any]]]:
+    """Parse one deck file into its source and card entries (runs in a worker)."""
+
+    payload = _load_json(path)
+    entries = [
+        (word, data)
+        for word, data in payload.items()
+        if word != "XXX" and isinstance(data, Mapping)
+    ]
+    return _deck_source(payload), entries
+
+
+DeckProgress = Callable[[int, int, Path], None]
+
+
 def migrate_decks_to_state_store(
     user_id: Optional[str] = None,
     *,
     default_phase: str = "new",
     default_w_version: Optional[str] = None,
     paths: Optional[Iterable[Path]] = None,
+    jobs: Optional[int] = None,
+    progress: Optional[DeckProgress] = None,
 ) -> List[Path]:
+    """Seed the state store with every card of the deck files.
+
+    Deck files are parsed in parallel and their states are streamed into one
+    :func:`bulk_save_card_states` pass per user as the parsed decks arrive,
+    so the state log is rewritten once however many cards there are and
+    memory does not grow with the number of cards. States of a user other
+    than *user_id* (possible only when it is ``None`` and a deck entry names
+    its own user) wait in a temporary file until that user's pass. When a
+    card appears in several decks, the last deck wins.
+
+    Parameters
+    ----------
+    paths:
+        Deck files or directories to scan. Defaults to :data:`DECK_ROOTS`.
+    jobs:
+        Number of worker processes parsing decks. Defaults to one per CPU;
+        ``1`` parses in this process.
+    progress:
+        Called as ``progress(done, total, deck_path)`` after each deck has
+        been turned into states.
+
+    Returns the deck files that contained cards.
+    """
+
+    deck_paths = list(_iter_deck_files(paths))
+    jobs = min(jobs or os.cpu_count() or 1, len(deck_paths))
+    main_user = _normalise_user_id(user_id)
     updated: List[Path] = []
-    for deck_path in _iter_deck_files(paths):
-        payload = _load_json(deck_path)
-        changed = False
-        for word, data in payload.items():
-            if word == "XXX" or not isinstance(data, Mapping):
-                continue
-            state = CardState.from_storage(word, data)
-            if not state.phase:
-                state.phase = default_phase
-            if state.w_version is None and default_w_version is not None:
-                state.w_version = str(default_w_version)
-            if state.due_at is None and state.phase in {"learning", "review"}:
-                state.due_at = _utc_now()
-            state.user_id = user_id or state.user_id
-            save_card_state(state, user_id=user_id)
-            changed = True
-        if changed:
-            updated.append(deck_path)
+
+    with tempfile.TemporaryDirectory(prefix="deck-migration-") as spool_dir:
+        spools: Dict[str, Any] = {}
+
+        def states() -> Iterator[CardState]:
+            executor = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+            parsed = executor.map(_read_deck_entries, deck_paths) if executor else map(_read_deck_entries, deck_paths)
+            try:
+                for done, (deck_path, (source, entries)) in enumerate(zip(deck_paths, parsed), start=1):
+                    for word, data in entries:
+                        state = _entry_to_state(word, data, source)
+                        if not state.phase:
+                            state.phase = default_phase
+                        if state.w_version is None and default_w_version is not None:
+                            state.w_version = str(default_w_version)
+                        if state.due_at is None and state.phase in {"learning", "review"}:
+                            state.due_at = _utc_now()
+                        state.user_id = user_id or state.user_id
+                        user_key = _normalise_user_id(state.user_id)
+                        if user_key == main_user:
+                            yield state
+                            continue
+                        spool = spools.get(user_key)
+                        if spool is None:
+                            spool = spools[user_key] = open(
+                                Path(spool_dir) / f"{len(spools)}.jsonl", "w+", encoding="utf-8"
+                            )
+                        spool.write(json.dumps(_state_to_record(state, user_id=user_key), ensure_ascii=False))
+                        spool.write("\n")
+                    if entries:
+                        updated.append(deck_path)
+                    if progress is not None:
+                        progress(done, len(deck_paths), deck_path)
+            finally:
+                if executor is not None:
+                    executor.shutdown(cancel_futures=True)
+
+        try:
+            stream = states()
+            first = next(stream, None)
+            if first is not None:
+                bulk_save_card_states(itertools.chain([first], stream), user_id=main_user)
+            for user_key, spool in spools.items():
+                spool.seek(0)
+                bulk_save_card_states(
+                    (_record_to_state(json.loads(line)) for line in spool if line.strip()),
+                    user_id=user_key,
+                )
+        finally:
+            for spool in spools.values():
+                spool.close()
     return updated
 
 
 __all__ = [
     "append_review_log",
+    "append_review_logs",
+    "bulk_save_card_states",
     "checkExist",
+    "compact_card_states",
+    "configure_state_backend",
+    "convert_review_logs",
+    "deck_card_ids",
+    "export_card_table",
     "getFileName",
     "getListInfo",
+    "get_content_store",
+    "get_deck_entry",
+    "get_deck_progress",
     "importFromExcel",
     "is_list_empty",
+    "iter_deck",
+    "iter_list_infos",
+    "iter_review_log",
+    "load_card_history",
     "load_card_states",
+    "load_card_states_for",
     "migrate_decks_to_state_store",
+    "migrate_state_to_sqlite",
+    "migrate_to_sharded_state",
     "readFromJson",
+    "read_excel_vocab",
     "save_card_state",
     "save_card_states",
+    "set_pending_state_source",
     "update_card_state",
     "writeIntoJson",
     "writeListInfo",
+    "write_reference_deck",
 ]
@@ -2,11 +2,12 @@ import flet as ft
 import scripts.FlashCardSet_v5 as CardSet
 import time
 import os
+import threading
 import scripts.ListWork_v3 as lw
 import scripts.FileWork_v3 as fw
 import scripts.MC_Question_Set_v3 as QuestionSet
 import scripts.GameLaunch_v2 as GameLaunch
-from scripts.card_state import CardState
+from scripts import bulk_import, review_service
 
 class MainPage(ft.Container):
     def __init__(self, page:ft.Page):
@@ -140,7 +141,6 @@ class MainPage(ft.Container):
 
         # folder_path = os.path.join(current_directory,"res/Vocab List") # Find the vocabulary excel documents
         
-        self.Vocab_lists = []
         self.Vocab_lists_info = []
         self.Vocab_List_Paths = fw.getFileName()
         
@@ -158,7 +158,11 @@ class MainPage(ft.Container):
             border_radius=20
         )
         generate_button = ft.FloatingActionButton(text="Generate From existing Lists", expand=True, on_click=self.generate_from_list)
-        import_button = ft.FloatingActionButton(text="Import list", expand=True)
+        import_button = ft.FloatingActionButton(text="Import list", expand=True, on_click=self.import_from_file)
+        
+        # The file picker used by the import button (CSV/TSV word lists or Anki packages)
+        self.import_picker = ft.FilePicker(on_result=self.import_files_picked)
+        self.page.overlay.append(self.import_picker)
         
         quit_button = ft.FloatingActionButton(text="Return to home", on_click=self.return_to_home, expand=True)
         
@@ -214,10 +218,9 @@ class MainPage(ft.Container):
         generate_length = 20
         
         # Use the generate list function in the ListWork tool file
-        # vocab_list = fw.readFromJson(self.Vocab_list_names[0])
-        print(self.Vocab_lists[0])
-        source_rows = [card.to_vocab_row() for card in self.Vocab_lists[0]]
-        new_lists = lw.generateList(source_rows,generate_num,generate_length)
+        # Generated lists only store card ids that point back into the source list
+        source_path = self.Vocab_List_Paths[0]
+        new_lists = lw.generateList(fw.deck_card_ids(source_path),generate_num,generate_length)
         # Add the new lists into the list for Vocab lists.
         for i in range(len(new_lists)):
             self.generated_num += 1
@@ -226,9 +229,7 @@ class MainPage(ft.Container):
                 if fw.checkExist(path):
                     self.generated_num += 1
                 else:
-                    card_states = [CardState.from_components(*entry) for entry in new_lists[i]]
-                    self.Vocab_lists.append(card_states)
-                    fw.writeIntoJson(card_states, path)
+                    fw.write_reference_deck(new_lists[i], path, source=source_path)
                     self.Vocab_List_Paths.append(path)
                     break
                 
@@ -240,6 +241,39 @@ class MainPage(ft.Container):
         self.content_display.visible = True
         self.mainpage.update()
         
+    # Function for importing lists from CSV/TSV files or Anki packages through the import button
+    def import_from_file(self, e):
+        self.import_picker.pick_files(
+            dialog_title="Import lists",
+            allow_multiple=True,
+            allowed_extensions=["csv", "tsv", "txt", "apkg", "colpkg"]
+        )
+    
+    def import_files_picked(self, e):
+        if not e.files:
+            return
+        # Import in the background so big collections do not freeze the page
+        paths = [f.path for f in e.files]
+        threading.Thread(target=self.import_lists, args=(paths,), daemon=True).start()
+    
+    def import_lists(self, paths:list):
+        for path in paths:
+            try:
+                result = bulk_import.import_file(path)
+            except (OSError, ValueError) as error:
+                print(f"Could not import {path}: {error}")
+                continue
+            print(f"Imported {result.cards} cards and {result.reviews} reviews from {path}, kept {result.existing} studied cards")
+            self.Vocab_List_Paths.append(str(result.deck_path))
+        
+        self.displayLists(self.Vocab_List_Paths)
+        
+        # Return to the home page
+        self.import_page.visible = False
+        self.top_display.visible = True
+        self.content_display.visible = True
+        self.mainpage.update()
+    
     ## New:
     # The function for starting practice
     def start_practice(self, e):
@@ -377,25 +411,21 @@ class MainPage(ft.Container):
             spacing=10  
         )
         
-        self.Vocab_lists = []
+        self.Vocab_lists_info = []
         # Add the areas for lists
         for i in range(len(Vocab_List_Names)):
-            # Obtain the vocabularies & information in each list
-            vocab_list, info = fw.readFromJson(Vocab_List_Names[i])
-            button_text = "Continue" if info[3] == True else "Start"
-            button_text = "Review" if info[2] == True else button_text
-            
-            button_color = ft.Colors.YELLOW_100 if info[3] == True else ft.Colors.ORANGE_100
-            button_color = ft.Colors.GREEN_100 if info[2] == True else button_color
+            # Show a placeholder until the list's information has been loaded
+            info = [os.path.splitext(os.path.basename(Vocab_List_Names[i]))[0], 1, False, False]
             
             # Thee button to start studying the list
             button = ft.Container(content=ft.FloatingActionButton(
-                text=f"{button_text}" if i != 0 else "Read", 
+                text="Loading" if i != 0 else "Read", 
                 data=i, 
                 on_click=self.open_list, 
-                bgcolor=button_color if i != 0 else ft.Colors.BLUE_200, 
+                bgcolor=ft.Colors.GREY_200 if i != 0 else ft.Colors.BLUE_200, 
                 width= 100,
-                height= 50
+                height= 50,
+                disabled=True
             ))
             
             # The text before container(the list name)
@@ -423,14 +453,57 @@ class MainPage(ft.Container):
             # Add the list to the display area
             self.list_area.controls.append(list)
             
-            # Add the list content coresspondingly to the vocab list
             # Add the information of the list correspondingly
-            self.Vocab_lists.append(vocab_list)
             self.Vocab_lists_info.append(info)
         
+        # Load the information of the lists in the background and fill each one in when it is ready
+        threading.Thread(
+            target=self.loadListInfos,
+            args=(tuple(Vocab_List_Names), self.list_area, self.Vocab_lists_info),
+            daemon=True
+        ).start()
+        
         # Add to the main content container
         self.vocab_area.content.controls.append(self.list_area)
     
+    # Function for filling in the lists as the deck loader reports them (runs on a background thread)
+    def loadListInfos(self, Vocab_List_Names:list, list_area, lists_info:list):
+        for i, info in fw.iter_list_infos(Vocab_List_Names):
+            if info is None:
+                # The deck header could not be loaded; it can still be studied if the deck itself opens
+                try:
+                    data = fw.readFromJson(Vocab_List_Names[i])
+                except (OSError, ValueError, TypeError):
+                    data = None
+                info = data[1] if isinstance(data, tuple) else None
+            
+            row = list_area.controls[i].content
+            button = row.controls[2].content
+            if info is None:
+                # Show the deck as unavailable instead of leaving it loading forever
+                button.text = "Unavailable"
+                button.bgcolor = ft.Colors.RED_100
+                button.disabled = True
+            else:
+                lists_info[i] = info
+                
+                button_text = "Continue" if info[3] == True else "Start"
+                button_text = "Review" if info[2] == True else button_text
+                
+                button_color = ft.Colors.YELLOW_100 if info[3] == True else ft.Colors.ORANGE_100
+                button_color = ft.Colors.GREEN_100 if info[2] == True else button_color
+                
+                row.controls[1].content.value = info[0]
+                button.text = f"{button_text}" if i != 0 else "Read"
+                button.bgcolor = button_color if i != 0 else ft.Colors.BLUE_200
+                button.disabled = False
+            
+            # The area is only shown once the page has mounted it
+            try:
+                list_area.update()
+            except (AssertionError, RuntimeError):
+                pass
+    
     def searchList(self, e):
         # Clear the search result area
         self.search_results.controls.clear()
@@ -528,6 +601,8 @@ class MainPage(ft.Container):
     
     # Closing the opened list
     def close_list(self,e):
+        # Write the grades queued during this session before reloading the lists
+        review_service.flush()
         fw.writeListInfo(self.current_set_name, currentNum=self.current_set.getIndex())
         
         # Return to home page
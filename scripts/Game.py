@@ -3,6 +3,7 @@ import pygame.font
 import random
 import sys
 import os
+from datetime import datetime, timezone
 from multiprocessing import Process, Pipe
 import flet as ft
 
@@ -11,7 +12,7 @@ global_correct_num = 0
 global_wrong_num = 0
 
 # Main game loop
-def main(launch_selected_list, launch_vocab, launch_defenition, difficulty, conn):
+def main(launch_selected_list, launch_vocab, launch_defenition, difficulty, conn, state_client = None):
      
     # Initialize Pygame
     pygame.init()
@@ -396,6 +397,9 @@ def main(launch_selected_list, launch_vocab, launch_defenition, difficulty, conn
     correct_num = 0
     wrong_num = 0
     
+    # (word, definition, grade, time) of every match / miss, sent to the state service at the end
+    grades = []
+    
     # The main gain loop
     while running:
         # Play the BGM
@@ -477,6 +481,7 @@ def main(launch_selected_list, launch_vocab, launch_defenition, difficulty, conn
                                         characters[i].situationlist()[characters[i].list().index(text)] = 3
                                         Success.play(success)
                                         correct_num += 1
+                                        grades.append((text, bomb[i][j].selfdefinition(), "good", datetime.now(timezone.utc)))
                                     # characters[i].situationlist()[characters[i].list().index(currentvocab)] = 3 # !!!! current vocab changed  
                     
                     text = ''  # Clear text after submission
@@ -531,6 +536,7 @@ def main(launch_selected_list, launch_vocab, launch_defenition, difficulty, conn
                     channel2.play(BombMissed)
                     
                     Wrong_word_list.append(characters[i].list()[characters[i].meaninglist().index(bomb[i][j].selfdefinition())])
+                    grades.append((Wrong_word_list[-1], bomb[i][j].selfdefinition(), "again", datetime.now(timezone.utc)))
                     bomb[i].pop(j)
                     break
             #         print(characters[i].list(), len(bomb[i]))
@@ -677,6 +683,10 @@ def main(launch_selected_list, launch_vocab, launch_defenition, difficulty, conn
         global_word_num += i.selfnum()
     Wrong_word_list.append(global_word_num)
     
+    # Feed the results back into FSRS through the UI process, the only writer of card states
+    if state_client is not None and grades:
+        state_client.grade_cards(grades)
+    
     conn.send([Wrong_word_list, correct_num, wrong_num])
     conn.close()
     
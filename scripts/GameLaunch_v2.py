@@ -4,6 +4,7 @@ import multiprocessing as mp
 import flet as ft
 import scripts.ListWork_v3 as lw
 import scripts.Game as Game  
+from scripts import state_service
 
 # A Class for displaying Launcher
 class GameLaunch(ft.Container):
@@ -211,6 +212,9 @@ After you completed the game or closed the gaming window, a gaming performance r
         except RuntimeError:
             pass
 
+        # This process stays the only writer of card states; the game reaches it through the state service
+        state_service.get_default_server()
+
         # Start an independent proces
         self.launcher_conn, game_conn = mp.Pipe()
         
@@ -248,7 +252,13 @@ def launch_Game1_1BT_from_flet(difficulty: int = 3, conn = None, vocab = [], def
     # The name for the list
     selected_list = ["Flet 启动"]
 
-    Game.main(selected_list, vocab, definition, int(difficulty), conn)
+    # Reads and writes of card states go through the launcher's state service
+    state_client = state_service.connect()
+    try:
+        Game.main(selected_list, vocab, definition, int(difficulty), conn, state_client)
+    finally:
+        if state_client is not None:
+            state_client.close()
     
 # Function for obtaining the index for a given vocab in a 2D vocab list
 def get_index(lst:list, var) -> tuple[int,int]:
@@ -0,0 +1,376 @@
+"""Bulk import of CSV/TSV word lists and Anki ``.apkg`` packages.
+
+Each imported file becomes one deck in ``res/Vocab List``. Its cards are
+written to the state store with a single
+:func:`~scripts.FileWork_v3.bulk_save_card_states` pass. Anki packages also
+carry their review history: each card's ``revlog`` rows are replayed
+through :func:`~scripts.fsrs_engine.review`, so the imported card states are
+FSRS states, and the reviews are appended to the review log once the states
+have been stored. A word that already has a stored state for the user keeps
+that state: it is added to the new deck, but its imported reviews are not
+replayed or logged.
+
+Everything is streamed in batches of ``batch_size`` notes: CSV rows are read
+lazily, Anki notes come from a SQLite cursor and their reviews are fetched
+per batch, the deck JSON is written entry by entry and the review log
+entries wait in a temporary file. Memory therefore does not grow with the
+size of the collection, apart from the set of words already written to the
+deck.
+"""
+
+from __future__ import annotations
+
+import csv
+import html
+import itertools
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import zipfile
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from scripts import FileWork_v3 as filework
+from scripts.card_state import CardState
+from scripts.fsrs_engine import load_weights, review
+
+DEFAULT_BATCH_SIZE = 500
+DELIMITED_SUFFIXES = {".csv": ",", ".tsv": "\t", ".txt": "\t"}
+ANKI_SUFFIXES = (".apkg", ".colpkg")
+# Legacy collection names inside a package, newest first. ``collection.anki21b``
+# is zstd-compressed and cannot be read with the standard library.
+ANKI_COLLECTIONS = ("collection.anki21", "collection.anki2")
+ANKI_GRADES = {1: "again", 2: "hard", 3: "good", 4: "easy"}
+HEADER_WORDS = {"vocab:", "vocab", "word", "front"}
+# ``#key:value`` lines Anki writes at the top of its text exports.
+ANKI_HEADER_KEYS = {
+    "separator",
+    "html",
+    "tags",
+    "columns",
+    "notetype",
+    "deck",
+    "notetype column",
+    "deck column",
+    "tags column",
+    "guid column",
+}
+ANKI_SEPARATORS = {"comma": ",", "semicolon": ";", "tab": "\t", "space": " ", "pipe": "|", "colon": ":"}
+IMPORT_LOG_SOURCE = "import"
+
+_ANKI_HEADER = re.compile(r"#([a-z ]+):(.*)$", re.IGNORECASE)
+_TAG = re.compile(r"<[^>]+>")
+_BREAK = re.compile(r"<br\s*/?>|</div>", re.IGNORECASE)
+
+
+@dataclass
+class ImportedCard:
+    """One note to import, with its reviews as ``(reviewed_at, grade)`` pairs."""
+
+    word: str
+    definition: str = ""
+    example: str = ""
+    reviews: List[Tuple[datetime, str]] = field(default_factory=list)
+
+
+@dataclass
+class ImportResult:
+    """Summary of one imported file."""
+
+    source: Path
+    deck_path: Path
+    cards: int = 0
+    skipped: int = 0
+    existing: int = 0
+    reviews: int = 0
+
+
+# ---------------------------------------------------------------------------
+# Readers
+# ---------------------------------------------------------------------------
+
+def iter_delimited_cards(path: Path, *, delimiter: Optional[str] = None) -> Iterator[ImportedCard]:
+    """Stream cards from a CSV or TSV file.
+
+    The first three columns are the word, definition and example. Anki's
+    ``#key:value`` header lines at the top of the file are skipped, and its
+    ``#separator`` sets the delimiter unless *delimiter* is given. Blank
+    rows and a header row whose first cell is a column name such as
+    ``Vocab:`` are skipped too. Any other line, including one starting with
+    ``#``, is data.
+    """
+
+    path = Path(path)
+    with path.open("r", encoding="utf-8-sig", newline="") as handle:
+        headers: Dict[str, str] = {}
+        line = handle.readline()
+        while line:
+            match = _ANKI_HEADER.match(line.rstrip("\r\n"))
+            if match is None or match.group(1).strip().lower() not in ANKI_HEADER_KEYS:
+                break
+            headers[match.group(1).strip().lower()] = match.group(2).strip()
+            line = handle.readline()
+        separator = headers.get("separator")
+        if delimiter is None and separator:
+            delimiter = ANKI_SEPARATORS.get(separator.lower(), separator)
+        delimiter = delimiter or DELIMITED_SUFFIXES.get(path.suffix.lower(), ",")
+        rows = csv.reader(itertools.chain([line], handle), delimiter=delimiter)
+        for position, row in enumerate(rows):
+            if not row or not row[0].strip():
+                continue
+            if position == 0 and row[0].strip().lower() in HEADER_WORDS:
+                continue
+            cells = [cell.strip() for cell in row[:3]] + [""] * (3 - min(len(row), 3))
+            yield ImportedCard(*cells)
+
+
+def _strip_html(value: str) -> str:
+    return html.unescape(_TAG.sub("", _BREAK.sub("\n", value))).strip()
+
+
+def _batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    iterator = iter(items)
+    while True:
+        batch = list(itertools.islice(iterator, max(int(size), 1)))
+        if not batch:
+            return
+        yield batch
+
+
+def _anki_reviews(
+    connection: sqlite3.Connection, card_ids: List[int]
+) -> Dict[int, List[Tuple[datetime, str]]]:
+    placeholders = ",".join("?" * len(card_ids))
+    reviews: Dict[int, List[Tuple[datetime, str]]] = {}
+    rows = connection.execute(
+        f"SELECT cid, id, ease FROM revlog WHERE cid IN ({placeholders}) AND ease > 0 ORDER BY cid, id",
+        card_ids,
+    )
+    for card_id, review_ms, ease in rows:
+        grade = ANKI_GRADES.get(int(ease))
+        if grade is not None:
+            reviewed_at = datetime.fromtimestamp(review_ms / 1000.0, tz=timezone.utc)
+            reviews.setdefault(card_id, []).append((reviewed_at, grade))
+    return reviews
+
+
+def iter_anki_cards(path: Path, *, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[ImportedCard]:
+    """Stream the notes of an Anki package together with their reviews.
+
+    The first three note fields become the word, definition and example,
+    with HTML removed. The reviews of a note's first card are fetched for
+    *batch_size* notes at a time.
+    """
+
+    path = Path(path)
+    with zipfile.ZipFile(path) as package:
+        names = set(package.namelist())
+        member = next((name for name in ANKI_COLLECTIONS if name in names), None)
+        if member is None:
+            raise ValueError(f"No readable Anki collection in {path}; export it with legacy support enabled")
+        with tempfile.TemporaryDirectory(prefix="anki-import-") as tmp_dir:
+            database = Path(package.extract(member, tmp_dir))
+            connection = sqlite3.connect(database)
+            try:
+                # Anki ships these indexes; create them on the extracted copy in case they are missing
+                connection.execute("CREATE INDEX IF NOT EXISTS ix_cards_nid ON cards (nid)")
+                connection.execute("CREATE INDEX IF NOT EXISTS ix_revlog_cid ON revlog (cid)")
+                notes = connection.execute(
+                    "SELECT n.flds, (SELECT MIN(c.id) FROM cards c WHERE c.nid = n.id) FROM notes n ORDER BY n.id"
+                )
+                for batch in _batched(notes, batch_size):
+                    card_ids = [card_id for _, card_id in batch if card_id is not None]
+                    reviews = _anki_reviews(connection, card_ids) if card_ids else {}
+                    for fields, card_id in batch:
+                        values = [_strip_html(value) for value in fields.split("\x1f")[:3]]
+                        values += [""] * (3 - len(values))
+                        if not values[0]:
+                            continue
+                        yield ImportedCard(*values, reviews=reviews.get(card_id, []))
+            finally:
+                connection.close()
+
+
+def iter_import_cards(path: Path, *, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[ImportedCard]:
+    """Dispatch to the reader for *path*'s format."""
+
+    suffix = Path(path).suffix.lower()
+    if suffix in ANKI_SUFFIXES:
+        return iter_anki_cards(path, batch_size=batch_size)
+    if suffix in DELIMITED_SUFFIXES:
+        return iter_delimited_cards(path)
+    raise ValueError(f"Unsupported import format: {path}")
+
+
+# ---------------------------------------------------------------------------
+# Writers
+# ---------------------------------------------------------------------------
+
+class DeckWriter:
+    """Write a deck JSON file one entry at a time.
+
+    The output matches :func:`~scripts.FileWork_v3.writeIntoJson` (entries
+    keyed by word, ``"XXX"`` header last, four-space indent). It is written
+    to a temporary file and renamed into place when the writer is closed
+    without an error.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._tmp_path = self.path.with_name(self.path.name + ".tmp")
+        self._words: Set[str] = set()
+        self._handle: Any = None
+
+    def __enter__(self) -> "DeckWriter":
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._handle = self._tmp_path.open("w", encoding="utf-8")
+        self._handle.write("{")
+        return self
+
+    def _write(self, key: str, value: Dict[str, Any]) -> None:
+        # Same layout as json.dump(..., indent=4) for a flat dict, without the
+        # slow pure-Python indenting encoder.
+        fields = ",\n".join(
+            f"        {json.dumps(name, ensure_ascii=False)}: {json.dumps(item, ensure_ascii=False)}"
+            for name, item in value.items()
+        )
+        separator = "," if self._words else ""
+        self._handle.write(f"{separator}\n    {json.dumps(key, ensure_ascii=False)}: {{\n{fields}\n    }}")
+
+    def __contains__(self, word: str) -> bool:
+        return word in self._words or word == "XXX"
+
+    def add(self, card: CardState) -> bool:
+        """Add *card*; return ``False`` if the deck already has its word."""
+
+        if card.word in self:
+            return False
+        self._write(card.word, filework._deck_entry(card))
+        self._words.add(card.word)
+        return True
+
+    def __exit__(self, exc_type: Any, exc: Any, traceback: Any) -> None:
+        try:
+            if exc_type is None:
+                self._write("XXX", filework._deck_header(self.path))
+                self._words.add("XXX")
+                self._handle.write("\n}")
+            self._handle.close()
+            if exc_type is None:
+                os.replace(self._tmp_path, self.path)
+        finally:
+            self._tmp_path.unlink(missing_ok=True)
+
+
+def _unique_deck_path(directory: Path, stem: str) -> Path:
+    candidate = directory / f"{stem}.json"
+    counter = 2
+    while candidate.exists():
+        candidate = directory / f"{stem}_{counter}.json"
+        counter += 1
+    return candidate
+
+
+def _replay(card: ImportedCard, user_key: str, weights: Any) -> Tuple[CardState, List[Dict[str, Any]]]:
+    state = CardState(card.word, card.definition, card.example, user_id=user_key)
+    entries: List[Dict[str, Any]] = []
+    for reviewed_at, grade in card.reviews:
+        updated, diagnostics = review(state, grade, reviewed_at, weights=weights)
+        entries.append(
+            {
+                "user_id": user_key,
+                "card_id": updated.card_id,
+                "grade": diagnostics["grade"],
+                "interval_days": diagnostics["interval_days"],
+                "success": diagnostics["success"],
+                "w_version": updated.w_version or weights.version,
+                "before_state": diagnostics["before_state"].to_storage_dict(),
+                "after_state": updated.to_storage_dict(),
+                "retrievability": diagnostics.get("retrievability"),
+                "logged_at": reviewed_at.isoformat().replace("+00:00", "Z"),
+                "source": IMPORT_LOG_SOURCE,
+            }
+        )
+        state = updated
+    return state, entries
+
+
+def import_file(
+    path: Path,
+    *,
+    user_id: Optional[str] = None,
+    deck_dir: Optional[Path] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> ImportResult:
+    """Import one CSV/TSV file or Anki package as a new deck.
+
+    Parameters
+    ----------
+    path:
+        ``.csv``, ``.tsv``/``.txt`` (tab separated) or ``.apkg``/``.colpkg``.
+    user_id:
+        Owner of the imported card states and reviews.
+    deck_dir:
+        Directory for the new deck. Defaults to the user deck directory
+        (``res/Vocab List``); an existing deck is never overwritten.
+    batch_size:
+        Number of notes read and replayed, and of reviews logged, at a time.
+    """
+
+    path = Path(path)
+    user_key = filework._normalise_user_id(user_id)
+    deck_dir = Path(deck_dir) if deck_dir is not None else filework.DECK_ROOTS[1]
+    result = ImportResult(source=path, deck_path=_unique_deck_path(deck_dir, path.stem))
+    weights = load_weights()
+
+    def states(spool: Any) -> Iterator[CardState]:
+        with DeckWriter(result.deck_path) as deck:
+            for batch in _batched(iter_import_cards(path, batch_size=batch_size), batch_size):
+                stored = filework.load_card_states_for((card.word for card in batch), user_id=user_key)
+                for card in batch:
+                    if card.word in deck:
+                        result.skipped += 1
+                        continue
+                    if card.word in stored:
+                        deck.add(CardState(card.word, card.definition, card.example, user_id=user_key))
+                        result.existing += 1
+                        continue
+                    state, entries = _replay(card, user_key, weights)
+                    deck.add(state)
+                    spool.writelines(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries)
+                    result.cards += 1
+                    yield state
+
+    with tempfile.TemporaryFile("w+", encoding="utf-8") as spool:
+        try:
+            filework.bulk_save_card_states(states(spool), user_id=user_key)
+        except (zipfile.BadZipFile, sqlite3.DatabaseError, csv.Error) as error:
+            raise ValueError(f"Could not read {path}: {error}") from error
+        spool.seek(0)
+        for lines in _batched(spool, batch_size):
+            filework.append_review_logs(json.loads(line) for line in lines)
+            result.reviews += len(lines)
+    return result
+
+
+def import_files(paths: Iterable[Path], **options: Any) -> List[ImportResult]:
+    """Import several files; see :func:`import_file` for *options*."""
+
+    return [import_file(Path(path), **options) for path in paths]
+
+
+__all__ = [
+    "DEFAULT_BATCH_SIZE",
+    "DeckWriter",
+    "ImportResult",
+    "ImportedCard",
+    "import_file",
+    "import_files",
+    "iter_anki_cards",
+    "iter_delimited_cards",
+    "iter_import_cards",
+]
@@ -10,7 +10,21 @@ from __future__ import annotations
 
 from dataclasses import dataclass, field, replace
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Mapping, Optional, Sequence
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+# Number of recent history entries kept on the state itself. Older entries
+# are moved to a separate history store when the state is saved.
+HISTORY_WINDOW = 50
+
+HistoryLoader = Callable[["CardState"], List[Dict[str, Any]]]
+_HISTORY_LOADER: Optional[HistoryLoader] = None
+
+
+def set_history_loader(loader: Optional[HistoryLoader]) -> None:
+    """Register the callable :meth:`CardState.full_history` uses for archived entries."""
+
+    global _HISTORY_LOADER
+    _HISTORY_LOADER = loader
 
 
 def _ensure_utc(value: datetime) -> datetime:
@@ -86,6 +100,10 @@ class CardState:
     w_version:
         Version marker for the FSRS weight configuration used to schedule the
         card.
+    history / history_offset:
+        The most recent review history entries and the number of older
+        entries that live in the history store. Use :meth:`full_history` for
+        the complete list.
     """
 
     word: str
@@ -107,6 +125,7 @@ class CardState:
     last_success_at: Optional[datetime] = None
     same_day_success: int = 0
     w_version: Optional[str] = None
+    history_offset: int = 0
 
     def __post_init__(self) -> None:
         if self.card_id is None:
@@ -195,6 +214,7 @@ class CardState:
         phase = str(phase_raw) if phase_raw not in (None, "") else "new"
         last_success_at = _parse_datetime(payload.get("last_success_at"))
         same_day_success = int(payload.get("same_day_success", 0) or 0)
+        history_offset = int(payload.get("history_offset", 0) or 0)
         w_version_raw = payload.get("w_version")
         if w_version_raw in (None, ""):
             w_version = None
@@ -230,6 +250,7 @@ class CardState:
             last_success_at=last_success_at,
             same_day_success=same_day_success,
             w_version=w_version,
+            history_offset=history_offset,
         )
 
         known_keys = {
@@ -256,6 +277,7 @@ class CardState:
             "last_success_at",
             "same_day_success",
             "w_version",
+            "history_offset",
         }
 
         metadata = dict(payload.get("metadata", {}))
@@ -326,6 +348,8 @@ class CardState:
                 self.w_version = None
             else:
                 self.w_version = str(w_version_raw)
+        if "history_offset" in payload:
+            self.history_offset = int(payload.get("history_offset", 0) or 0)
 
         known_keys = {
             "definition",
@@ -351,6 +375,7 @@ class CardState:
             "last_success_at",
             "same_day_success",
             "w_version",
+            "history_offset",
         }
         extras = {k: v for k, v in payload.items() if k not in known_keys}
         if extras:
@@ -388,6 +413,8 @@ class CardState:
         data["same_day_success"] = int(self.same_day_success or 0)
         if self.w_version is not None:
             data["w_version"] = self.w_version
+        if self.history_offset:
+            data["history_offset"] = self.history_offset
         if self.custom_data:
             data["custom_data"] = self.custom_data
         if self.metadata:
@@ -485,6 +512,38 @@ class CardState:
             self.phase = canonical
         return self.phase
 
+    def trim_history(self, window: Optional[int] = None) -> Tuple[int, List[Dict[str, Any]]]:
+        """Keep only the last *window* (default :data:`HISTORY_WINDOW`) history entries.
+
+        Returns ``(start, entries)``: the removed entries and the position of
+        the first of them in the card's full history, for the caller to
+        archive. :attr:`history_offset` is advanced accordingly.
+        """
+
+        limit = HISTORY_WINDOW if window is None else window
+        excess = len(self.history) - max(int(limit), 0)
+        if excess <= 0:
+            return self.history_offset, []
+        start = self.history_offset
+        spilled = self.history[:excess]
+        self.history = self.history[excess:]
+        self.history_offset += excess
+        return start, spilled
+
+    def full_history(self, loader: Optional[HistoryLoader] = None) -> List[Dict[str, Any]]:
+        """Return archived history followed by the recent window.
+
+        *loader* returns the archived entries for a state and defaults to the
+        one registered with :func:`set_history_loader`.
+        """
+
+        recent = [dict(entry) for entry in self.history]
+        loader = loader or _HISTORY_LOADER
+        if not self.history_offset or loader is None:
+            return recent
+        archived = list(loader(self))[: self.history_offset]
+        return archived + recent
+
     def to_vocab_row(self) -> Sequence[str]:
         """Return the legacy `[word, definition, example]` triple."""
 
@@ -0,0 +1,242 @@
+"""Columnar NumPy snapshot of a user's card states.
+
+:class:`CardTable` holds the scheduling fields of every card as parallel
+NumPy arrays so analytics, workload forecasts and bulk rescheduling can work
+on whole columns instead of building one :class:`~scripts.card_state.CardState`
+per card. Timestamps are stored as UTC epoch seconds (``NaN`` when unset) and
+the phase as an ``int8`` code into :attr:`CardTable.phase_labels`.
+
+Tables are saved as ``card_table.npz`` next to the user's state log. The log
+is append-only between compactions, so :meth:`CardTable.refresh` only parses
+the bytes appended since the snapshot was taken.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+import numpy as np
+
+from scripts.card_state import _parse_datetime
+from scripts.fsrs_engine import WeightConfig, predict_R_batch
+
+PHASES = ("new", "learning", "review", "relearning")
+TABLE_FILENAME = "card_table.npz"
+NUMERIC_COLUMNS = {
+    "stability": np.float64,
+    "difficulty": np.float64,
+    "due_at": np.float64,
+    "last_review_at": np.float64,
+    "lapses": np.int32,
+    "repetitions": np.int32,
+    "phase": np.int8,
+}
+
+
+def _epoch_seconds(value: Any) -> float:
+    parsed = _parse_datetime(value)
+    return parsed.timestamp() if parsed is not None else float("nan")
+
+
+def _empty_column(name: str) -> np.ndarray:
+    return np.zeros(0, dtype=NUMERIC_COLUMNS[name])
+
+
+@dataclass
+class CardTable:
+    """Parallel arrays describing one user's cards.
+
+    ``source_inode`` and ``source_offset`` record how much of the state log
+    the table reflects so it can be refreshed incrementally.
+    """
+
+    card_id: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=str))
+    stability: np.ndarray = field(default_factory=lambda: _empty_column("stability"))
+    difficulty: np.ndarray = field(default_factory=lambda: _empty_column("difficulty"))
+    due_at: np.ndarray = field(default_factory=lambda: _empty_column("due_at"))
+    last_review_at: np.ndarray = field(default_factory=lambda: _empty_column("last_review_at"))
+    lapses: np.ndarray = field(default_factory=lambda: _empty_column("lapses"))
+    repetitions: np.ndarray = field(default_factory=lambda: _empty_column("repetitions"))
+    phase: np.ndarray = field(default_factory=lambda: _empty_column("phase"))
+    phase_labels: List[str] = field(default_factory=lambda: list(PHASES))
+    source_inode: int = 0
+    source_offset: int = 0
+
+    def __post_init__(self) -> None:
+        self._rows: Optional[Dict[str, int]] = None
+
+    def __len__(self) -> int:
+        return int(self.card_id.shape[0])
+
+    # ------------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------------
+    @classmethod
+    def from_records(cls, records: Iterable[Mapping[str, Any]]) -> "CardTable":
+        table = cls()
+        table.upsert(records)
+        return table
+
+    def _phase_code(self, phase: Any) -> int:
+        label = str(phase or "new").lower()
+        try:
+            return self.phase_labels.index(label)
+        except ValueError:
+            self.phase_labels.append(label)
+            return len(self.phase_labels) - 1
+
+    def _row_index(self) -> Dict[str, int]:
+        if self._rows is None:
+            self._rows = {str(card_id): row for row, card_id in enumerate(self.card_id)}
+        return self._rows
+
+    def upsert(self, records: Iterable[Mapping[str, Any]]) -> int:
+        """Apply state log *records*, later records winning, and return the count."""
+
+        latest: Dict[str, Mapping[str, Any]] = {}
+        for record in records:
+            card_id = record.get("card_id") or record.get("word")
+            if card_id:
+                latest[str(card_id)] = record
+        if not latest:
+            return 0
+
+        ids = list(latest)
+        columns: Dict[str, List[Any]] = {name: [] for name in NUMERIC_COLUMNS}
+        for card_id in ids:
+            record = latest[card_id]
+            payload = record.get("state")
+            state = payload if isinstance(payload, Mapping) else record
+            columns["stability"].append(float(state.get("stability", 0.0) or 0.0))
+            columns["difficulty"].append(float(state.get("difficulty", 0.0) or 0.0))
+            columns["due_at"].append(_epoch_seconds(state.get("due_at", state.get("due"))))
+            columns["last_review_at"].append(
+                _epoch_seconds(state.get("last_review_at", state.get("last_review")))
+            )
+            columns["lapses"].append(int(state.get("lapses", 0) or 0))
+            columns["repetitions"].append(
+                int(state.get("repetitions", state.get("reviews", 0) or 0) or 0)
+            )
+            columns["phase"].append(self._phase_code(state.get("phase")))
+        arrays = {
+            name: np.asarray(values, dtype=NUMERIC_COLUMNS[name])
+            for name, values in columns.items()
+        }
+
+        rows = self._row_index()
+        positions = np.fromiter((rows.get(card_id, -1) for card_id in ids), dtype=np.int64, count=len(ids))
+        existing = positions >= 0
+        if existing.any():
+            for name, values in arrays.items():
+                getattr(self, name)[positions[existing]] = values[existing]
+        if not existing.all():
+            fresh = ~existing
+            start = len(self)
+            new_ids = np.asarray([card_id for card_id, is_new in zip(ids, fresh) if is_new], dtype=str)
+            self.card_id = np.concatenate([self.card_id.astype(str), new_ids])
+            for name, values in arrays.items():
+                setattr(self, name, np.concatenate([getattr(self, name), values[fresh]]))
+            for offset, card_id in enumerate(new_ids):
+                rows[str(card_id)] = start + offset
+        return len(ids)
+
+    # ------------------------------------------------------------------
+    # Incremental refresh from the JSONL log
+    # ------------------------------------------------------------------
+    def refresh(self, state_path: Path) -> int:
+        """Apply records appended to *state_path* since the last refresh.
+
+        A replaced (compacted) or truncated log triggers a full rebuild.
+        Returns the number of cards updated.
+        """
+
+        path = Path(state_path)
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return 0
+        if stat.st_ino != self.source_inode or stat.st_size < self.source_offset:
+            self._reset()
+        if stat.st_size == self.source_offset:
+            return 0
+        records: List[Dict[str, Any]] = []
+        with path.open("rb") as handle:
+            handle.seek(self.source_offset)
+            offset = self.source_offset
+            for raw in handle:
+                if not raw.endswith(b"\n"):
+                    break
+                text = raw.strip()
+                if text:
+                    records.append(json.loads(text))
+                offset += len(raw)
+        self.source_inode = stat.st_ino
+        self.source_offset = offset
+        return self.upsert(records)
+
+    def _reset(self) -> None:
+        fresh = CardTable()
+        for name in ("card_id", *NUMERIC_COLUMNS):
+            setattr(self, name, getattr(fresh, name))
+        self.phase_labels = list(PHASES)
+        self.source_inode = 0
+        self.source_offset = 0
+        self._rows = None
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    def save(self, path: Path) -> None:
+        """Write the table to an ``.npz`` file atomically."""
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with tmp_path.open("wb") as handle:
+            np.savez(
+                handle,
+                card_id=self.card_id.astype(str),
+                phase_labels=np.asarray(self.phase_labels, dtype=str),
+                source=np.asarray([self.source_inode, self.source_offset], dtype=np.int64),
+                **{name: getattr(self, name) for name in NUMERIC_COLUMNS},
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "CardTable":
+        with np.load(Path(path), allow_pickle=False) as data:
+            source = data["source"]
+            return cls(
+                card_id=data["card_id"],
+                phase_labels=[str(label) for label in data["phase_labels"]],
+                source_inode=int(source[0]),
+                source_offset=int(source[1]),
+                **{name: data[name].astype(dtype) for name, dtype in NUMERIC_COLUMNS.items()},
+            )
+
+    # ------------------------------------------------------------------
+    # Convenience views
+    # ------------------------------------------------------------------
+    def phase_mask(self, *phases: str) -> np.ndarray:
+        """Boolean mask selecting cards in any of *phases*."""
+
+        codes = [self.phase_labels.index(p) for p in phases if p in self.phase_labels]
+        return np.isin(self.phase, codes)
+
+    def due_before(self, epoch_seconds: float) -> np.ndarray:
+        """Boolean mask of cards due at or before *epoch_seconds*."""
+
+        return self.due_at <= epoch_seconds
+
+    def retrievability(self, epoch_seconds: float, config: Optional[WeightConfig] = None) -> np.ndarray:
+        """Recall probability of every card at *epoch_seconds* (``NaN`` if never reviewed)."""
+
+        elapsed_days = np.maximum((epoch_seconds - self.last_review_at) / 86400.0, 0.0)
+        return predict_R_batch(self.stability, elapsed_days, config)
+
+
+__all__ = ["CardTable", "PHASES", "TABLE_FILENAME"]
@@ -0,0 +1,86 @@
+"""Shared card content for decks that reference cards in another deck.
+
+A reference deck (see :func:`scripts.FileWork_v3.write_reference_deck`)
+names a source deck in its ``"XXX"`` header (``"Source"``) and stores each
+card as ``{"ref": <card_id>}``. :class:`ContentStore` loads each source deck
+once, indexes its entries by card id and hands out the same entry dicts to
+every deck that refers to them, so definitions and example sentences exist
+once on disk and once in memory however many decks are generated. A source
+is reloaded when its mtime or size changes.
+"""
+
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from scripts.deck_cache import load_deck
+
+HEADER_KEY = "XXX"
+SOURCE_KEY = "Source"
+REF_KEY = "ref"
+
+_Card = Tuple[str, Mapping[str, Any]]
+
+
+def is_reference_entry(data: Any) -> bool:
+    return isinstance(data, Mapping) and REF_KEY in data
+
+
+def _source_key(path: Any) -> str:
+    return Path(path).as_posix()
+
+
+class ContentStore:
+    """Card content of source decks, indexed by card id."""
+
+    def __init__(self, *, use_cache: bool = True) -> None:
+        self.use_cache = use_cache
+        self._lock = threading.RLock()
+        # source key -> ((mtime_ns, size), {card_id: (word, entry)})
+        self._sources: Dict[str, Tuple[Tuple[int, int], Dict[str, _Card]]] = {}
+
+    def _index(self, source: Any) -> Dict[str, _Card]:
+        key = _source_key(source)
+        path = Path(source)
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Source deck not found: {path}") from None
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            loaded = self._sources.get(key)
+            if loaded is not None and loaded[0] == version:
+                return loaded[1]
+            entries: Dict[str, _Card] = {}
+            for word, data in load_deck(path, use_cache=self.use_cache).items():
+                if word == HEADER_KEY or not isinstance(data, Mapping):
+                    continue
+                entries[str(data.get("card_id") or word)] = (word, data)
+            self._sources[key] = (version, entries)
+            return entries
+
+    def card_ids(self, source: Any) -> List[str]:
+        """Return the card ids of *source* in deck order."""
+
+        return list(self._index(source))
+
+    def get(self, source: Any, card_id: str) -> Optional[Mapping[str, Any]]:
+        """Return the entry for *card_id* in *source*, or ``None`` if it is gone."""
+
+        card = self._index(source).get(str(card_id))
+        return card[1] if card is not None else None
+
+    def word(self, source: Any, card_id: str) -> Optional[str]:
+        """Return the word *card_id* is stored under in *source*."""
+
+        card = self._index(source).get(str(card_id))
+        return card[0] if card is not None else None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sources.clear()
+
+
+__all__ = ["ContentStore", "REF_KEY", "SOURCE_KEY", "is_reference_entry"]
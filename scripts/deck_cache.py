@@ -0,0 +1,84 @@
+"""Compiled binary cache for parsed deck JSON.
+
+Decoding a large deck such as ``WordBook.json`` (3.5 MB of ``\\u``-escaped
+JSON) dominates a cold start. :func:`load_deck` keeps a ``marshal`` dump of
+the parsed payload next to each deck (``WordBook.json.cache``). The dump
+stores the deck's mtime and size, and it is only used when both still match.
+It also records a format number and the interpreter's marshal version,
+because marshal data is not portable between Python versions. A missing,
+stale or unreadable cache falls back to the JSON file and is rewritten.
+"""
+
+from __future__ import annotations
+
+import json
+import marshal
+import os
+from pathlib import Path
+from typing import Any, MutableMapping, Optional, Tuple
+
+CACHE_FORMAT = 1
+CACHE_SUFFIX = ".cache"
+_MAGIC = "flashcard-deck-cache"
+
+
+def cache_path(path: Path) -> Path:
+    return path.with_name(path.name + CACHE_SUFFIX)
+
+
+def _cache_key(path: Path) -> Tuple[Any, ...]:
+    stat = path.stat()
+    return (_MAGIC, CACHE_FORMAT, marshal.version, stat.st_mtime_ns, stat.st_size)
+
+
+def read_cache(path: Path) -> Optional[MutableMapping[str, Any]]:
+    """Return the cached payload for *path* if the cache is fresh."""
+
+    try:
+        # marshal.loads on the whole file is several times faster than
+        # marshal.load on a handle, which reads in small pieces.
+        key, payload = marshal.loads(cache_path(path).read_bytes())
+        if tuple(key) != _cache_key(path):
+            return None
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    return payload
+
+
+def write_cache(
+    path: Path, payload: MutableMapping[str, Any], *, key: Optional[Tuple[Any, ...]] = None
+) -> bool:
+    """Store *payload* as the cache for *path*; return ``False`` on failure.
+
+    *key* should come from a stat taken before the deck was read, so a deck
+    modified while it was being parsed never gets a cache that looks fresh.
+    """
+
+    target = cache_path(path)
+    tmp_path = target.with_name(target.name + ".tmp")
+    try:
+        tmp_path.write_bytes(marshal.dumps((key or _cache_key(path), payload)))
+        os.replace(tmp_path, target)
+    except (OSError, ValueError):
+        tmp_path.unlink(missing_ok=True)
+        return False
+    return True
+
+
+def load_deck(path: Path, *, use_cache: bool = True) -> MutableMapping[str, Any]:
+    """Return the parsed deck at *path*, from the cache when it is fresh."""
+
+    path = Path(path)
+    if use_cache:
+        cached = read_cache(path)
+        if cached is not None:
+            return cached
+    key = _cache_key(path)
+    with path.open("r", encoding="utf-8") as handle:
+        payload = json.load(handle)
+    if use_cache:
+        write_cache(path, payload, key=key)
+    return payload
+
+
+__all__ = ["CACHE_FORMAT", "CACHE_SUFFIX", "cache_path", "load_deck", "read_cache", "write_cache"]
@@ -0,0 +1,188 @@
+"""Catalog of deck headers so deck lists can be shown without parsing decks.
+
+:class:`DeckCatalog` keeps one small JSON file (``res/deck_catalog.json``)
+with an entry per deck. Each entry holds the deck's ``"XXX"`` header (name,
+CurrentNum, Completed, Learning), its card count, the mtime and size it was
+built from and a SHA-1 of its content. :meth:`DeckCatalog.refresh` re-reads
+only the decks whose mtime or size changed. The catalog also remembers the
+listing of each deck directory, so :meth:`DeckCatalog.list_decks` scans a
+directory only when its mtime changed.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+CATALOG_FORMAT = 1
+HEADER_KEY = "XXX"
+
+
+def _deck_key(path: Any) -> str:
+    return Path(path).as_posix()
+
+
+def build_entry(path: Path) -> Dict[str, Any]:
+    """Parse *path* once and return its catalog entry."""
+
+    stat = path.stat()
+    raw = path.read_bytes()
+    payload = json.loads(raw.decode("utf-8"))
+    header = payload.get(HEADER_KEY) if isinstance(payload.get(HEADER_KEY), dict) else {}
+    return {
+        "name": header.get("Name", path.stem),
+        "current_num": header.get("CurrentNum", 1),
+        "completed": header.get("Completed", False),
+        "learning": header.get("Learning", False),
+        "card_count": sum(1 for key in payload if key != HEADER_KEY),
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha1": hashlib.sha1(raw).hexdigest(),
+    }
+
+
+class DeckCatalog:
+    """Cached deck headers keyed by deck path."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+        # directory key -> {"mtime_ns": ..., "files": [deck file names]}
+        self._dirs: Dict[str, Dict[str, Any]] = {}
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if self._entries is None:
+            entries: Dict[str, Dict[str, Any]] = {}
+            dirs: Dict[str, Dict[str, Any]] = {}
+            if self.path.exists():
+                try:
+                    with self.path.open("r", encoding="utf-8") as handle:
+                        payload = json.load(handle)
+                    if payload.get("format") == CATALOG_FORMAT:
+                        entries = dict(payload.get("decks", {}))
+                        dirs = dict(payload.get("dirs", {}))
+                except (OSError, ValueError):
+                    entries, dirs = {}, {}
+            self._entries = entries
+            self._dirs = dirs
+        return self._entries
+
+    def save(self) -> None:
+        with self._lock:
+            payload = {"format": CATALOG_FORMAT, "decks": self._load(), "dirs": self._dirs}
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(self.path.name + ".tmp")
+            with tmp_path.open("w", encoding="utf-8") as handle:
+                json.dump(payload, handle, indent=4, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+
+    def _is_fresh(self, entry: Optional[Dict[str, Any]], deck_path: Path) -> bool:
+        if entry is None:
+            return False
+        try:
+            stat = deck_path.stat()
+        except FileNotFoundError:
+            return False
+        return entry.get("mtime_ns") == stat.st_mtime_ns and entry.get("size") == stat.st_size
+
+    def stale(self, paths: Iterable[Any]) -> List[Path]:
+        """Return the decks in *paths* whose entry is missing or out of date."""
+
+        with self._lock:
+            entries = self._load()
+            return [
+                Path(path)
+                for path in paths
+                if not self._is_fresh(entries.get(_deck_key(path)), Path(path))
+            ]
+
+    def store(self, path: Any, entry: Dict[str, Any], *, save: bool = True) -> None:
+        """Record an *entry* built elsewhere, e.g. by :func:`build_entry` in a worker."""
+
+        with self._lock:
+            self._load()[_deck_key(path)] = entry
+            if save:
+                self.save()
+
+    def refresh(self, paths: Iterable[Any], *, prune: bool = False) -> List[str]:
+        """Rebuild stale entries for *paths* and return the keys rebuilt.
+
+        With *prune*, entries for decks that are not in *paths* are dropped.
+        """
+
+        with self._lock:
+            entries = self._load()
+            wanted = {_deck_key(path): Path(path) for path in paths}
+            rebuilt: List[str] = []
+            for key, deck_path in wanted.items():
+                if not self._is_fresh(entries.get(key), deck_path) and deck_path.exists():
+                    entries[key] = build_entry(deck_path)
+                    rebuilt.append(key)
+            removed = [key for key in entries if key not in wanted] if prune else []
+            removed.extend(key for key in wanted if key in entries and not wanted[key].exists())
+            for key in removed:
+                entries.pop(key, None)
+            if rebuilt or removed:
+                self.save()
+            return rebuilt
+
+    def list_decks(self, roots: Iterable[Any], *, suffix: str = ".json") -> List[str]:
+        """Return the deck files directly under *roots*.
+
+        A directory is scanned only when its mtime differs from the one
+        recorded with its listing; entries of decks that disappeared from
+        it are dropped then. Deck entries themselves are not rebuilt here.
+        """
+
+        files: List[str] = []
+        changed = False
+        with self._lock:
+            entries = self._load()
+            for root in roots:
+                root = Path(root)
+                key = _deck_key(root)
+                try:
+                    mtime_ns = root.stat().st_mtime_ns
+                except FileNotFoundError:
+                    changed = self._dirs.pop(key, None) is not None or changed
+                    continue
+                listing = self._dirs.get(key)
+                if listing is None or listing.get("mtime_ns") != mtime_ns:
+                    with os.scandir(root) as scan:
+                        names = [
+                            item.name
+                            for item in scan
+                            if item.name.endswith(suffix) and item.is_file()
+                        ]
+                    previous = set(listing.get("files", ())) if listing else set()
+                    for name in previous.difference(names):
+                        entries.pop(_deck_key(root / name), None)
+                    listing = self._dirs[key] = {"mtime_ns": mtime_ns, "files": names}
+                    changed = True
+                files.extend(str(root / name) for name in listing["files"])
+            if changed:
+                self.save()
+        return files
+
+    def get(self, path: Any) -> Optional[Dict[str, Any]]:
+        """Return the up-to-date entry for *path*, or ``None`` if it is missing."""
+
+        key = _deck_key(path)
+        with self._lock:
+            self.refresh([path])
+            entry = self._load().get(key)
+            return dict(entry) if entry is not None else None
+
+
+def entry_info(entry: Dict[str, Any]) -> List[Any]:
+    """Return the legacy ``[Name, CurrentNum, Completed, Learning]`` list."""
+
+    return [entry["name"], entry["current_num"], entry["completed"], entry["learning"]]
+
+
+__all__ = ["CATALOG_FORMAT", "DeckCatalog", "build_entry", "entry_info"]
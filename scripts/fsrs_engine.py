@@ -9,6 +9,8 @@ from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
 
+import numpy as np
+
 from scripts.card_state import CardState
 
 WEIGHTS_DIR = Path("res/weights")
@@ -172,6 +174,141 @@ def next_short_term_stability(stability: float, rating: str, cfg: WeightConfig)
     return round(max(stability * sinc, 0.1), 2)
 
 
+# ---------------------------------------------------------------------------
+# Batch (NumPy) equations
+# ---------------------------------------------------------------------------
+#
+# The batch kernels evaluate the equations above on whole arrays with the same
+# operations in the same order, so every +, -, * and / gives bit-identical
+# results. Only np.exp/np.power may differ from math.exp/math.pow in the last
+# bit. That can only change a rounded output when the unrounded value sits on
+# a rounding tie, so elements within _TIE_TOLERANCE of one are recomputed with
+# the scalar functions. Rounded outputs therefore equal the scalar ones
+# exactly.
+
+_TIE_TOLERANCE = 1e-6
+_GRADE_NAMES = {rating: name for name, rating in RATING_MAP.items()}
+
+
+def _near_tie(values: np.ndarray, scale: float = 1.0) -> np.ndarray:
+    scaled = values * scale
+    return np.abs(scaled - np.floor(scaled) - 0.5) < _TIE_TOLERANCE
+
+
+def _grade_array(grades: Any) -> np.ndarray:
+    array = np.asarray(grades)
+    if array.dtype.kind in "UO":
+        array = np.array([RATING_MAP[_normalise_grade(grade)] for grade in array.ravel()]).reshape(array.shape)
+    array = array.astype(np.int64)
+    if array.size and (array.min() < 1 or array.max() > 4):
+        raise ValueError("Grades must be between 1 (again) and 4 (easy)")
+    return array
+
+
+def predict_R_batch(stability: Any, elapsed_days: Any, config: Optional[WeightConfig] = None) -> np.ndarray:
+    """Array version of :func:`predict_R`."""
+
+    cfg = config or load_weights()
+    stability = np.maximum(np.asarray(stability, dtype=np.float64), 0.1)
+    elapsed_days = np.asarray(elapsed_days, dtype=np.float64)
+    return np.power(1 + cfg.base_factor * elapsed_days / stability, cfg.decay)
+
+
+def next_interval_batch(stability: Any, config: Optional[WeightConfig] = None) -> np.ndarray:
+    """Array version of :func:`next_interval`, returning ``int64`` days.
+
+    ``np.rint`` rounds half to even like :func:`round`, and the interval only
+    uses arithmetic, so no scalar fallback is needed.
+    """
+
+    cfg = config or load_weights()
+    stability = np.maximum(np.asarray(stability, dtype=np.float64), 0.1)
+    raw_interval = stability / cfg.base_factor * cfg.target_factor
+    interval = np.maximum(np.rint(raw_interval), 1)
+    return np.minimum(interval, cfg.maximum_interval).astype(np.int64)
+
+
+def review_batch(
+    stability: Any,
+    difficulty: Any,
+    elapsed: Any,
+    grades: Any,
+    cfg: Optional[WeightConfig] = None,
+) -> Dict[str, np.ndarray]:
+    """Apply one review to many cards at once.
+
+    Array version of the scheduling step in :func:`review`: zero stability or
+    difficulty means a new card, as in ``review``, and *grades* holds ratings
+    ``1``–``4`` or their names. Returns arrays keyed like ``review``'s
+    diagnostics: ``retrievability``, ``stability``, ``difficulty``,
+    ``interval_days`` and ``success``.
+    """
+
+    cfg = cfg or load_weights()
+    w = cfg.weights
+    grades = _grade_array(grades)
+    stability, difficulty, elapsed, grades = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(stability, dtype=np.float64)),
+        np.atleast_1d(np.asarray(difficulty, dtype=np.float64)),
+        np.atleast_1d(np.maximum(np.asarray(elapsed, dtype=np.float64), 0.0)),
+        np.atleast_1d(grades),
+    )
+    difficulty = np.where(difficulty > 0, difficulty, init_difficulty("good", cfg))
+    stability = np.where(stability > 0, stability, init_stability("good", cfg))
+    retrievability = predict_R_batch(stability, elapsed, cfg)
+
+    with np.errstate(over="ignore", invalid="ignore", divide="ignore"):
+        hard_penalty = np.where(grades == RATING_MAP["hard"], w[15], 1.0)
+        easy_bonus = np.where(grades == RATING_MAP["easy"], w[16], 1.0)
+        recall = stability * (
+            1
+            + math.exp(w[8])
+            * (11 - difficulty)
+            * np.power(stability, -w[9])
+            * (np.exp((1 - retrievability) * w[10]) - 1)
+            * hard_penalty
+            * easy_bonus
+        )
+        recall = np.maximum(recall, 0.1)
+        s_min = stability / math.exp(w[17] * w[18])
+        forget = (
+            w[11]
+            * np.power(difficulty, -w[12])
+            * (np.power(stability + 1, w[13]) - 1)
+            * np.exp((1 - retrievability) * w[14])
+        )
+        forget = np.minimum(forget, s_min)
+    success = grades != RATING_MAP["again"]
+    raw_stability = np.where(success, recall, forget)
+    new_stability = np.round(raw_stability, 2)
+
+    delta = -w[6] * (grades - 3)
+    next_d = difficulty + delta * (10 - difficulty) / 9
+    raw_difficulty = mean_reversion(init_difficulty("easy", cfg), next_d, cfg)
+    new_difficulty = np.clip(np.round(raw_difficulty, 2), 1.0, 10.0)
+
+    # Intervals are computed from the final stabilities, after the fix-up below.
+    unsafe = _near_tie(raw_stability, 100.0) | _near_tie(raw_difficulty, 100.0)
+    for index in zip(*np.nonzero(unsafe)):
+        rating = _GRADE_NAMES[int(grades[index])]
+        s, d = float(stability[index]), float(difficulty[index])
+        r = predict_R(s, float(elapsed[index]), cfg)
+        retrievability[index] = r
+        if rating == "again":
+            new_stability[index] = next_forget_stability(d, s, r, cfg)
+        else:
+            new_stability[index] = next_recall_stability(d, s, r, rating, cfg)
+        new_difficulty[index] = next_difficulty(d, rating, cfg)
+
+    return {
+        "retrievability": retrievability,
+        "stability": new_stability,
+        "difficulty": new_difficulty,
+        "interval_days": next_interval_batch(new_stability, cfg),
+        "success": success,
+    }
+
+
 # ---------------------------------------------------------------------------
 # Review workflow
 # ---------------------------------------------------------------------------
@@ -297,8 +434,11 @@ __all__ = [
     "next_difficulty",
     "next_forget_stability",
     "next_interval",
+    "next_interval_batch",
     "next_recall_stability",
     "next_short_term_stability",
     "predict_R",
+    "predict_R_batch",
     "review",
+    "review_batch",
 ]
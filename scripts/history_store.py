@@ -0,0 +1,96 @@
+"""Append-only archive of review history entries moved off card states.
+
+:class:`CardHistoryStore` keeps the history entries that no longer fit in a
+:class:`~scripts.card_state.CardState`'s recent window. Each line of the
+JSONL file holds a run of entries for one card together with the position of
+its first entry in the card's full history. Appends never read the file; a
+run spilled twice is written twice and the repeated entries are skipped
+when the file is read, which happens only when archived history is first
+requested.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+class CardHistoryStore:
+    """Archived history entries keyed by ``card_id``."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._entries: Dict[str, List[Dict[str, Any]]] = {}
+        self._signature: Optional[Tuple[int, int]] = None
+        self._loaded = False
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _ensure_loaded(self) -> None:
+        signature = self._stat()
+        if self._loaded and signature == self._signature:
+            return
+        entries: Dict[str, List[Dict[str, Any]]] = {}
+        if signature is not None:
+            with self.path.open("r", encoding="utf-8") as handle:
+                for line in handle:
+                    line = line.strip()
+                    if line:
+                        self._merge(entries, json.loads(line))
+        self._entries = entries
+        self._signature = signature
+        self._loaded = True
+
+    @staticmethod
+    def _merge(entries: Dict[str, List[Dict[str, Any]]], record: Dict[str, Any]) -> List[Dict[str, Any]]:
+        card_entries = entries.setdefault(str(record["card_id"]), [])
+        start = int(record.get("start", len(card_entries)))
+        fresh = list(record.get("entries", []))[max(len(card_entries) - start, 0):]
+        if start <= len(card_entries):
+            card_entries.extend(fresh)
+            return fresh
+        return []
+
+    def get(self, card_id: str) -> List[Dict[str, Any]]:
+        """Return a copy of the archived entries for *card_id*, oldest first."""
+
+        with self._lock:
+            self._ensure_loaded()
+            return [dict(entry) for entry in self._entries.get(str(card_id), [])]
+
+    def extend_many(self, runs: Iterable[Tuple[str, int, Sequence[Dict[str, Any]]]]) -> int:
+        """Append ``(card_id, start, entries)`` runs and return the entries written."""
+
+        lines: List[str] = []
+        records: List[Dict[str, Any]] = []
+        for card_id, start, entries in runs:
+            if not entries:
+                continue
+            record = {"card_id": str(card_id), "start": int(start), "entries": list(entries)}
+            records.append(record)
+            lines.append(json.dumps(record, ensure_ascii=False) + "\n")
+        if not lines:
+            return 0
+        with self._lock:
+            current = self._loaded and self._stat() == self._signature
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as handle:
+                handle.write("".join(lines))
+            if current:
+                # Keep an already loaded archive in step instead of re-reading it.
+                for record in records:
+                    self._merge(self._entries, record)
+                self._signature = self._stat()
+        return sum(len(record["entries"]) for record in records)
+
+
+__all__ = ["CardHistoryStore"]
@@ -0,0 +1,103 @@
+"""Compact delta encoding for review log entries.
+
+A full log entry embeds two complete ``CardState.to_storage_dict()`` copies
+(``before_state`` and ``after_state``), including the definition, examples and
+the card's whole ``history``. The delta encoding keeps only the scheduling
+fields: ``before`` holds their values before the review and ``delta`` holds
+the fields the review changed. Card content is referenced through
+``card_id`` and merged back in by :func:`expand_log_record`.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Mapping, Optional
+
+DELTA_ENCODING = "delta"
+SCHEDULING_FIELDS = (
+    "stability",
+    "difficulty",
+    "due_at",
+    "last_review_at",
+    "phase",
+    "lapses",
+    "repetitions",
+    "last_success_at",
+    "same_day_success",
+)
+# Fields of the embedded state that are never copied back from card content.
+_CONTENT_EXCLUDED = frozenset({"history"})
+
+
+def is_delta_record(record: Mapping[str, Any]) -> bool:
+    return record.get("encoding") == DELTA_ENCODING
+
+
+def _scheduling(state: Mapping[str, Any]) -> Dict[str, Any]:
+    return {name: state.get(name) for name in SCHEDULING_FIELDS if name in state}
+
+
+def encode_log_record(record: Mapping[str, Any]) -> Dict[str, Any]:
+    """Return *record* with its embedded states replaced by a delta.
+
+    Records that are already delta encoded, or that carry no
+    ``before_state``/``after_state`` mappings, are returned as a copy.
+    """
+
+    encoded = dict(record)
+    before = encoded.get("before_state")
+    after = encoded.get("after_state")
+    if is_delta_record(encoded) or not isinstance(before, Mapping) or not isinstance(after, Mapping):
+        return encoded
+    del encoded["before_state"]
+    del encoded["after_state"]
+    before_fields = _scheduling(before)
+    encoded["encoding"] = DELTA_ENCODING
+    encoded["before"] = before_fields
+    encoded["delta"] = {
+        name: value
+        for name, value in _scheduling(after).items()
+        if name not in before_fields or before_fields[name] != value
+    }
+    return encoded
+
+
+def expand_log_record(
+    record: Mapping[str, Any], content: Optional[Mapping[str, Any]] = None
+) -> Dict[str, Any]:
+    """Rebuild ``before_state``/``after_state`` for a delta encoded *record*.
+
+    Parameters
+    ----------
+    record:
+        A log entry. Full entries are returned unchanged (as a copy).
+    content:
+        Storage dict of the card referenced by ``card_id`` (for example its
+        current ``to_storage_dict()``). Supplies the non-scheduling fields;
+        ``history`` is not reconstructed.
+    """
+
+    expanded = dict(record)
+    if not is_delta_record(expanded):
+        return expanded
+    before_fields = expanded.pop("before", None) or {}
+    delta = expanded.pop("delta", None) or {}
+    del expanded["encoding"]
+    base = {
+        name: value
+        for name, value in (content or {}).items()
+        if name not in _CONTENT_EXCLUDED
+    }
+    base.setdefault("card_id", expanded.get("card_id"))
+    before_state = {**base, **before_fields}
+    expanded["before_state"] = before_state
+    expanded["after_state"] = {**before_state, **delta}
+    return expanded
+
+
+__all__ = [
+    "DELTA_ENCODING",
+    "SCHEDULING_FIELDS",
+    "encode_log_record",
+    "expand_log_record",
+    "is_delta_record",
+]
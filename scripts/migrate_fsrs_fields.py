@@ -4,9 +4,13 @@ from __future__ import annotations
 
 import argparse
 import json
+import os
+import time
 from collections.abc import Iterable, Iterator, MutableMapping
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional, Sequence
 
 
 def _constant(value: Any):
@@ -38,9 +42,14 @@ def _iter_vocab_files(paths: Iterable[Path]) -> Iterator[Path]:
 def _ensure_entry_defaults(entry: MutableMapping[str, Any]) -> bool:
     changed = False
     for field, factory in DEFAULT_FACTORIES.items():
-        if field not in entry or entry[field] is None:
+        if field not in entry:
             entry[field] = factory()
             changed = True
+        elif entry[field] is None:
+            default = factory()
+            if default is not None:
+                entry[field] = default
+                changed = True
 
     if not isinstance(entry.get("history"), list):
         entry["history"] = []
@@ -56,17 +65,67 @@ def migrate_file(path: Path, dry_run: bool = False) -> bool:
     for key, value in payload.items():
         if key == "XXX" or not isinstance(value, MutableMapping):
             continue
+        # Reference entries ({"ref": card_id}) take their fields from the source deck
+        if "ref" in value:
+            continue
         if _ensure_entry_defaults(value):
             changed = True
 
     if changed and not dry_run:
-        with path.open("w", encoding="utf-8") as handle:
-            json.dump(payload, handle, indent=4)
+        _write_json_atomic(path, payload)
 
     return changed
 
 
-def parse_args() -> argparse.Namespace:
+def _write_json_atomic(path: Path, payload: Dict[str, Any]) -> None:
+    """Write *payload* to a temporary file next to *path* and rename it over.
+
+    The JSON is compact and encoded in one ``json.dumps`` call, which runs
+    entirely in the C encoder; ``indent=4`` forces the slow pure-Python one.
+    """
+
+    tmp_path = path.with_name(path.name + ".tmp")
+    try:
+        with tmp_path.open("w", encoding="utf-8") as handle:
+            handle.write(json.dumps(payload, ensure_ascii=False))
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def migrate_files(paths: Iterable[Path], *, jobs: int = 1, dry_run: bool = False) -> List[Path]:
+    """Migrate *paths* on *jobs* worker processes and return the files changed.
+
+    ``jobs=0`` uses one worker per CPU; ``jobs=1`` migrates in this process.
+    """
+
+    if jobs < 0:
+        raise ValueError(f"jobs must be 0 or more, got {jobs}")
+    targets = list(paths)
+    jobs = jobs or os.cpu_count() or 1
+    migrate = partial(migrate_file, dry_run=dry_run)
+    if jobs == 1 or len(targets) < 2:
+        results = list(map(migrate, targets))
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(targets))) as executor:
+            results = list(executor.map(migrate, targets))
+    return [path for path, changed in zip(targets, results) if changed]
+
+
+def _job_count(text: str) -> int:
+    try:
+        jobs = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid job count: {text!r}") from None
+    if jobs < 0:
+        raise argparse.ArgumentTypeError(f"job count must be 0 or more, got {jobs}")
+    return jobs
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(
         description="Seed FSRS scheduling defaults in vocabulary JSON files."
     )
@@ -77,22 +136,28 @@ def parse_args() -> argparse.Namespace:
         default=[Path("res/ListBook"), Path("res/Vocab List")],
         help="Files or directories to process (defaults to res/ListBook and res/Vocab List).",
     )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=_job_count,
+        default=1,
+        help="Number of worker processes (0 uses one per CPU).",
+    )
     parser.add_argument(
         "--dry-run",
         action="store_true",
         help="Report changes without writing updated files.",
     )
-    return parser.parse_args()
+    return parser.parse_args(argv)
 
 
 def main() -> None:
     args = parse_args()
     targets = list(_iter_vocab_files(args.paths))
 
-    updated = []
-    for file_path in targets:
-        if migrate_file(file_path, dry_run=args.dry_run):
-            updated.append(file_path)
+    start = time.perf_counter()
+    updated = migrate_files(targets, jobs=args.jobs, dry_run=args.dry_run)
+    elapsed = time.perf_counter() - start
 
     if args.dry_run:
         action = "would update"
@@ -105,6 +170,8 @@ def main() -> None:
             print(f" - {file_path}")
     else:
         print("No changes required.")
+    jobs = args.jobs or os.cpu_count() or 1
+    print(f"Checked {len(targets)} file(s) in {elapsed:.2f}s with {jobs} job(s).")
 
 
 if __name__ == "__main__":
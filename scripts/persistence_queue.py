@@ -0,0 +1,280 @@
+"""Write-behind persistence for graded cards.
+
+:class:`WriteBehindQueue` collects card state upserts and review log entries
+produced by grading and writes them to :mod:`scripts.FileWork_v3` in groups.
+A batch is committed when it reaches ``max_batch`` entries, when the oldest
+pending entry is older than ``max_delay`` seconds, when :meth:`flush` is
+called (for example at the end of a study session) and when the interpreter
+exits.
+"""
+
+from __future__ import annotations
+
+import atexit
+import copy
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from scripts.card_state import CardState
+from scripts import FileWork_v3 as filework
+
+DEFAULT_MAX_BATCH = 32
+DEFAULT_MAX_DELAY = 2.0
+
+SaveStates = Callable[..., Any]
+AppendLogs = Callable[[Iterable[Mapping[str, Any]]], Any]
+
+
+def _snapshot(state: CardState) -> CardState:
+    """Copy *state* including its mutable containers."""
+
+    return state.replace(
+        history=copy.deepcopy(state.history),
+        custom_data=copy.deepcopy(state.custom_data),
+        metadata=copy.deepcopy(state.metadata),
+    )
+
+
+def _snapshot_log(log_entry: Mapping[str, Any]) -> Dict[str, Any]:
+    return {
+        field: value.to_storage_dict() if isinstance(value, CardState) else copy.deepcopy(value)
+        for field, value in log_entry.items()
+    }
+
+
+class WriteBehindQueue:
+    """Batch state upserts and log appends behind a background flusher.
+
+    Parameters
+    ----------
+    max_batch:
+        Number of pending grades that triggers an immediate flush.
+    max_delay:
+        Maximum time in seconds a grade may wait before it is written.
+    save_states / append_logs:
+        Persistence callables. Default to
+        :func:`scripts.FileWork_v3.save_card_states` and
+        :func:`scripts.FileWork_v3.append_review_logs`.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_batch: int = DEFAULT_MAX_BATCH,
+        max_delay: float = DEFAULT_MAX_DELAY,
+        save_states: Optional[SaveStates] = None,
+        append_logs: Optional[AppendLogs] = None,
+    ) -> None:
+        self.max_batch = max(int(max_batch), 1)
+        self.max_delay = max(float(max_delay), 0.0)
+        self._save_states = save_states or filework.save_card_states
+        self._append_logs = append_logs or filework.append_review_logs
+        self._states: Dict[Tuple[str, str], CardState] = {}
+        # States taken by the running flush; still pending until the write returns.
+        self._flushing: Dict[Tuple[str, str], CardState] = {}
+        self._logs: List[Mapping[str, Any]] = []
+        self._oldest: Optional[float] = None
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._closed = False
+
+    # ------------------------------------------------------------------
+    # Producer API
+    # ------------------------------------------------------------------
+    def enqueue(
+        self,
+        state: CardState,
+        log_entry: Optional[Mapping[str, Any]] = None,
+        *,
+        user_id: Optional[str] = None,
+    ) -> None:
+        """Queue *state* (and its review log entry) for persistence.
+
+        Repeated grades of the same card before a flush collapse into one
+        state upsert; every log entry is kept. Both are snapshotted here so
+        later changes to *state* by the caller do not leak into the write.
+        """
+
+        resolved_user = user_id or state.user_id or filework.DEFAULT_USER_ID
+        key = (str(resolved_user), str(state.card_id or state.word))
+        snapshot = _snapshot(state)
+        entry = _snapshot_log(log_entry) if log_entry is not None else None
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Cannot enqueue on a closed WriteBehindQueue")
+            self._states[key] = snapshot
+            if entry is not None:
+                self._logs.append(entry)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            self._ensure_worker()
+            self._condition.notify()
+
+    def enqueue_logs(self, log_entries: Iterable[Mapping[str, Any]]) -> None:
+        """Queue review log entries that have no accompanying state upsert."""
+
+        entries = [_snapshot_log(log_entry) for log_entry in log_entries]
+        if not entries:
+            return
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Cannot enqueue on a closed WriteBehindQueue")
+            self._logs.extend(entries)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            self._ensure_worker()
+            self._condition.notify()
+
+    def __len__(self) -> int:
+        with self._condition:
+            return max(len(self._states), len(self._logs))
+
+    def pending_states(
+        self, names: Iterable[str], *, user_id: Optional[str] = None
+    ) -> Dict[str, CardState]:
+        """Return copies of queued states for *names* that are not written yet.
+
+        A name matches a state's card id or word. States being written by a
+        running flush count as pending until that write returns; once a state
+        is flushed it is no longer reported here.
+        """
+
+        user_key = filework._normalise_user_id(user_id)
+        wanted = {str(name) for name in names}
+        found: Dict[str, CardState] = {}
+        with self._condition:
+            # Queued states are newer than the ones a flush is writing.
+            for pending in (self._flushing, self._states):
+                for (state_user, _), state in pending.items():
+                    if state_user != user_key:
+                        continue
+                    for name in {str(state.card_id or state.word), str(state.word)} & wanted:
+                        found[name] = _snapshot(state)
+        return found
+
+    # ------------------------------------------------------------------
+    # Flushing
+    # ------------------------------------------------------------------
+    def flush(self) -> int:
+        """Write every pending entry now and return the number of grades."""
+
+        with self._flush_lock:
+            with self._condition:
+                states = self._states
+                logs = self._logs
+                self._states = {}
+                self._logs = []
+                self._oldest = None
+                self._flushing = states
+            if not states and not logs:
+                return 0
+            try:
+                by_user: Dict[str, List[CardState]] = {}
+                for (user_key, _), state in states.items():
+                    by_user.setdefault(user_key, []).append(state)
+                for user_key, user_states in by_user.items():
+                    self._save_states(user_states, user_id=user_key)
+                if logs:
+                    self._append_logs(logs)
+            except Exception:
+                self._requeue(states, logs)
+                raise
+            finally:
+                with self._condition:
+                    self._flushing = {}
+            return max(len(states), len(logs))
+
+    def _requeue(
+        self,
+        states: Dict[Tuple[str, str], CardState],
+        logs: List[Mapping[str, Any]],
+    ) -> None:
+        with self._condition:
+            for key, state in states.items():
+                self._states.setdefault(key, state)
+            self._logs[:0] = logs
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+
+    def _due(self) -> bool:
+        if self._oldest is None:
+            return False
+        if max(len(self._states), len(self._logs)) >= self.max_batch:
+            return True
+        return time.monotonic() - self._oldest >= self.max_delay
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(
+                target=self._run, name="write-behind-flusher", daemon=True
+            )
+            self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._closed and not self._due():
+                    if self._oldest is None:
+                        self._condition.wait()
+                    else:
+                        remaining = self.max_delay - (time.monotonic() - self._oldest)
+                        self._condition.wait(timeout=max(remaining, 0.0))
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except Exception:
+                # Entries were re-queued; back off before the next attempt.
+                time.sleep(self.max_delay or 0.1)
+
+    def close(self) -> None:
+        """Stop the background flusher and write anything still pending."""
+
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        worker = self._worker
+        if worker is not None and worker is not threading.current_thread():
+            worker.join()
+        self.flush()
+
+
+_DEFAULT_QUEUE: Optional[WriteBehindQueue] = None
+_DEFAULT_QUEUE_LOCK = threading.Lock()
+
+
+def get_default_queue() -> WriteBehindQueue:
+    """Return the process-wide queue used by :mod:`scripts.review_service`."""
+
+    global _DEFAULT_QUEUE
+    with _DEFAULT_QUEUE_LOCK:
+        if _DEFAULT_QUEUE is None or _DEFAULT_QUEUE._closed:
+            _DEFAULT_QUEUE = WriteBehindQueue()
+        return _DEFAULT_QUEUE
+
+
+def _pending_default_states(names: Iterable[str], user_id: str) -> Dict[str, CardState]:
+    # Only an existing queue can hold pending states; reads never start one.
+    queue = _DEFAULT_QUEUE
+    return queue.pending_states(names, user_id=user_id) if queue is not None else {}
+
+
+filework.set_pending_state_source(_pending_default_states)
+
+
+@atexit.register
+def _flush_default_queue() -> None:
+    with _DEFAULT_QUEUE_LOCK:
+        queue = _DEFAULT_QUEUE
+    if queue is not None:
+        queue.close()
+
+
+__all__ = [
+    "DEFAULT_MAX_BATCH",
+    "DEFAULT_MAX_DELAY",
+    "WriteBehindQueue",
+    "get_default_queue",
+]
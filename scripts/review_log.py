@@ -0,0 +1,410 @@
+"""Time-segmented review log with per-segment indexes.
+
+:class:`SegmentedReviewLog` stores one user's review log as monthly JSONL
+segments (``review_log-2024-01.jsonl``). Segments for past months are closed
+by gzip-compressing them (``review_log-2024-01.jsonl.gz``). Each segment has a
+small sidecar index (``review_log-2024-01.idx.jsonl``) holding the card ids it
+mentions and the earliest/latest ``logged_at`` values, so queries only open
+the segments that can contain matching entries. Appends add one line to the
+index with the card ids they introduced; the index is rewritten only when
+its segment is rebuilt.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import re
+import shutil
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, IO, Iterable, Iterator, List, Mapping, Optional, Union
+
+from scripts.card_state import _format_datetime, _parse_datetime
+
+SEGMENT_PATTERN = re.compile(r"^(?P<stem>.+)-(?P<period>\d{4}-\d{2})\.jsonl(?P<gz>\.gz)?$")
+INDEX_FORMAT = 2
+
+TimeBound = Union[datetime, str, None]
+
+
+def _segment_period(record: Mapping[str, Any]) -> str:
+    logged_at = _parse_datetime(record.get("logged_at"))
+    if logged_at is None:
+        logged_at = datetime.now(tz=timezone.utc)
+    return logged_at.strftime("%Y-%m")
+
+
+class SegmentedReviewLog:
+    """Monthly review log segments for a single user.
+
+    Parameters
+    ----------
+    root:
+        Directory holding the segments, e.g. ``res/log/<user>``.
+    stem:
+        File name prefix of each segment. Defaults to ``"review_log"``.
+    legacy_path:
+        Optional unsegmented JSONL log. On first use its entries are split
+        into segments and the file is renamed with a ``.migrated`` suffix.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        *,
+        stem: str = "review_log",
+        legacy_path: Optional[Path] = None,
+    ) -> None:
+        self.root = Path(root)
+        self.stem = stem
+        self.legacy_path = Path(legacy_path) if legacy_path else None
+        self._lock = threading.RLock()
+        self._indexes: Dict[str, Dict[str, Any]] = {}
+        self._legacy_checked = False
+        # Month whose older segments have been rotated by this instance.
+        self._rotated_for: Optional[str] = None
+
+    # ------------------------------------------------------------------
+    # Paths
+    # ------------------------------------------------------------------
+    def segment_path(self, period: str, *, compressed: bool = False) -> Path:
+        suffix = ".jsonl.gz" if compressed else ".jsonl"
+        return self.root / f"{self.stem}-{period}{suffix}"
+
+    def index_path(self, period: str) -> Path:
+        return self.root / f"{self.stem}-{period}.idx.jsonl"
+
+    def _current_path(self, period: str) -> Path:
+        """Return the segment file for *period*.
+
+        If both a plain and a compressed segment exist (a rotation stopped
+        half way), the plain one is merged into the compressed one first.
+        """
+
+        plain = self.segment_path(period)
+        compressed = self.segment_path(period, compressed=True)
+        if not compressed.exists():
+            return plain
+        if plain.exists():
+            self._close_segment(plain, compressed)
+        return compressed
+
+    def periods(self) -> List[str]:
+        """Return the periods that have a segment, oldest first."""
+
+        found = set()
+        if self.root.exists():
+            for path in self.root.iterdir():
+                match = SEGMENT_PATTERN.match(path.name)
+                if match and match.group("stem") == self.stem:
+                    found.add(match.group("period"))
+        return sorted(found)
+
+    # ------------------------------------------------------------------
+    # Indexes
+    # ------------------------------------------------------------------
+    def _empty_index(self, path: Path) -> Dict[str, Any]:
+        return {
+            "format": INDEX_FORMAT,
+            "file": path.name,
+            "size": 0,
+            "count": 0,
+            "since": None,
+            "until": None,
+            "card_ids": set(),
+        }
+
+    def _scan_index(self, period: str, path: Path) -> Dict[str, Any]:
+        index = self._empty_index(path)
+        self._update_index(index, path, list(self._read_segment(path)))
+        return index
+
+    def _delta_line(self, index: Mapping[str, Any], card_ids: Iterable[str]) -> str:
+        delta = {
+            "size": index["size"],
+            "count": index["count"],
+            "since": index["since"],
+            "until": index["until"],
+            "card_ids": sorted(card_ids),
+        }
+        return json.dumps(delta, ensure_ascii=False) + "\n"
+
+    def _write_index(self, period: str, index: Dict[str, Any]) -> None:
+        path = self.index_path(period)
+        tmp_path = path.with_name(path.name + ".tmp")
+        header = {"format": INDEX_FORMAT, "file": index["file"]}
+        with tmp_path.open("w", encoding="utf-8") as handle:
+            handle.write(json.dumps(header, ensure_ascii=False) + "\n")
+            handle.write(self._delta_line(index, index["card_ids"]))
+        os.replace(tmp_path, path)
+        # Format 1 kept the whole index in one JSON document.
+        path.with_suffix(".json").unlink(missing_ok=True)
+        self._indexes[period] = index
+
+    def _append_index(self, period: str, index: Dict[str, Any], card_ids: Iterable[str]) -> None:
+        with self.index_path(period).open("a", encoding="utf-8") as handle:
+            handle.write(self._delta_line(index, card_ids))
+        self._indexes[period] = index
+
+    def _load_index(self, period: str) -> Optional[Dict[str, Any]]:
+        try:
+            handle = self.index_path(period).open("r", encoding="utf-8")
+        except OSError:
+            return None
+        with handle:
+            try:
+                header = json.loads(handle.readline())
+                if header.get("format") != INDEX_FORMAT:
+                    return None
+                index = self._empty_index(Path(header["file"]))
+                for line in handle:
+                    if not line.endswith("\n"):
+                        return None
+                    delta = json.loads(line)
+                    index["card_ids"].update(delta["card_ids"])
+                    index.update({field: delta[field] for field in ("size", "count", "since", "until")})
+            except (AttributeError, KeyError, TypeError, ValueError):
+                return None
+        return index
+
+    def segment_index(self, period: str) -> Dict[str, Any]:
+        """Return the index for *period*, rebuilding it if it is stale.
+
+        ``card_ids`` is a set of the card ids the segment mentions.
+        """
+
+        with self._lock:
+            path = self._current_path(period)
+            index = self._indexes.get(period)
+            if index is None:
+                index = self._load_index(period)
+            if (
+                index is None
+                or index.get("file") != path.name
+                or not path.exists()
+                or index.get("size") != path.stat().st_size
+            ):
+                if path.exists():
+                    index = self._scan_index(period, path)
+                    self._write_index(period, index)
+                else:
+                    index = self._empty_index(path)
+            self._indexes[period] = index
+            return index
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+    def append(self, records: Iterable[Mapping[str, Any]]) -> None:
+        """Append *records* to the segments matching their ``logged_at``."""
+
+        by_period: Dict[str, List[Mapping[str, Any]]] = {}
+        for record in records:
+            by_period.setdefault(_segment_period(record), []).append(record)
+        if not by_period:
+            return
+        current = datetime.now(tz=timezone.utc).strftime("%Y-%m")
+        with self._lock:
+            self._migrate_legacy()
+            if self._rotated_for != current:
+                self.rotate()
+            self.root.mkdir(parents=True, exist_ok=True)
+            for period, batch in sorted(by_period.items()):
+                index = self.segment_index(period)
+                path = self._current_path(period)
+                if period < current and path.suffix != ".gz":
+                    # Entries for a month that is already over go straight
+                    # into its closed segment.
+                    path = self.segment_path(period, compressed=True)
+                    index = self._empty_index(path)
+                known = index["card_ids"]
+                new_ids = {str(record.get("card_id")) for record in batch} - known
+                payload = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in batch)
+                if path.suffix == ".gz":
+                    # Late entries for a closed month become a new gzip member.
+                    with gzip.open(path, "at", encoding="utf-8") as handle:
+                        handle.write(payload)
+                else:
+                    with path.open("a", encoding="utf-8") as handle:
+                        handle.write(payload)
+                fresh = index["size"] == 0
+                self._update_index(index, path, batch)
+                if fresh:
+                    self._write_index(period, index)
+                else:
+                    self._append_index(period, index, new_ids)
+
+    def _update_index(
+        self, index: Dict[str, Any], path: Path, batch: List[Mapping[str, Any]]
+    ) -> None:
+        card_ids = index["card_ids"]
+        since = _parse_datetime(index.get("since"))
+        until = _parse_datetime(index.get("until"))
+        for record in batch:
+            card_ids.add(str(record.get("card_id")))
+            logged_at = _parse_datetime(record.get("logged_at"))
+            if logged_at is not None:
+                since = logged_at if since is None or logged_at < since else since
+                until = logged_at if until is None or logged_at > until else until
+        index.update(
+            {
+                "file": path.name,
+                "size": path.stat().st_size,
+                "count": int(index.get("count", 0)) + len(batch),
+                "since": _format_datetime(since),
+                "until": _format_datetime(until),
+            }
+        )
+
+    def rotate(self, now: Optional[datetime] = None) -> List[Path]:
+        """Compress every segment older than the month of *now*.
+
+        :meth:`append` calls this once per month, the first time it runs in
+        a new month.
+        """
+
+        current = (now or datetime.now(tz=timezone.utc)).strftime("%Y-%m")
+        closed: List[Path] = []
+        with self._lock:
+            for period in self.periods():
+                plain = self.segment_path(period)
+                if period >= current or not plain.exists():
+                    continue
+                compressed = self.segment_path(period, compressed=True)
+                self._close_segment(plain, compressed)
+                index = self._scan_index(period, compressed)
+                self._write_index(period, index)
+                closed.append(compressed)
+            if now is None:
+                self._rotated_for = current
+        return closed
+
+    def _close_segment(self, plain: Path, compressed: Path) -> None:
+        """Move *plain* into *compressed* as a new gzip member.
+
+        The compressed file is replaced atomically before *plain* is deleted.
+        If an earlier run stopped between those steps, *compressed* already
+        ends with the content of *plain* and only *plain* is removed.
+        """
+
+        if compressed.exists():
+            with gzip.open(compressed, "rb") as handle:
+                if handle.read().endswith(plain.read_bytes()):
+                    plain.unlink()
+                    return
+        tmp_path = compressed.with_name(compressed.name + ".tmp")
+        with tmp_path.open("wb") as target:
+            if compressed.exists():
+                with compressed.open("rb") as existing:
+                    shutil.copyfileobj(existing, target)
+            with plain.open("rb") as source, gzip.GzipFile(fileobj=target, mode="wb") as member:
+                shutil.copyfileobj(source, member, 1 << 20)
+        os.replace(tmp_path, compressed)
+        plain.unlink()
+
+    def rewrite(self, transform: Callable[[Dict[str, Any]], Dict[str, Any]]) -> int:
+        """Pass every entry through *transform* and rewrite the segments.
+
+        Each segment is written to a temporary file (compressed if the
+        segment is closed) and swapped in atomically. Returns the number of
+        entries the transform changed.
+        """
+
+        changed = 0
+        with self._lock:
+            self._migrate_legacy()
+            for period in self.periods():
+                path = self._current_path(period)
+                tmp_path = path.with_name(path.name + ".tmp")
+                opener = gzip.open if path.suffix == ".gz" else open
+                with opener(tmp_path, "wt", encoding="utf-8") as handle:
+                    for record in self._read_segment(path):
+                        updated = transform(record)
+                        if updated != record:
+                            changed += 1
+                        handle.write(json.dumps(updated, ensure_ascii=False) + "\n")
+                os.replace(tmp_path, path)
+                self._write_index(period, self._scan_index(period, path))
+        return changed
+
+    def _migrate_legacy(self) -> None:
+        if self._legacy_checked:
+            return
+        self._legacy_checked = True
+        if self.legacy_path is None or not self.legacy_path.exists():
+            return
+        batch: List[Dict[str, Any]] = []
+        with self.legacy_path.open("r", encoding="utf-8") as handle:
+            for line in handle:
+                line = line.strip()
+                if line:
+                    batch.append(json.loads(line))
+                if len(batch) >= 5000:
+                    self.append(batch)
+                    batch = []
+        if batch:
+            self.append(batch)
+        self.legacy_path.replace(self.legacy_path.with_name(self.legacy_path.name + ".migrated"))
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+    def _open_segment(self, path: Path) -> IO[str]:
+        if path.suffix == ".gz":
+            return gzip.open(path, "rt", encoding="utf-8")
+        return path.open("r", encoding="utf-8")
+
+    def _read_segment(self, path: Path) -> Iterator[Dict[str, Any]]:
+        with self._open_segment(path) as handle:
+            for line in handle:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+    def query(
+        self,
+        *,
+        card_id: Optional[str] = None,
+        since: TimeBound = None,
+        until: TimeBound = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield log entries matching *card_id* and the ``[since, until]`` range.
+
+        Segments whose index shows they cannot match are never opened.
+        """
+
+        since_dt = _parse_datetime(since)
+        until_dt = _parse_datetime(until)
+        with self._lock:
+            self._migrate_legacy()
+            candidates: List[Path] = []
+            for period in self.periods():
+                index = self.segment_index(period)
+                if card_id is not None and str(card_id) not in index.get("card_ids", ()):
+                    continue
+                seg_since = _parse_datetime(index.get("since"))
+                seg_until = _parse_datetime(index.get("until"))
+                if until_dt is not None and seg_since is not None and seg_since > until_dt:
+                    continue
+                if since_dt is not None and seg_until is not None and seg_until < since_dt:
+                    continue
+                candidates.append(self._current_path(period))
+        for path in candidates:
+            for record in self._read_segment(path):
+                if card_id is not None and str(record.get("card_id")) != str(card_id):
+                    continue
+                if since_dt is not None or until_dt is not None:
+                    logged_at = _parse_datetime(record.get("logged_at"))
+                    if logged_at is None:
+                        continue
+                    if since_dt is not None and logged_at < since_dt:
+                        continue
+                    if until_dt is not None and logged_at > until_dt:
+                        continue
+                yield record
+
+
+__all__ = ["SegmentedReviewLog"]
@@ -3,23 +3,112 @@
 from __future__ import annotations
 
 import asyncio
+import atexit
+import threading
 from bisect import bisect_left
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
-from typing import Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+from functools import partial
+from typing import Any, Coroutine, Deque, Dict, Iterable, List, Optional, Sequence, Tuple, TypeVar
 
 from scripts.card_state import CardState
 from scripts import FileWork_v3 as filework
-from scripts.fsrs_engine import load_weights, review
+from scripts.fsrs_engine import WeightConfig, load_weights, review
+from scripts.persistence_queue import get_default_queue
 
 DEFAULT_DAILY_NEW_CAP = 20
 
+T = TypeVar("T")
+
 
 def _utc_now() -> datetime:
     return datetime.now(tz=timezone.utc)
 
 
+class ReviewSession:
+    """Long-lived event loop and I/O executor for one app session.
+
+    The loop runs on a daemon thread so synchronous UI callbacks can submit
+    coroutines to it without starting a loop per grade. Blocking work (weight
+    loading and handing writes to the write-behind queue) runs on a
+    single-thread executor, which keeps writes in submission order.
+    """
+
+    def __init__(self, *, io_workers: int = 1) -> None:
+        self.executor = ThreadPoolExecutor(
+            max_workers=max(int(io_workers), 1), thread_name_prefix="review-io"
+        )
+        self.loop = asyncio.new_event_loop()
+        self.loop.set_default_executor(self.executor)
+        self._thread = threading.Thread(target=self._run, name="review-loop", daemon=True)
+        self._thread.start()
+        self.closed = False
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def run(self, coro: Coroutine[Any, Any, T], timeout: Optional[float] = None) -> T:
+        """Run *coro* on the session loop and block until it finishes."""
+
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("ReviewSession.run cannot be called from the session loop")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def close(self) -> None:
+        """Stop the loop and wait for queued I/O to finish."""
+
+        if self.closed:
+            return
+        self.closed = True
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+        self.executor.shutdown(wait=True)
+
+
+_SESSION: Optional[ReviewSession] = None
+_SESSION_LOCK = threading.Lock()
+
+
+def get_session() -> ReviewSession:
+    """Return the process-wide :class:`ReviewSession`, starting it if needed."""
+
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is None or _SESSION.closed:
+            _SESSION = ReviewSession()
+        return _SESSION
+
+
+@atexit.register
+def close_session() -> None:
+    with _SESSION_LOCK:
+        session = _SESSION
+    if session is not None:
+        session.close()
+
+
+def _log_entry(state: CardState, diagnostics: Dict[str, object], weights: WeightConfig) -> Dict[str, object]:
+    """Return the review log entry for *state* as updated by :func:`review`."""
+
+    return {
+        "user_id": state.user_id,
+        "card_id": state.card_id or state.word,
+        "grade": diagnostics["grade"],
+        "interval_days": diagnostics["interval_days"],
+        "success": diagnostics["success"],
+        "w_version": state.w_version or weights.version,
+        "before_state": diagnostics["before_state"],
+        "after_state": diagnostics["after_state"],
+        "short_term_delay_seconds": diagnostics.get("short_term_delay_seconds"),
+        "retrievability": diagnostics.get("retrievability"),
+    }
+
+
 async def submit_grade(
     state: CardState,
     grade: str,
@@ -28,29 +117,26 @@ async def submit_grade(
     event_time: Optional[datetime] = None,
     weights_version: Optional[str] = None,
 ) -> Tuple[CardState, Dict[str, object]]:
-    """Record a review *grade* for *state* and persist the updated data."""
+    """Record a review *grade* for *state* and queue the updated data.
 
+    Weight loading and the hand-off to the write-behind queue run on the
+    session's I/O executor, so the calling loop is never blocked on disk.
+    Call :func:`flush` to force queued grades to disk.
+    """
+
+    loop = asyncio.get_running_loop()
+    executor = get_session().executor
     event_dt = event_time.astimezone(timezone.utc) if event_time else _utc_now()
-    weights = load_weights(weights_version or state.w_version)
+    weights = await loop.run_in_executor(executor, load_weights, weights_version or state.w_version)
 
     updated_state, diagnostics = review(state, grade, event_dt, weights=weights)
     resolved_user = user_id or updated_state.user_id or filework.DEFAULT_USER_ID
     updated_state.user_id = resolved_user
-    filework.save_card_state(updated_state, user_id=resolved_user)
-
-    filework.append_review_log(
-        {
-            "user_id": resolved_user,
-            "card_id": updated_state.card_id or updated_state.word,
-            "grade": diagnostics["grade"],
-            "interval_days": diagnostics["interval_days"],
-            "success": diagnostics["success"],
-            "w_version": updated_state.w_version or weights.version,
-            "before_state": diagnostics["before_state"],
-            "after_state": diagnostics["after_state"],
-            "short_term_delay_seconds": diagnostics.get("short_term_delay_seconds"),
-            "retrievability": diagnostics.get("retrievability"),
-        }
+
+    log_entry = _log_entry(updated_state, diagnostics, weights)
+    await loop.run_in_executor(
+        executor,
+        partial(get_default_queue().enqueue, updated_state, log_entry, user_id=resolved_user),
     )
 
     return updated_state, diagnostics
@@ -64,9 +150,9 @@ def submit_grade_sync(
     event_time: Optional[datetime] = None,
     weights_version: Optional[str] = None,
 ) -> Tuple[CardState, Dict[str, object]]:
-    """Synchronous wrapper around :func:`submit_grade`."""
+    """Synchronous wrapper around :func:`submit_grade` using the session loop."""
 
-    return asyncio.run(
+    return get_session().run(
         submit_grade(
             state,
             grade,
@@ -77,6 +163,19 @@ def submit_grade_sync(
     )
 
 
+async def flush_async() -> int:
+    """Write all queued grades on the I/O executor after pending submissions."""
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_session().executor, get_default_queue().flush)
+
+
+def flush() -> int:
+    """Write all queued grades to the state store and review log now."""
+
+    return get_session().run(flush_async())
+
+
 @dataclass
 class QueueSnapshot:
     review_due: int
@@ -154,15 +253,7 @@ class ReviewQueueManager:
             else:
                 deck_cards = deck_states
             cards.extend(deck_cards)
-        stored_states = filework.load_card_states(user_id)
-        for card in cards:
-            key = card.card_id or card.word
-            if key in stored_states:
-                stored = stored_states[key]
-                stored.definition = card.definition
-                stored.example = card.example
-                stored.word = card.word
-                card.update_from_storage(stored.to_storage_dict())
+        # readFromJson has already merged the stored and queued states
         return cls(cards, daily_new_cap=daily_new_cap)
 
     def queue_counts(self) -> QueueSnapshot:
@@ -242,6 +333,11 @@ class ReviewQueueManager:
 __all__ = [
     "QueueSnapshot",
     "ReviewQueueManager",
+    "ReviewSession",
+    "close_session",
+    "flush",
+    "flush_async",
+    "get_session",
     "submit_grade",
     "submit_grade_sync",
 ]
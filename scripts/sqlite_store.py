@@ -0,0 +1,374 @@
+"""SQLite backend for card scheduling state and review logs.
+
+:class:`SQLiteStateStore` exposes the same record-level API as
+:class:`scripts.state_store.CardStateStore` so :mod:`scripts.FileWork_v3` can
+route its storage calls to either backend. Card states live in a table keyed
+by ``(user_id, card_id)`` with secondary indexes on ``due_at`` and ``phase``;
+review log entries are kept in their own table. The indexed ``due_at`` and
+``logged_at`` columns hold timestamps as fixed-width UTC text (see
+:func:`_sort_key`), so comparing them as strings compares the times they
+stand for; the stored records keep the original values.
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from scripts.card_state import _parse_datetime
+from scripts.state_store import KeyFunc, StateKey
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS card_state (
+    user_id TEXT NOT NULL,
+    card_id TEXT NOT NULL,
+    word TEXT,
+    due_at TEXT,
+    phase TEXT,
+    record TEXT NOT NULL,
+    PRIMARY KEY (user_id, card_id)
+);
+CREATE INDEX IF NOT EXISTS idx_card_state_due ON card_state (user_id, due_at);
+CREATE INDEX IF NOT EXISTS idx_card_state_phase ON card_state (user_id, phase);
+CREATE INDEX IF NOT EXISTS idx_card_state_word ON card_state (user_id, word);
+CREATE TABLE IF NOT EXISTS review_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    card_id TEXT NOT NULL,
+    logged_at TEXT,
+    grade TEXT,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_review_log_card ON review_log (user_id, card_id, logged_at);
+CREATE INDEX IF NOT EXISTS idx_review_log_time ON review_log (logged_at);
+"""
+
+# SQLite limits the number of bound parameters per statement.
+_MAX_VARIABLES = 900
+
+_SORT_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+
+
+def _sort_key(value: Any) -> Optional[str]:
+    """Return *value* as fixed-width UTC text whose string order is time order.
+
+    ``2024-01-02T00:00:00Z`` and ``2024-01-02T00:00:00.5+00:00`` do not sort
+    as the times they name; both become ``2024-01-02T00:00:00.000000Z`` and
+    ``2024-01-02T00:00:00.500000Z``. Unparseable values give ``None``.
+    """
+
+    parsed = _parse_datetime(value)
+    return parsed.strftime(_SORT_FORMAT) if parsed is not None else None
+
+
+def _state_columns(key: StateKey, record: Mapping[str, Any]) -> Tuple[Any, ...]:
+    payload = record.get("state")
+    state = payload if isinstance(payload, Mapping) else record
+    return (
+        key[0],
+        key[1],
+        record.get("word"),
+        _sort_key(state.get("due_at")),
+        state.get("phase"),
+        json.dumps(record, ensure_ascii=False),
+    )
+
+
+class SQLiteStateStore:
+    """Card state and review log storage backed by a single SQLite file."""
+
+    def __init__(self, path: Path, *, key: KeyFunc) -> None:
+        self.path = Path(path)
+        self._key = key
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._writes = 0
+
+    # ------------------------------------------------------------------
+    # Connection handling
+    # ------------------------------------------------------------------
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    @property
+    def version(self) -> Tuple[int, int]:
+        """Token that changes when this or another connection modifies states."""
+
+        with self._lock:
+            data_version = self.connection.execute("PRAGMA data_version").fetchone()[0]
+            return data_version, self._writes
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def compact(self) -> None:
+        """Reclaim free pages left behind by updates."""
+
+        with self._lock:
+            self.connection.execute("VACUUM")
+
+    # ------------------------------------------------------------------
+    # Card state queries
+    # ------------------------------------------------------------------
+    def get(self, key: StateKey) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT record FROM card_state WHERE user_id = ? AND card_id = ?",
+                (key[0], key[1]),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_many(self, keys: Iterable[StateKey]) -> Dict[StateKey, Dict[str, Any]]:
+        """Fetch the records for *keys* using the primary key index."""
+
+        by_user: Dict[str, List[str]] = {}
+        for user_id, card_id in keys:
+            by_user.setdefault(user_id, []).append(card_id)
+        found: Dict[StateKey, Dict[str, Any]] = {}
+        with self._lock:
+            for user_id, card_ids in by_user.items():
+                for start in range(0, len(card_ids), _MAX_VARIABLES):
+                    chunk = card_ids[start : start + _MAX_VARIABLES]
+                    placeholders = ",".join("?" for _ in chunk)
+                    rows = self.connection.execute(
+                        "SELECT card_id, record FROM card_state "
+                        f"WHERE user_id = ? AND card_id IN ({placeholders})",
+                        (user_id, *chunk),
+                    )
+                    for card_id, record in rows:
+                        found[(user_id, card_id)] = json.loads(record)
+        return found
+
+    def find(self, user_id: str, names: Sequence[str]) -> List[Dict[str, Any]]:
+        """Return *user_id*'s records whose ``card_id`` or ``word`` is in *names*."""
+
+        found: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            for column in ("card_id", "word"):
+                for start in range(0, len(names), _MAX_VARIABLES):
+                    chunk = list(names[start : start + _MAX_VARIABLES])
+                    placeholders = ",".join("?" for _ in chunk)
+                    rows = self.connection.execute(
+                        "SELECT card_id, record FROM card_state "
+                        f"WHERE user_id = ? AND {column} IN ({placeholders})",
+                        (user_id, *chunk),
+                    )
+                    for card_id, record in rows:
+                        if card_id not in found:
+                            found[card_id] = json.loads(record)
+        return list(found.values())
+
+    def records(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self.connection.execute("SELECT record FROM card_state").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def records_for_user(self, user_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT record FROM card_state WHERE user_id = ?", (user_id,)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def due_records(
+        self,
+        user_id: str,
+        due_before: str,
+        *,
+        phases: Optional[Sequence[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Return records for *user_id* due at or before the ISO timestamp."""
+
+        query = "SELECT record FROM card_state WHERE user_id = ? AND due_at <= ?"
+        params: List[Any] = [user_id, _sort_key(due_before)]
+        if phases:
+            query += f" AND phase IN ({','.join('?' for _ in phases)})"
+            params.extend(phases)
+        query += " ORDER BY due_at"
+        with self._lock:
+            rows = self.connection.execute(query, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.connection.execute("SELECT COUNT(*) FROM card_state").fetchone()[0]
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.records())
+
+    # ------------------------------------------------------------------
+    # Card state updates
+    # ------------------------------------------------------------------
+    def put(self, record: Mapping[str, Any]) -> Dict[str, Any]:
+        return self.put_many([record])[0]
+
+    def put_many(self, records: Iterable[Mapping[str, Any]]) -> List[Dict[str, Any]]:
+        prepared = [dict(record) for record in records]
+        if not prepared:
+            return []
+        rows = [_state_columns(self._key(record), record) for record in prepared]
+        with self._lock:
+            with self.connection:
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO card_state "
+                    "(user_id, card_id, word, due_at, phase, record) VALUES (?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+            self._writes += 1
+        return prepared
+
+    # ------------------------------------------------------------------
+    # Review log
+    # ------------------------------------------------------------------
+    def append_log(self, record: Mapping[str, Any]) -> None:
+        self.append_logs([record])
+
+    def append_logs(self, records: Iterable[Mapping[str, Any]]) -> None:
+        rows = [
+            (
+                str(record["user_id"]),
+                str(record["card_id"]),
+                _sort_key(record.get("logged_at")),
+                record.get("grade"),
+                json.dumps(record, ensure_ascii=False),
+            )
+            for record in records
+        ]
+        if not rows:
+            return
+        with self._lock:
+            with self.connection:
+                self.connection.executemany(
+                    "INSERT INTO review_log (user_id, card_id, logged_at, grade, record) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+
+    def iter_logs(
+        self,
+        *,
+        user_id: Optional[str] = None,
+        card_id: Optional[str] = None,
+        since: Any = None,
+        until: Any = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield log entries in insertion order, optionally filtered.
+
+        *since* and *until* are inclusive ``logged_at`` bounds given as
+        datetimes or ISO-8601 strings.
+        """
+
+        query = "SELECT record FROM review_log"
+        clauses: List[str] = []
+        params: List[Any] = []
+        if user_id is not None:
+            clauses.append("user_id = ?")
+            params.append(user_id)
+        if card_id is not None:
+            clauses.append("card_id = ?")
+            params.append(card_id)
+        for bound, operator in ((since, ">="), (until, "<=")):
+            text = _sort_key(bound)
+            if text is not None:
+                clauses.append(f"logged_at {operator} ?")
+                params.append(text)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY id"
+        with self._lock:
+            rows = self.connection.execute(query, params).fetchall()
+        for row in rows:
+            yield json.loads(row[0])
+
+    def rewrite_logs(
+        self,
+        transform: Callable[[Dict[str, Any]], Dict[str, Any]],
+        *,
+        batch_size: int = 5000,
+    ) -> int:
+        """Pass every log entry through *transform*, storing changed entries."""
+
+        changed = 0
+        last_id = 0
+        with self._lock:
+            while True:
+                rows = self.connection.execute(
+                    "SELECT id, record FROM review_log WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, batch_size),
+                ).fetchall()
+                if not rows:
+                    return changed
+                updates = []
+                for row_id, text in rows:
+                    record = json.loads(text)
+                    updated = transform(record)
+                    if updated != record:
+                        updates.append((json.dumps(updated, ensure_ascii=False), row_id))
+                with self.connection:
+                    self.connection.executemany(
+                        "UPDATE review_log SET record = ? WHERE id = ?", updates
+                    )
+                changed += len(updates)
+                last_id = rows[-1][0]
+
+    # ------------------------------------------------------------------
+    # Import
+    # ------------------------------------------------------------------
+    def import_jsonl(
+        self,
+        state_path: Optional[Path] = None,
+        log_path: Optional[Path] = None,
+        *,
+        batch_size: int = 5000,
+    ) -> Tuple[int, int]:
+        """Load existing ``card_state.jsonl``/``review_log.jsonl`` files.
+
+        Returns the number of state and log lines imported. State lines are
+        upserted in file order, so the latest record for a key wins.
+        """
+
+        state_count = 0
+        log_count = 0
+        if state_path is not None:
+            for batch in _iter_jsonl_batches(Path(state_path), batch_size):
+                self.put_many(batch)
+                state_count += len(batch)
+        if log_path is not None:
+            for batch in _iter_jsonl_batches(Path(log_path), batch_size):
+                self.append_logs(batch)
+                log_count += len(batch)
+        return state_count, log_count
+
+
+def _iter_jsonl_batches(path: Path, batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    if not path.exists():
+        return
+    batch: List[Dict[str, Any]] = []
+    with path.open("r", encoding="utf-8") as handle:
+        for line in handle:
+            line = line.strip()
+            if not line:
+                continue
+            batch.append(json.loads(line))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+__all__ = ["SCHEMA", "SQLiteStateStore"]
@@ -0,0 +1,275 @@
+"""Byte-offset index for point lookups in ``card_state.jsonl``.
+
+:class:`StateOffsetIndex` maintains a sidecar file (``card_state.jsonl.idx``)
+mapping ``(user_id, card_id)`` to the byte offset and length of the latest
+record for that key. Lookups slice the records out of a memory map of the
+state file instead of parsing it, so opening a 20-card deck reads 20 lines
+no matter how large the store is.
+
+The state file is append-only between compactions, so the index is brought
+up to date by scanning only the bytes appended since it was last saved. The
+sidecar is append-only too: a header line followed by one line per refresh
+holding only the offsets that refresh found. A compaction replaces the file
+(new inode, usually a smaller size and different bytes at the indexed
+boundary), which triggers a full rebuild and the only full rewrite of the
+sidecar.
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from scripts.state_store import KeyFunc, StateKey
+
+INDEX_FORMAT = 2
+INDEX_SUFFIX = ".idx"
+_KEY_SEPARATOR = "\x1f"
+# Bytes before the indexed boundary compared to detect a rewritten file.
+_BOUNDARY_BYTES = 64
+
+
+def _encode_key(key: StateKey) -> str:
+    return f"{key[0]}{_KEY_SEPARATOR}{key[1]}"
+
+
+def _decode_key(text: str) -> StateKey:
+    user_id, _, card_id = text.partition(_KEY_SEPARATOR)
+    return user_id, card_id
+
+
+class StateOffsetIndex:
+    """Sidecar ``(user_id, card_id) -> (offset, length)`` index.
+
+    Parameters
+    ----------
+    path:
+        The JSONL state file being indexed.
+    key:
+        Callable that extracts the ``(user_id, card_id)`` key from a record.
+    index_path:
+        Location of the sidecar. Defaults to ``<path>.idx``.
+    """
+
+    def __init__(self, path: Path, *, key: KeyFunc, index_path: Optional[Path] = None) -> None:
+        self.path = Path(path)
+        self.index_path = Path(index_path) if index_path else self.path.with_name(
+            self.path.name + INDEX_SUFFIX
+        )
+        self._key = key
+        self._lock = threading.RLock()
+        self._entries: Dict[StateKey, Tuple[int, int]] = {}
+        self._words: Dict[StateKey, str] = {}
+        self._inode: Optional[int] = None
+        self._size = 0
+        self._boundary = ""
+        self._loaded = False
+        # False when the sidecar on disk cannot simply be appended to.
+        self._sidecar_ok = False
+
+    # ------------------------------------------------------------------
+    # Sidecar persistence
+    # ------------------------------------------------------------------
+    def _load_sidecar(self) -> None:
+        self._loaded = True
+        self._sidecar_ok = False
+        try:
+            handle = self.index_path.open("rb")
+        except OSError:
+            return
+        with handle:
+            try:
+                header = json.loads(handle.readline())
+            except ValueError:
+                return
+            if not isinstance(header, dict) or header.get("format") != INDEX_FORMAT:
+                return
+            self._inode = header.get("inode")
+            for raw in handle:
+                try:
+                    if not raw.endswith(b"\n"):
+                        raise ValueError("truncated sidecar line")
+                    delta = json.loads(raw)
+                    size = int(delta["size"])
+                    boundary = str(delta["boundary"])
+                    entries = {
+                        _decode_key(text): (int(span[0]), int(span[1]))
+                        for text, span in delta.get("entries", {}).items()
+                    }
+                    words = {
+                        _decode_key(text): str(card_id)
+                        for text, card_id in delta.get("words", {}).items()
+                    }
+                except (KeyError, TypeError, ValueError):
+                    # Keep what the complete lines describe; the next refresh
+                    # re-scans from there and rewrites the sidecar.
+                    return
+                self._entries.update(entries)
+                self._words.update(words)
+                self._size = size
+                self._boundary = boundary
+        self._sidecar_ok = True
+
+    def _delta_line(
+        self, entries: Dict[StateKey, Tuple[int, int]], words: Dict[StateKey, str]
+    ) -> str:
+        delta = {
+            "size": self._size,
+            "boundary": self._boundary,
+            "entries": {_encode_key(key): list(span) for key, span in entries.items()},
+            "words": {_encode_key(key): card_id for key, card_id in words.items()},
+        }
+        return json.dumps(delta, ensure_ascii=False) + "\n"
+
+    def _rewrite_sidecar(self) -> None:
+        header = {"format": INDEX_FORMAT, "inode": self._inode}
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_name(self.index_path.name + ".tmp")
+        with tmp_path.open("w", encoding="utf-8") as handle:
+            handle.write(json.dumps(header) + "\n")
+            handle.write(self._delta_line(self._entries, self._words))
+        os.replace(tmp_path, self.index_path)
+        self._sidecar_ok = True
+
+    def _append_sidecar(
+        self, entries: Dict[StateKey, Tuple[int, int]], words: Dict[StateKey, str]
+    ) -> None:
+        with self.index_path.open("a", encoding="utf-8") as handle:
+            handle.write(self._delta_line(entries, words))
+
+    def _reset(self) -> None:
+        self._entries = {}
+        self._words = {}
+        self._inode = None
+        self._size = 0
+        self._boundary = ""
+
+    # ------------------------------------------------------------------
+    # Refresh
+    # ------------------------------------------------------------------
+    def _read_boundary(self, handle: Any, size: int) -> str:
+        start = max(size - _BOUNDARY_BYTES, 0)
+        handle.seek(start)
+        return handle.read(size - start).hex()
+
+    def refresh(self) -> bool:
+        """Bring the index up to date with the state file.
+
+        Returns ``True`` when the index changed.
+        """
+
+        with self._lock:
+            if not self._loaded:
+                self._load_sidecar()
+            try:
+                stat = self.path.stat()
+            except FileNotFoundError:
+                changed = bool(self._entries) or self._size != 0
+                self._reset()
+                self._sidecar_ok = False
+                if changed and self.index_path.exists():
+                    self.index_path.unlink()
+                return changed
+            if stat.st_ino == self._inode and stat.st_size == self._size:
+                return False
+            with self.path.open("rb") as handle:
+                start = self._size
+                rebuilt = (
+                    stat.st_ino != self._inode
+                    or stat.st_size < self._size
+                    or self._read_boundary(handle, self._size) != self._boundary
+                )
+                if rebuilt:
+                    self._reset()
+                    start = 0
+                entries, words = self._scan(handle, start)
+                self._inode = stat.st_ino
+                self._boundary = self._read_boundary(handle, self._size)
+            if rebuilt or not self._sidecar_ok:
+                self._rewrite_sidecar()
+            elif self._size != start:
+                self._append_sidecar(entries, words)
+            return True
+
+    def _scan(
+        self, handle: Any, start: int
+    ) -> Tuple[Dict[StateKey, Tuple[int, int]], Dict[StateKey, str]]:
+        """Index records from *start*; return the entries and words it found."""
+
+        handle.seek(start)
+        offset = start
+        entries: Dict[StateKey, Tuple[int, int]] = {}
+        words: Dict[StateKey, str] = {}
+        for raw in handle:
+            length = len(raw)
+            if not raw.endswith(b"\n"):
+                # A writer is mid-append; index the line on the next refresh.
+                break
+            text = raw.strip()
+            if text:
+                record = json.loads(text)
+                key = self._key(record)
+                entries[key] = (offset, length)
+                word = record.get("word")
+                if word and str(word) != key[1]:
+                    words[(key[0], str(word))] = key[1]
+            offset += length
+        self._entries.update(entries)
+        self._words.update(words)
+        self._size = offset
+        return entries, words
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+    def __len__(self) -> int:
+        with self._lock:
+            self.refresh()
+            return len(self._entries)
+
+    def resolve(self, key: StateKey) -> Optional[StateKey]:
+        """Map a ``(user_id, card_id_or_word)`` key to its stored key."""
+
+        if key in self._entries:
+            return key
+        card_id = self._words.get(key)
+        if card_id is None:
+            return None
+        return key[0], card_id
+
+    def lookup(self, keys: Iterable[StateKey]) -> Dict[StateKey, Dict[str, Any]]:
+        """Read the latest records for *keys* through a memory map.
+
+        Keys may name either a ``card_id`` or a ``word``; the result is keyed
+        by the stored ``(user_id, card_id)``.
+        """
+
+        requested = list(keys)
+        with self._lock:
+            self.refresh()
+            while True:
+                spans: List[Tuple[StateKey, Tuple[int, int]]] = []
+                for key in requested:
+                    resolved = self.resolve(key)
+                    if resolved is not None:
+                        spans.append((resolved, self._entries[resolved]))
+                if not spans:
+                    return {}
+                with self.path.open("rb") as handle:
+                    if os.fstat(handle.fileno()).st_ino != self._inode:
+                        # Compacted between refresh and open; re-index and retry.
+                        self.refresh()
+                        continue
+                    found: Dict[StateKey, Dict[str, Any]] = {}
+                    with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                        for resolved, (offset, length) in spans:
+                            if resolved not in found:
+                                found[resolved] = json.loads(mapped[offset : offset + length])
+                    return found
+
+
+__all__ = ["INDEX_FORMAT", "StateOffsetIndex"]
@@ -0,0 +1,281 @@
+"""Single-writer card state service shared by the UI and game processes.
+
+Only one process should write the state logs. :class:`StateServer` runs in
+that process (the flet UI, started by ``GameLaunch`` before it spawns the
+game) and listens on a local socket via :mod:`multiprocessing.connection`.
+Other processes talk to it through :class:`StateClient`; the game sends its
+results as grades, which the server reviews against the current states so
+two clients never overwrite each other's updates. Writes from every client
+go through the server's :class:`~scripts.persistence_queue.WriteBehindQueue`,
+so they are batched together. Reads are answered from the state store, with
+states still waiting in the queue laid over it; once the queue has written a
+state, reads see the store again.
+
+The server publishes its address in the ``FLASHCARD_STATE_SERVICE``
+environment variable. Child processes started afterwards inherit the variable
+and the parent's multiprocessing authkey, so :func:`connect` needs no
+arguments there.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from multiprocessing import current_process
+from multiprocessing.connection import Client, Connection, Listener
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from scripts.card_state import CardState
+from scripts import FileWork_v3 as filework
+from scripts.fsrs_engine import load_weights, review
+from scripts.persistence_queue import WriteBehindQueue, get_default_queue
+from scripts.review_service import _log_entry
+
+ADDRESS_ENV = "FLASHCARD_STATE_SERVICE"
+
+# ``(word, definition, grade, reviewed_at)`` sent by a client for one review.
+Grade = Tuple[str, str, str, datetime]
+
+
+class StateServiceError(RuntimeError):
+    """Raised by :class:`StateClient` when the server rejects a request."""
+
+
+class StateServer:
+    """Serve card state reads and batch writes for other processes.
+
+    Parameters
+    ----------
+    address:
+        Listener address. ``None`` picks a fresh local socket (a Unix domain
+        socket on POSIX, a named pipe on Windows).
+    authkey:
+        Shared secret clients must present. Defaults to the current process's
+        multiprocessing authkey, which spawned children inherit.
+    queue:
+        Write-behind queue used for writes. Defaults to the process-wide one.
+    """
+
+    def __init__(
+        self,
+        address: Any = None,
+        *,
+        authkey: Optional[bytes] = None,
+        queue: Optional[WriteBehindQueue] = None,
+    ) -> None:
+        self.authkey = authkey if authkey is not None else bytes(current_process().authkey)
+        self._listener = Listener(address, authkey=self.authkey)
+        self._address = self._listener.address
+        self._queue = queue
+        self._lock = threading.RLock()
+        self._grade_lock = threading.Lock()
+        self._connections: List[Connection] = []
+        self._closed = False
+        self._acceptor = threading.Thread(target=self._accept_loop, name="state-service", daemon=True)
+
+    @property
+    def address(self) -> Any:
+        return self._address
+
+    @property
+    def queue(self) -> WriteBehindQueue:
+        return self._queue if self._queue is not None else get_default_queue()
+
+    def start(self, *, publish: bool = True) -> "StateServer":
+        """Start accepting clients; with *publish* export :data:`ADDRESS_ENV`."""
+
+        self._acceptor.start()
+        if publish:
+            os.environ[ADDRESS_ENV] = str(self.address)
+        return self
+
+    # ------------------------------------------------------------------
+    # Connection handling
+    # ------------------------------------------------------------------
+    def _accept_loop(self) -> None:
+        while not self._closed:
+            try:
+                conn = self._listener.accept()
+            except (OSError, EOFError):
+                if self._closed:
+                    return
+                continue
+            with self._lock:
+                self._connections.append(conn)
+            threading.Thread(
+                target=self._serve, args=(conn,), name="state-service-client", daemon=True
+            ).start()
+
+    def _serve(self, conn: Connection) -> None:
+        try:
+            while True:
+                try:
+                    op, args, kwargs = conn.recv()
+                except (EOFError, OSError):
+                    return
+                handler = getattr(self, f"op_{op}", None)
+                if handler is None:
+                    conn.send(("error", f"Unknown operation: {op}"))
+                    continue
+                try:
+                    result = handler(*args, **kwargs)
+                except Exception as exc:  # reported to the client
+                    conn.send(("error", f"{type(exc).__name__}: {exc}"))
+                else:
+                    conn.send(("ok", result))
+        finally:
+            with self._lock:
+                if conn in self._connections:
+                    self._connections.remove(conn)
+            conn.close()
+
+    def close(self) -> None:
+        """Stop serving, disconnect clients and flush pending writes."""
+
+        self._closed = True
+        self._listener.close()
+        with self._lock:
+            connections = list(self._connections)
+        for conn in connections:
+            conn.close()
+        if os.environ.get(ADDRESS_ENV) == str(self.address):
+            del os.environ[ADDRESS_ENV]
+        self.queue.flush()
+
+    # ------------------------------------------------------------------
+    # Operations
+    # ------------------------------------------------------------------
+    def op_ping(self) -> str:
+        return "pong"
+
+    def op_load_card_states_for(
+        self,
+        card_ids: Iterable[str],
+        words: Iterable[str] = (),
+        *,
+        user_id: Optional[str] = None,
+    ) -> Dict[str, CardState]:
+        user_key = filework._normalise_user_id(user_id)
+        card_ids, words = list(card_ids), list(words)
+        found = filework.load_card_states_for(card_ids, words, user_id=user_key)
+        found.update(self.queue.pending_states([*card_ids, *words], user_id=user_key))
+        return found
+
+    def op_save_card_states(
+        self, states: Iterable[CardState], *, user_id: Optional[str] = None
+    ) -> int:
+        count = 0
+        for state in states:
+            user_key = filework._normalise_user_id(user_id or state.user_id)
+            self.queue.enqueue(state, user_id=user_key)
+            count += 1
+        return count
+
+    def op_grade_cards(self, grades: Iterable[Grade], *, user_id: Optional[str] = None) -> int:
+        # Grades are reviewed here, one client at a time, so each one starts
+        # from the latest state instead of a copy the client read earlier.
+        user_key = filework._normalise_user_id(user_id)
+        grades = list(grades)
+        with self._grade_lock:
+            states = self.op_load_card_states_for([], [word for word, *_ in grades], user_id=user_key)
+            for word, definition, grade, reviewed_at in grades:
+                state = states.get(word) or CardState(word, definition, "", user_id=user_key)
+                weights = load_weights(state.w_version)
+                updated, diagnostics = review(state, grade, reviewed_at, weights=weights)
+                updated.user_id = user_key
+                self.queue.enqueue(updated, _log_entry(updated, diagnostics, weights), user_id=user_key)
+                states[word] = updated
+        return len(grades)
+
+    def op_append_review_logs(self, entries: Iterable[Mapping[str, Any]]) -> int:
+        # Validate here so the client sees bad entries, not the background flusher.
+        entries = [filework._prepare_log_record(entry) for entry in entries]
+        self.queue.enqueue_logs(entries)
+        return len(entries)
+
+    def op_flush(self) -> int:
+        return self.queue.flush()
+
+
+class StateClient:
+    """Connection to a :class:`StateServer` in another process."""
+
+    def __init__(self, address: Any, *, authkey: Optional[bytes] = None) -> None:
+        self.authkey = authkey if authkey is not None else bytes(current_process().authkey)
+        self._conn = Client(address, authkey=self.authkey)
+        self._lock = threading.Lock()
+
+    def _call(self, op: str, *args: Any, **kwargs: Any) -> Any:
+        with self._lock:
+            self._conn.send((op, args, kwargs))
+            status, result = self._conn.recv()
+        if status != "ok":
+            raise StateServiceError(result)
+        return result
+
+    def ping(self) -> str:
+        return self._call("ping")
+
+    def load_card_states_for(
+        self,
+        card_ids: Iterable[str],
+        words: Iterable[str] = (),
+        *,
+        user_id: Optional[str] = None,
+    ) -> Dict[str, CardState]:
+        return self._call("load_card_states_for", list(card_ids), list(words), user_id=user_id)
+
+    def save_card_states(self, states: Iterable[CardState], *, user_id: Optional[str] = None) -> int:
+        return self._call("save_card_states", list(states), user_id=user_id)
+
+    def grade_cards(self, grades: Iterable[Grade], *, user_id: Optional[str] = None) -> int:
+        """Review each ``(word, definition, grade, reviewed_at)`` in the server."""
+
+        return self._call("grade_cards", list(grades), user_id=user_id)
+
+    def append_review_logs(self, entries: Iterable[Mapping[str, Any]]) -> int:
+        return self._call("append_review_logs", list(entries))
+
+    def flush(self) -> int:
+        return self._call("flush")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def connect(address: Any = None, *, authkey: Optional[bytes] = None) -> Optional[StateClient]:
+    """Connect to the server at *address* or the one named in :data:`ADDRESS_ENV`.
+
+    Returns ``None`` when no server address is known.
+    """
+
+    address = address or os.environ.get(ADDRESS_ENV)
+    if not address:
+        return None
+    return StateClient(address, authkey=authkey)
+
+
+_DEFAULT_SERVER: Optional[StateServer] = None
+_DEFAULT_SERVER_LOCK = threading.Lock()
+
+
+def get_default_server() -> StateServer:
+    """Start (once) and return the state server for this process."""
+
+    global _DEFAULT_SERVER
+    with _DEFAULT_SERVER_LOCK:
+        if _DEFAULT_SERVER is None or _DEFAULT_SERVER._closed:
+            _DEFAULT_SERVER = StateServer().start()
+        return _DEFAULT_SERVER
+
+
+__all__ = [
+    "ADDRESS_ENV",
+    "StateClient",
+    "StateServer",
+    "StateServiceError",
+    "connect",
+    "get_default_server",
+]
@@ -0,0 +1,476 @@
+"""Log-structured persistence for card scheduling state.
+
+The store keeps ``card_state.jsonl`` as an append-only log. Every upsert adds
+one JSON line at the end of the file and updates an in-memory index that maps
+``(user_id, card_id)`` to the most recent record. Superseded lines are removed
+by compaction, which rewrites the file as a snapshot holding one line per key.
+Compaction runs on a background thread once enough garbage accumulates and
+once more when the interpreter exits.
+
+Large batch jobs use :meth:`CardStateStore.bulk_upsert`, which merges sorted
+updates into a sorted copy of the log in one streaming pass. Unsorted input
+is first split into sorted runs spilled to temporary files, so memory stays
+bounded by the run size rather than the size of the store.
+"""
+
+from __future__ import annotations
+
+import atexit
+import heapq
+import itertools
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple, TypeVar
+
+StateKey = Tuple[str, str]
+KeyFunc = Callable[[Mapping[str, Any]], StateKey]
+
+StoreT = TypeVar("StoreT")
+
+DEFAULT_COMPACT_MIN_GARBAGE = 256
+DEFAULT_COMPACT_RATIO = 1.0
+DEFAULT_RUN_SIZE = 50_000
+
+KeyedRecord = Tuple[StateKey, Dict[str, Any]]
+
+
+# ---------------------------------------------------------------------------
+# External sort helpers
+# ---------------------------------------------------------------------------
+
+def _iter_jsonl_records(path: Path) -> Iterator[Dict[str, Any]]:
+    if not path.exists():
+        return
+    with path.open("r", encoding="utf-8") as handle:
+        for line in handle:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def _iter_run(path: Path) -> Iterator[KeyedRecord]:
+    with path.open("r", encoding="utf-8") as handle:
+        for line in handle:
+            user_id, card_id, record = json.loads(line)
+            yield (user_id, card_id), record
+
+
+def _latest_per_key(items: Iterable[KeyedRecord]) -> Iterator[KeyedRecord]:
+    """Collapse consecutive items with equal keys, keeping the last one."""
+
+    for key, group in itertools.groupby(items, key=lambda item: item[0]):
+        last = None
+        for last in group:
+            pass
+        yield key, last[1]
+
+
+def _check_sorted(items: Iterable[KeyedRecord]) -> Iterator[KeyedRecord]:
+    previous: Optional[StateKey] = None
+    for item in items:
+        if previous is not None and item[0] < previous:
+            raise ValueError(f"Records are not sorted by key: {item[0]!r} after {previous!r}")
+        previous = item[0]
+        yield item
+
+
+def external_sort(
+    records: Iterable[Mapping[str, Any]],
+    key: KeyFunc,
+    *,
+    run_size: int = DEFAULT_RUN_SIZE,
+    tmp_dir: Optional[Path] = None,
+) -> Iterator[KeyedRecord]:
+    """Yield ``(key, record)`` pairs sorted by key, latest record per key.
+
+    At most *run_size* records are held in memory; larger inputs are split
+    into sorted runs written to temporary files and merged lazily.
+    """
+
+    run_size = max(int(run_size), 1)
+    runs: List[Path] = []
+    buffer: List[KeyedRecord] = []
+    try:
+        for record in records:
+            buffer.append((key(record), dict(record)))
+            if len(buffer) >= run_size:
+                runs.append(_write_run(buffer, tmp_dir))
+                buffer = []
+        # Stable sorts and a stable merge keep later duplicates last.
+        buffer.sort(key=lambda item: item[0])
+        streams: List[Iterable[KeyedRecord]] = [_iter_run(path) for path in runs]
+        streams.append(buffer)
+        yield from _latest_per_key(heapq.merge(*streams, key=lambda item: item[0]))
+    finally:
+        for path in runs:
+            path.unlink(missing_ok=True)
+
+
+def _write_run(buffer: List[KeyedRecord], tmp_dir: Optional[Path]) -> Path:
+    buffer.sort(key=lambda item: item[0])
+    fd, name = tempfile.mkstemp(prefix="state-run-", suffix=".jsonl", dir=tmp_dir)
+    with os.fdopen(fd, "w", encoding="utf-8") as handle:
+        for (user_id, card_id), record in buffer:
+            handle.write(json.dumps([user_id, card_id, record], ensure_ascii=False))
+            handle.write("\n")
+    return Path(name)
+
+
+class CardStateStore:
+    """Append-only JSONL store with an in-memory index of the latest records.
+
+    Parameters
+    ----------
+    path:
+        Location of the JSONL log.
+    key:
+        Callable that extracts the ``(user_id, card_id)`` key from a record.
+    compact_min_garbage:
+        Minimum number of superseded lines before background compaction is
+        considered.
+    compact_ratio:
+        Compaction starts once superseded lines exceed ``compact_ratio`` times
+        the number of live records.
+    background:
+        When ``False`` compaction only runs when :meth:`compact` or
+        :meth:`close` is called explicitly.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        key: KeyFunc,
+        compact_min_garbage: int = DEFAULT_COMPACT_MIN_GARBAGE,
+        compact_ratio: float = DEFAULT_COMPACT_RATIO,
+        background: bool = True,
+    ) -> None:
+        self.path = Path(path)
+        self._key = key
+        self.compact_min_garbage = max(int(compact_min_garbage), 0)
+        self.compact_ratio = max(float(compact_ratio), 0.0)
+        self.background = background
+        self._records: Dict[StateKey, Dict[str, Any]] = {}
+        self._line_count = 0
+        self._loaded = False
+        # (mtime_ns, size) of the log as last seen by this process.
+        self._signature: Optional[Tuple[int, int]] = None
+        self._version = 0
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self._compactor: Optional[threading.Thread] = None
+        # Records appended while a compaction is writing its snapshot.
+        self._compaction_tail: Optional[List[Dict[str, Any]]] = None
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+    def _replay(self) -> None:
+        records: Dict[StateKey, Dict[str, Any]] = {}
+        line_count = 0
+        # Stat before reading so an append racing with the replay is picked up
+        # by the next freshness check rather than lost.
+        signature = self._stat()
+        if self.path.exists():
+            with self.path.open("r", encoding="utf-8") as handle:
+                for line in handle:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    record = json.loads(line)
+                    records[self._key(record)] = record
+                    line_count += 1
+        self._records = records
+        self._line_count = line_count
+        self._loaded = True
+        self._signature = signature
+        self._version += 1
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _ensure_loaded(self) -> None:
+        if not self._loaded or self._stat() != self._signature:
+            self._replay()
+
+    @property
+    def version(self) -> int:
+        """Counter that changes whenever the indexed records change.
+
+        Reading it replays the log first if another process has modified the
+        file since this store last read or wrote it.
+        """
+
+        with self._lock:
+            self._ensure_loaded()
+            return self._version
+
+    def reload(self) -> None:
+        """Discard the in-memory index and replay the log from disk."""
+
+        with self._lock:
+            self._replay()
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def get(self, key: StateKey) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._ensure_loaded()
+            return self._records.get(key)
+
+    def records(self) -> List[Dict[str, Any]]:
+        """Return the latest record for every key."""
+
+        with self._lock:
+            self._ensure_loaded()
+            return list(self._records.values())
+
+    def records_for_user(self, user_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._ensure_loaded()
+            return [
+                record for key, record in self._records.items() if key[0] == user_id
+            ]
+
+    def items(self) -> List[Tuple[StateKey, Dict[str, Any]]]:
+        with self._lock:
+            self._ensure_loaded()
+            return list(self._records.items())
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._records)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.records())
+
+    @property
+    def garbage(self) -> int:
+        """Number of superseded lines that compaction would drop."""
+
+        with self._lock:
+            self._ensure_loaded()
+            return max(self._line_count - len(self._records), 0)
+
+    # ------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------
+    def put(self, record: Mapping[str, Any]) -> Dict[str, Any]:
+        """Append *record* to the log and make it the latest for its key."""
+
+        stored = self.put_many([record])
+        return stored[0]
+
+    def put_many(self, records: Iterable[Mapping[str, Any]]) -> List[Dict[str, Any]]:
+        """Append *records* with a single write and update the index."""
+
+        prepared = [dict(record) for record in records]
+        if not prepared:
+            return []
+        keys = [self._key(record) for record in prepared]
+        payload = "".join(
+            json.dumps(record, ensure_ascii=False) + "\n" for record in prepared
+        )
+        with self._lock:
+            self._ensure_loaded()
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as handle:
+                handle.write(payload)
+            self._signature = self._stat()
+            for key, record in zip(keys, prepared):
+                self._records[key] = record
+            self._line_count += len(prepared)
+            self._version += 1
+            if self._compaction_tail is not None:
+                self._compaction_tail.extend(prepared)
+        self._maybe_schedule_compaction()
+        return prepared
+
+    def _is_sorted_snapshot(self) -> bool:
+        """Return ``True`` when the log holds strictly ascending unique keys."""
+
+        previous: Optional[StateKey] = None
+        for record in _iter_jsonl_records(self.path):
+            current = self._key(record)
+            if previous is not None and current <= previous:
+                return False
+            previous = current
+        return True
+
+    def bulk_upsert(
+        self,
+        records: Iterable[Mapping[str, Any]],
+        *,
+        presorted: bool = False,
+        run_size: int = DEFAULT_RUN_SIZE,
+    ) -> int:
+        """Merge *records* into the log in one streaming pass.
+
+        The log is rewritten as a compacted snapshot sorted by key, with
+        *records* winning over existing lines. Memory use is bounded by
+        *run_size* instead of the number of stored records, and the in-memory
+        index is dropped so it is only rebuilt if the store is read again.
+
+        Parameters
+        ----------
+        records:
+            Upserts to apply. With ``presorted=True`` they must already be in
+            ascending key order (a later duplicate wins); otherwise they are
+            sorted externally.
+        run_size:
+            Maximum number of records sorted in memory at once.
+
+        Returns the number of records in the rewritten log.
+        """
+
+        tmp_dir = self.path.parent
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        with self._compact_lock, self._lock:
+            if presorted:
+                updates = _latest_per_key(
+                    _check_sorted((self._key(record), dict(record)) for record in records)
+                )
+            else:
+                updates = external_sort(records, self._key, run_size=run_size, tmp_dir=tmp_dir)
+            if self._is_sorted_snapshot():
+                existing: Iterator[KeyedRecord] = (
+                    (self._key(record), record) for record in _iter_jsonl_records(self.path)
+                )
+            else:
+                existing = external_sort(
+                    _iter_jsonl_records(self.path), self._key, run_size=run_size, tmp_dir=tmp_dir
+                )
+            tmp_path = self.path.with_name(self.path.name + ".merge")
+            count = 0
+            try:
+                with tmp_path.open("w", encoding="utf-8") as handle:
+                    # heapq.merge is stable, so an update follows the existing
+                    # line with the same key and wins the de-duplication.
+                    merged = heapq.merge(existing, updates, key=lambda item: item[0])
+                    for _, record in _latest_per_key(merged):
+                        handle.write(json.dumps(record, ensure_ascii=False))
+                        handle.write("\n")
+                        count += 1
+                    handle.flush()
+                    os.fsync(handle.fileno())
+                os.replace(tmp_path, self.path)
+            finally:
+                if tmp_path.exists():
+                    tmp_path.unlink()
+            self._records = {}
+            self._line_count = 0
+            self._loaded = False
+            self._signature = None
+            self._version += 1
+        return count
+
+    # ------------------------------------------------------------------
+    # Compaction
+    # ------------------------------------------------------------------
+    def needs_compaction(self) -> bool:
+        garbage = self.garbage
+        if garbage == 0 or garbage < self.compact_min_garbage:
+            return False
+        with self._lock:
+            live = len(self._records)
+        return garbage > live * self.compact_ratio
+
+    def _maybe_schedule_compaction(self) -> None:
+        if not self.background or not self.needs_compaction():
+            return
+        with self._lock:
+            if self._compactor is not None and self._compactor.is_alive():
+                return
+            self._compactor = threading.Thread(
+                target=self.compact,
+                name=f"compact-{self.path.name}",
+                daemon=True,
+            )
+            self._compactor.start()
+
+    def compact(self) -> None:
+        """Rewrite the log as a snapshot holding one line per key.
+
+        Appends that happen while the snapshot is being written are collected
+        and copied into the new file before it replaces the old one, so
+        writers are never blocked for the duration of the rewrite.
+        """
+
+        with self._compact_lock:
+            with self._lock:
+                self._ensure_loaded()
+                if not self.path.exists() or self._line_count == len(self._records):
+                    return
+                snapshot = list(self._records.values())
+                self._compaction_tail = []
+            tmp_path = self.path.with_name(self.path.name + ".compact")
+            handle = tmp_path.open("w", encoding="utf-8")
+            try:
+                for record in snapshot:
+                    handle.write(json.dumps(record, ensure_ascii=False))
+                    handle.write("\n")
+                with self._lock:
+                    tail = self._compaction_tail or []
+                    for record in tail:
+                        handle.write(json.dumps(record, ensure_ascii=False))
+                        handle.write("\n")
+                    handle.flush()
+                    os.fsync(handle.fileno())
+                    handle.close()
+                    os.replace(tmp_path, self.path)
+                    self._line_count = len(snapshot) + len(tail)
+                    self._signature = self._stat()
+            finally:
+                handle.close()
+                with self._lock:
+                    self._compaction_tail = None
+                if tmp_path.exists():
+                    tmp_path.unlink()
+
+    def close(self) -> None:
+        """Wait for background work and compact any remaining garbage."""
+
+        compactor = self._compactor
+        if compactor is not None and compactor.is_alive():
+            compactor.join()
+        if self._loaded and self.garbage:
+            self.compact()
+
+
+_OPEN_STORES: List[Any] = []
+_OPEN_STORES_LOCK = threading.Lock()
+
+
+def register_store(store: StoreT) -> StoreT:
+    """Track *store* so its ``close`` method runs when the interpreter exits."""
+
+    with _OPEN_STORES_LOCK:
+        if store not in _OPEN_STORES:
+            _OPEN_STORES.append(store)
+    return store
+
+
+@atexit.register
+def close_all_stores() -> None:
+    with _OPEN_STORES_LOCK:
+        stores = list(_OPEN_STORES)
+    for store in stores:
+        store.close()
+
+
+__all__ = [
+    "CardStateStore",
+    "DEFAULT_RUN_SIZE",
+    "close_all_stores",
+    "external_sort",
+    "register_store",
+]
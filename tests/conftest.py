@@ -0,0 +1,44 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture
+def fw():
+    """The FileWork_v3 module; tests that use it are skipped without pandas."""
+
+    pytest.importorskip("pandas")
+    from scripts import FileWork_v3
+
+    return FileWork_v3
+
+
+@pytest.fixture
+def state_file(fw, tmp_path, monkeypatch):
+    """Point FileWork's state and log files and its caches at *tmp_path*."""
+
+    path = tmp_path / "state" / "card_state.jsonl"
+    monkeypatch.setattr(fw, "STATE_FILE", path)
+    monkeypatch.setattr(fw, "LOG_FILE", tmp_path / "log" / "review_log.jsonl")
+    monkeypatch.setattr(fw, "_STATE_STORES", {})
+    monkeypatch.setattr(fw, "_OFFSET_INDEXES", {})
+    monkeypatch.setattr(fw, "_LEGACY_CHECKED", set())
+    monkeypatch.setattr(fw, "_REVIEW_LOGS", {})
+    monkeypatch.setattr(fw, "_HISTORY_STORES", {})
+    monkeypatch.setattr(fw, "_STATE_CACHE", fw._StateCache())
+    return path
+
+
+@pytest.fixture
+def deck_path(fw, tmp_path):
+    path = tmp_path / "deck.json"
+    fw.writeIntoJson(
+        [["osmosis", "passive transport", ""], ["argue", "to dispute", "They argue."]],
+        str(path),
+    )
+    return path
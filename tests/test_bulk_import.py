@@ -0,0 +1,134 @@
+import json
+import sqlite3
+import sys
+import zipfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+pytest.importorskip("pandas")
+
+from scripts import FileWork_v3 as fw
+from scripts import bulk_import
+from scripts.card_state import CardState
+
+
+def _write_apkg(path, notes, reviews):
+    database = path.with_suffix(".anki2")
+    connection = sqlite3.connect(database)
+    connection.executescript(
+        "CREATE TABLE notes (id INTEGER PRIMARY KEY, flds TEXT);"
+        "CREATE TABLE cards (id INTEGER PRIMARY KEY, nid INTEGER);"
+        "CREATE TABLE revlog (id INTEGER PRIMARY KEY, cid INTEGER, ease INTEGER);"
+    )
+    for note_id, fields in enumerate(notes, start=1):
+        connection.execute("INSERT INTO notes VALUES (?, ?)", (note_id, "\x1f".join(fields)))
+        connection.execute("INSERT INTO cards VALUES (?, ?)", (100 + note_id, note_id))
+    connection.executemany("INSERT INTO revlog VALUES (?, ?, ?)", reviews)
+    connection.commit()
+    connection.close()
+    with zipfile.ZipFile(path, "w") as package:
+        package.write(database, "collection.anki2")
+
+
+def test_csv_rows_become_a_deck_and_one_bulk_state_write(state_file, tmp_path, monkeypatch):
+    source = tmp_path / "words.csv"
+    source.write_text('#separator:comma\nVocab:,Translation:\nosmosis,"渗透, 潜移默化"\nargue,to dispute,They argue.\nosmosis,dup\n', encoding="utf-8")
+    real_bulk_save = fw.bulk_save_card_states
+    calls = []
+    monkeypatch.setattr(fw, "bulk_save_card_states", lambda states, **k: calls.append(1) or real_bulk_save(states, **k))
+
+    result = bulk_import.import_file(source, deck_dir=tmp_path / "decks", batch_size=1)
+
+    assert (result.cards, result.skipped, result.reviews) == (2, 1, 0)
+    assert calls == [1]
+    assert json.loads(result.deck_path.read_text(encoding="utf-8"))["XXX"]["Name"] == "words"
+    cards, _ = fw.readFromJson(str(result.deck_path))
+    assert [(card.word, card.definition) for card in cards] == [("osmosis", "渗透, 潜移默化"), ("argue", "to dispute")]
+    assert set(fw.load_card_states()) == {"osmosis", "argue"}
+    assert bulk_import.import_file(source, deck_dir=tmp_path / "decks").deck_path.name == "words_2.json"
+
+
+def test_anki_package_imports_notes_and_replays_review_history(state_file, tmp_path):
+    package = tmp_path / "collection.apkg"
+    day_ms = 86_400_000
+    _write_apkg(
+        package,
+        [["<b>osmosis</b>", "passive&nbsp;transport<br>of water", "Roots take up water."], ["argue", "dispute"]],
+        [(1_700_000_000_000, 101, 3), (1_700_000_000_000 + 3 * day_ms, 101, 1), (1_700_000_000_000 + 4 * day_ms, 101, 0)],
+    )
+
+    result = bulk_import.import_file(package, deck_dir=tmp_path / "decks", batch_size=1)
+
+    assert (result.cards, result.reviews) == (2, 2)
+    states = fw.load_card_states()
+    assert states["osmosis"].definition == "passive\xa0transport\nof water"
+    assert (states["osmosis"].repetitions, states["osmosis"].lapses, states["osmosis"].phase) == (2, 1, "relearning")
+    assert states["argue"].repetitions == 0
+    logged = list(fw.iter_review_log(card_id="osmosis", expand=True))
+    assert [entry["grade"] for entry in logged] == ["good", "again"]
+    assert logged[0]["logged_at"].startswith("2023-11-14")
+
+    broken = tmp_path / "broken.apkg"
+    broken.write_bytes(b"not a zip")
+    with pytest.raises(ValueError):
+        bulk_import.import_file(broken, deck_dir=tmp_path / "decks")
+    assert not (tmp_path / "decks" / "broken.json").exists()
+
+
+def test_deck_writer_output_is_byte_identical_to_write_into_json(tmp_path):
+    cards = [CardState("osmosis", "渗透\n潜移默化", 'say "hi"', card_id="c1"), CardState("argue", "", "", card_id=None)]
+    fw.writeIntoJson(cards, str(tmp_path / "expected.json"))
+    with bulk_import.DeckWriter(tmp_path / "expected_copy.json") as deck:
+        for card in cards:
+            deck.add(card)
+
+    expected = (tmp_path / "expected.json").read_text(encoding="utf-8")
+    written = (tmp_path / "expected_copy.json").read_text(encoding="utf-8")
+    assert written == expected.replace('"Name": "expected"', '"Name": "expected_copy"')
+
+
+def test_only_leading_anki_header_lines_are_treated_as_comments(tmp_path):
+    source = tmp_path / "words.txt"
+    source.write_text(
+        '#separator:semicolon\n#html:false\n#hashtag;a word that starts with #\nquote;"line one\n# still the definition";ex\n',
+        encoding="utf-8",
+    )
+
+    cards = [(card.word, card.definition, card.example) for card in bulk_import.iter_delimited_cards(source)]
+
+    assert cards == [
+        ("#hashtag", "a word that starts with #", ""),
+        ("quote", "line one\n# still the definition", "ex"),
+    ]
+
+
+def test_import_keeps_stored_states_and_logs_only_after_the_states_are_saved(state_file, tmp_path, monkeypatch):
+    package = tmp_path / "collection.apkg"
+    _write_apkg(package, [["osmosis", "imported"], ["argue", "dispute"]], [(1_700_000_000_000, 101, 3), (1_700_000_000_001, 102, 4)])
+    fw.save_card_state(CardState("osmosis", "mine", "", stability=7.5, phase="review"))
+    real_bulk_save = fw.bulk_save_card_states
+
+    def failing_bulk_save(states, **kwargs):
+        list(states)
+        raise OSError("disk full")
+
+    monkeypatch.setattr(fw, "bulk_save_card_states", failing_bulk_save)
+    with pytest.raises(OSError):
+        bulk_import.import_file(package, deck_dir=tmp_path / "decks", batch_size=1)
+    assert list(fw.iter_review_log()) == []
+
+    monkeypatch.setattr(fw, "bulk_save_card_states", real_bulk_save)
+    result = bulk_import.import_file(package, deck_dir=tmp_path / "decks", batch_size=1)
+
+    assert (result.cards, result.existing, result.reviews) == (1, 1, 1)
+    states = fw.load_card_states()
+    assert (states["osmosis"].definition, states["osmosis"].stability) == ("mine", 7.5)
+    assert states["argue"].repetitions == 1
+    assert [entry["card_id"] for entry in fw.iter_review_log()] == ["argue"]
+    cards, _ = fw.readFromJson(str(result.deck_path))
+    assert [card.word for card in cards] == ["osmosis", "argue"]
@@ -0,0 +1,80 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+np = pytest.importorskip("numpy")
+
+from scripts.card_table import CardTable
+from scripts.state_store import CardStateStore
+
+
+def _key(record):
+    return record["user_id"], record["card_id"]
+
+
+def _record(card_id, stability, phase="review", due_at="2024-01-02T00:00:00Z"):
+    return {
+        "user_id": "default",
+        "card_id": card_id,
+        "word": card_id,
+        "state": {"stability": stability, "phase": phase, "due_at": due_at, "lapses": 1},
+    }
+
+
+def test_refresh_reads_only_appended_records(tmp_path):
+    path = tmp_path / "card_state.jsonl"
+    store = CardStateStore(path, key=_key, background=False)
+    store.put_many([_record("osmosis", 1.0), _record("argue", 2.0, phase="new", due_at=None)])
+
+    table = CardTable()
+    assert table.refresh(path) == 2
+    assert list(table.card_id) == ["osmosis", "argue"]
+    assert np.isnan(table.due_at[1])
+    assert table.phase_mask("review").tolist() == [True, False]
+
+    store.put_many([_record("argue", 4.0), _record("cinema", 3.0)])
+    assert table.refresh(path) == 2
+    assert table.stability.tolist() == [1.0, 4.0, 3.0]
+    assert table.refresh(path) == 0
+
+
+def test_save_load_round_trip_and_rebuild_after_compaction(tmp_path):
+    path = tmp_path / "card_state.jsonl"
+    store = CardStateStore(path, key=_key, background=False)
+    store.put(_record("osmosis", 1.0))
+    store.put(_record("osmosis", 6.5, phase="relearning"))
+    table = CardTable()
+    table.refresh(path)
+    table.save(tmp_path / "card_table.npz")
+
+    loaded = CardTable.load(tmp_path / "card_table.npz")
+    assert loaded.source_offset == path.stat().st_size
+    assert loaded.stability.tolist() == [6.5]
+    assert loaded.phase_labels[loaded.phase[0]] == "relearning"
+
+    store.compact()
+    assert loaded.refresh(path) == 1
+    assert len(loaded) == 1
+
+
+def test_retrievability_scores_every_card_in_one_call():
+    from scripts.fsrs_engine import load_weights, predict_R
+
+    config = load_weights("fsrs_v1")
+    table = CardTable.from_records(
+        [
+            {**_record("osmosis", 3.5), "state": {"stability": 3.5, "last_review_at": "2024-01-01T00:00:00Z"}},
+            _record("argue", 2.0),
+        ]
+    )
+    now = table.last_review_at[0] + 2 * 86400
+
+    scores = table.retrievability(now, config)
+
+    assert scores[0] == pytest.approx(predict_R(3.5, 2.0, config), rel=1e-12)
+    assert np.isnan(scores[1])
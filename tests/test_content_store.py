@@ -0,0 +1,34 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+pytest.importorskip("pandas")
+
+from scripts import FileWork_v3 as fw
+from scripts.card_state import CardState
+
+
+def test_reference_deck_shares_content_with_its_source(state_file, deck_path, tmp_path, monkeypatch):
+    monkeypatch.setattr(fw, "_CONTENT_STORE", None)
+    generated = tmp_path / "generated.json"
+    fw.write_reference_deck(["argue"], str(generated), source=str(deck_path))
+    fw.save_card_state(CardState("argue", "", "", stability=2.0))
+
+    payload = json.loads(generated.read_text(encoding="utf-8"))
+    assert payload["argue"] == {"ref": "argue"}
+    cards, info = fw.readFromJson(str(generated))
+    streamed = list(fw.iter_deck(str(generated)))
+
+    assert info[0] == "generated"
+    assert [(card.word, card.definition, card.stability) for card in cards] == [("argue", "to dispute", 2.0)]
+    assert streamed[0].example == "They argue."
+    source_entry = fw.get_content_store().get(str(deck_path), "argue")
+    assert fw._entry_to_state("argue", payload["argue"], str(deck_path)).definition is source_entry["definition"]
+    with pytest.raises(KeyError):
+        fw.write_reference_deck(["missing"], str(generated), source=str(deck_path))
@@ -0,0 +1,44 @@
+import json
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from scripts import deck_cache
+
+
+def _write_deck(path, payload):
+    path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+
+
+def test_cache_is_used_while_fresh_and_rebuilt_when_deck_changes(tmp_path, monkeypatch):
+    deck = tmp_path / "deck.json"
+    _write_deck(deck, {"XXX": {"Name": "deck"}, "argue": {"definition:": "[v.] 争论"}})
+
+    assert deck_cache.load_deck(deck)["argue"]["definition:"] == "[v.] 争论"
+    assert deck_cache.cache_path(deck).exists()
+
+    parses = []
+    real_load = json.load
+    monkeypatch.setattr(deck_cache.json, "load", lambda handle: parses.append(1) or real_load(handle))
+    assert "argue" in deck_cache.load_deck(deck)
+    assert parses == []
+
+    _write_deck(deck, {"XXX": {"Name": "deck"}, "osmosis": {}})
+    stat = deck.stat()
+    os.utime(deck, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert set(deck_cache.load_deck(deck)) == {"XXX", "osmosis"}
+    assert parses == [1]
+
+
+def test_corrupt_cache_falls_back_to_json(tmp_path):
+    deck = tmp_path / "deck.json"
+    _write_deck(deck, {"XXX": {"Name": "deck"}})
+    deck_cache.cache_path(deck).write_bytes(b"\x00not marshal")
+
+    assert deck_cache.read_cache(deck) is None
+    assert deck_cache.load_deck(deck) == {"XXX": {"Name": "deck"}}
+    assert deck_cache.read_cache(deck) == {"XXX": {"Name": "deck"}}
@@ -0,0 +1,93 @@
+import json
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from scripts import deck_catalog
+from scripts.deck_catalog import DeckCatalog, entry_info
+
+
+def _write_deck(path, words, **header):
+    payload = {word: {"definition": "", "example": ""} for word in words}
+    payload["XXX"] = {"Name": path.stem, "CurrentNum": 1, "Completed": False, "Learning": False, **header}
+    path.write_text(json.dumps(payload), encoding="utf-8")
+
+
+def test_catalog_rebuilds_only_changed_decks(tmp_path, monkeypatch):
+    first, second = tmp_path / "a.json", tmp_path / "b.json"
+    _write_deck(first, ["osmosis", "argue"])
+    _write_deck(second, ["cinema"], Learning=True)
+    catalog = DeckCatalog(tmp_path / "catalog.json")
+
+    assert sorted(catalog.refresh([first, second])) == [first.as_posix(), second.as_posix()]
+    entry = catalog.get(second)
+    assert entry["card_count"] == 1
+    assert entry_info(entry) == ["b", 1, False, True]
+
+    built = []
+    original = deck_catalog.build_entry
+    monkeypatch.setattr(deck_catalog, "build_entry", lambda path: built.append(path.name) or original(path))
+    reopened = DeckCatalog(tmp_path / "catalog.json")
+    assert reopened.refresh([first, second]) == []
+
+    _write_deck(first, ["osmosis"], Completed=True)
+    stat = first.stat()
+    os.utime(first, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    reopened.refresh([first, second], prune=True)
+
+    assert built == ["a.json"]
+    assert entry_info(reopened.get(first)) == ["a", 1, True, False]
+    assert reopened.get(first)["card_count"] == 1
+
+
+def test_deck_listing_comes_from_the_catalog_until_the_directory_changes(tmp_path, monkeypatch):
+    decks = tmp_path / "decks"
+    decks.mkdir()
+    _write_deck(decks / "a.json", ["osmosis"])
+    (decks / "notes.txt").write_text("", encoding="utf-8")
+    catalog = DeckCatalog(tmp_path / "catalog.json")
+    catalog.refresh([decks / "a.json"])
+
+    assert catalog.list_decks([decks, tmp_path / "missing"]) == [str(decks / "a.json")]
+
+    scans = []
+    original = deck_catalog.os.scandir
+    monkeypatch.setattr(deck_catalog.os, "scandir", lambda path: scans.append(path) or original(path))
+    reopened = DeckCatalog(tmp_path / "catalog.json")
+    assert reopened.list_decks([decks]) == [str(decks / "a.json")]
+    assert scans == []
+
+    (decks / "a.json").unlink()
+    _write_deck(decks / "b.json", ["argue"])
+    stat = decks.stat()
+    os.utime(decks, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert reopened.list_decks([decks]) == [str(decks / "b.json")]
+    assert len(scans) == 1
+    assert reopened.stale([decks / "a.json"]) == [decks / "a.json"]
+    assert (decks / "a.json").as_posix() not in json.loads((tmp_path / "catalog.json").read_text(encoding="utf-8"))["decks"]
+
+
+def test_list_infos_yield_known_decks_first_and_parse_the_rest_in_a_pool(fw, state_file, tmp_path, monkeypatch):
+    monkeypatch.setattr(fw, "DECK_CATALOG_FILE", tmp_path / "deck_catalog.json")
+    paths = []
+    for name in ("known", "new_a", "new_b"):
+        path = tmp_path / f"{name}.json"
+        fw.writeIntoJson([[name, "", ""]], str(path))
+        paths.append(str(path))
+    fw.getListInfo(paths[0])
+    fw.writeListInfo(paths[2], currentNum=4)
+    missing = str(tmp_path / "missing.json")
+
+    results = list(fw.iter_list_infos([*paths, missing]))
+
+    assert results[0] == (0, ["known", 1, False, False])
+    assert sorted(results[1:], key=lambda item: item[0]) == [
+        (1, ["new_a", 1, False, False]),
+        (2, ["new_b", 4, False, False]),
+        (3, None),
+    ]
+    assert fw.DeckCatalog(fw.DECK_CATALOG_FILE).stale(paths) == []
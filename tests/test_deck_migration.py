@@ -0,0 +1,57 @@
+import itertools
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+pytest.importorskip("pandas")
+
+from scripts import FileWork_v3 as fw
+
+
+def test_deck_migration_parses_in_parallel_and_writes_once(state_file, deck_path, tmp_path, monkeypatch):
+    other = tmp_path / "other.json"
+    fw.writeIntoJson([["osmosis", "newer definition", ""], ["cinema", "", ""]], str(other))
+    monkeypatch.setattr(fw, "save_card_state", lambda *a, **k: pytest.fail("per-card save"))
+    calls = []
+    monkeypatch.setattr(fw, "bulk_save_card_states", lambda states, user_id=None: calls.append((user_id, list(states))))
+    seen = []
+
+    updated = fw.migrate_decks_to_state_store(
+        paths=[deck_path, other], jobs=2, progress=lambda done, total, path: seen.append((done, total, path.name))
+    )
+
+    assert updated == [deck_path, other]
+    assert seen == [(1, 2, "deck.json"), (2, 2, "other.json")]
+    [(user_key, states)] = calls
+    assert user_key == fw.DEFAULT_USER_ID
+    assert [state.card_id for state in states] == ["osmosis", "argue", "osmosis", "cinema"]
+    assert states[-2].definition == "newer definition"
+
+
+def test_deck_migration_streams_states_into_one_pass_per_user(state_file, deck_path, tmp_path, monkeypatch):
+    other = tmp_path / "other.json"
+    fw._write_json(other, {"cinema": {"definition": "film", "user_id": "alice"}, "osmosis": {"definition": "newer"}})
+    seen = []
+    real_bulk_save = fw.bulk_save_card_states
+    calls = []
+
+    def recording_bulk_save(states, user_id=None):
+        states = iter(states)
+        first = next(states)
+        calls.append((user_id, first.word, len(seen)))
+        return real_bulk_save(itertools.chain([first], states), user_id=user_id)
+
+    monkeypatch.setattr(fw, "bulk_save_card_states", recording_bulk_save)
+
+    fw.migrate_decks_to_state_store(paths=[deck_path, other], jobs=1, progress=lambda *args: seen.append(args))
+
+    # The first deck was still being read when the write started.
+    assert calls == [(fw.DEFAULT_USER_ID, "osmosis", 0), ("alice", "cinema", 2)]
+    assert fw.load_card_states()["osmosis"].definition == "newer"
+    assert set(fw.load_card_states()) == {"osmosis", "argue"}
+    assert fw.load_card_states("alice")["cinema"].definition == "film"
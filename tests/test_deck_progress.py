@@ -0,0 +1,28 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+pytest.importorskip("pandas")
+
+from scripts import FileWork_v3 as fw
+
+
+def test_deck_progress_is_per_user_and_leaves_the_deck_untouched(state_file, deck_path, monkeypatch):
+    monkeypatch.setattr(fw, "DECK_CATALOG_FILE", state_file.parent / "deck_catalog.json")
+    before = deck_path.read_bytes()
+
+    fw.writeListInfo(str(deck_path), currentNum=7, learning=True)
+    fw.writeListInfo(str(deck_path), completed=True, user_id="alice")
+    fw.writeListInfo(str(deck_path), completed=True, user_id="alice")
+
+    assert deck_path.read_bytes() == before
+    assert fw.getListInfo(str(deck_path)) == ["deck", 7, False, True]
+    assert fw.getListInfo(str(deck_path), user_id="alice") == ["deck", 1, True, False]
+    assert fw.readFromJson(str(deck_path), user_id="alice")[1] == ["deck", 1, True, False]
+    progress_file = state_file.parent / "alice" / fw.PROGRESS_FILENAME
+    assert len(progress_file.read_text(encoding="utf-8").splitlines()) == 1
@@ -0,0 +1,59 @@
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+pytest.importorskip("pandas")
+
+from scripts import FileWork_v3 as fw
+
+
+def test_excel_import_reads_columns_until_the_first_empty_vocab(state_file, tmp_path, monkeypatch):
+    openpyxl = pytest.importorskip("openpyxl")
+    folder = tmp_path / "lists"
+    folder.mkdir()
+    for name, rows in (("a.xlsx", [["osmosis", "渗透", None], ["argue", None, "They argue."], [None, "x", "x"], ["late", "", ""]]),
+                       ("b.xlsx", [])):
+        workbook = openpyxl.Workbook()
+        workbook.active.append(["Notes", "Vocab:", "Translation:", "Example sentence:"])
+        for row in rows:
+            workbook.active.append([None, *row])
+        workbook.save(folder / name)
+
+    expected = [["osmosis", "渗透", ""], ["argue", "", "They argue."]]
+    assert fw.read_excel_vocab(folder / "a.xlsx") == expected
+    assert fw.read_excel_vocab(folder / "a.xlsx", streaming=True) == expected
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(fw, "REPO_ROOT", tmp_path)
+    (tmp_path / "res" / "Vocab List").mkdir(parents=True)
+    created = fw.importFromExcel("lists", jobs=2)
+
+    decks = {Path(path).name: fw.readFromJson(path)[0] for path in created}
+    assert [card.word for card in decks["a.xlsx.json"]] == ["osmosis", "argue"]
+    assert decks["b.xlsx.json"][0].word == "This vocab list is empty"
+
+
+def test_excel_readers_render_cells_identically(tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    path = tmp_path / "numbers.xlsx"
+    workbook = openpyxl.Workbook()
+    workbook.active.append(["Vocab:", "Translation:", "Example sentence:"])
+    for row in (["NA", "N/A", 1], [7, 2.0, 1.5], ["two", None, datetime(2024, 1, 2)], ["null", True, " x "], [None, "after", None]):
+        workbook.active.append(row)
+    workbook.save(path)
+
+    rows = fw.read_excel_vocab(path)
+
+    assert rows == fw.read_excel_vocab(path, streaming=True)
+    assert rows == [
+        ["NA", "N/A", "1"],
+        ["7", "2", "1.5"],
+        ["two", "", "2024-01-02 00:00:00"],
+        ["null", "True", " x "],
+    ]
@@ -3,12 +3,14 @@ from datetime import datetime, timedelta, timezone
 import sys
 from pathlib import Path
 
+import numpy as np
 import pytest
 
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
+from scripts import fsrs_engine
 from scripts.card_state import CardState
 from scripts.fsrs_engine import load_weights, predict_R, review
 
@@ -50,3 +52,68 @@ def test_review_updates_state_and_logs_metrics():
     assert diagnostics["success"] is True
     assert diagnostics["before_state"].word == state.word
     assert diagnostics["after_state"].word == state.word
+
+
+def _scalar_schedule(stability, difficulty, elapsed, grade, config):
+    rating = {1: "again", 2: "hard", 3: "good", 4: "easy"}[grade]
+    d = difficulty if difficulty > 0 else fsrs_engine.init_difficulty("good", config)
+    s = stability if stability > 0 else fsrs_engine.init_stability("good", config)
+    r = predict_R(s, elapsed, config)
+    if rating == "again":
+        new_s = fsrs_engine.next_forget_stability(d, s, r, config)
+    else:
+        new_s = fsrs_engine.next_recall_stability(d, s, r, rating, config)
+    new_d = fsrs_engine.next_difficulty(d, rating, config)
+    return r, new_s, new_d, fsrs_engine.next_interval(new_s, config)
+
+
+def test_batch_kernels_match_scalar_rounding_exactly():
+    config = load_weights("fsrs_v1")
+    rng = np.random.default_rng(2024)
+    size = 4000
+    # Random cards, plus same-day reviews of 3-decimal stabilities whose new
+    # stability lands exactly on a rounding tie (0.155 -> 0.15 or 0.16).
+    stability = np.concatenate([
+        np.where(rng.random(size) < 0.1, 0.0, np.round(rng.uniform(0.0, 400.0, size), 2)),
+        np.round(np.arange(100, 1100) / 1000, 3),
+    ])
+    difficulty = np.concatenate([
+        np.where(rng.random(size) < 0.1, 0.0, np.round(rng.uniform(1.0, 10.0, size), 2)),
+        np.full(1000, 5.0),
+    ])
+    elapsed = np.concatenate([rng.uniform(0.0, 500.0, size), np.zeros(1000)])
+    grades = rng.integers(1, 5, size + 1000)
+
+    result = fsrs_engine.review_batch(stability, difficulty, elapsed, grades, config)
+
+    for index in range(len(grades)):
+        r, new_s, new_d, interval = _scalar_schedule(
+            float(stability[index]), float(difficulty[index]), float(elapsed[index]), int(grades[index]), config
+        )
+        assert result["stability"][index] == new_s
+        assert result["difficulty"][index] == new_d
+        assert result["interval_days"][index] == interval
+        assert result["success"][index] == (grades[index] != 1)
+        assert result["retrievability"][index] == pytest.approx(r, rel=1e-12)
+
+    assert fsrs_engine.next_interval_batch(result["stability"], config).tolist() == [
+        fsrs_engine.next_interval(float(value), config) for value in result["stability"]
+    ]
+    assert fsrs_engine.predict_R_batch(stability, elapsed, config) == pytest.approx(
+        [predict_R(float(s), float(e), config) for s, e in zip(stability, elapsed)], rel=1e-12
+    )
+
+
+def test_review_batch_agrees_with_review():
+    config = load_weights("fsrs_v1")
+    now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    state = CardState("osmosis", "", "", stability=3.5, difficulty=4.0, last_review_at=now - timedelta(days=2))
+
+    updated, diagnostics = review(state, "hard", now, weights=config)
+    batch = fsrs_engine.review_batch([3.5], [4.0], [2.0], ["hard"], config)
+
+    assert batch["stability"][0] == updated.stability
+    assert batch["difficulty"][0] == updated.difficulty
+    assert batch["interval_days"][0] == diagnostics["interval_days"]
+    with pytest.raises(ValueError):
+        fsrs_engine.review_batch([1.0], [5.0], [1.0], [5], config)
@@ -0,0 +1,50 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from scripts import card_state as card_state_module
+from scripts.card_state import CardState
+from scripts.history_store import CardHistoryStore
+
+
+def _entries(*numbers):
+    return [{"n": n} for n in numbers]
+
+
+def test_appends_do_not_read_the_archive_and_repeats_are_skipped_on_read(tmp_path, monkeypatch):
+    path = tmp_path / "card_history.jsonl"
+    store = CardHistoryStore(path)
+    loads = []
+    original = CardHistoryStore._ensure_loaded
+    monkeypatch.setattr(CardHistoryStore, "_ensure_loaded", lambda self: loads.append(1) or original(self))
+
+    assert store.extend_many([("c1", 0, _entries(0, 1)), ("c2", 0, _entries(0))]) == 3
+    assert store.extend_many([("c1", 0, _entries(0, 1)), ("c1", 2, _entries(2))]) == 3
+    assert loads == []
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 4
+
+    assert store.get("c1") == _entries(0, 1, 2)
+    store.extend_many([("c1", 3, _entries(3))])
+    assert store.get("c1") == _entries(0, 1, 2, 3)
+    assert CardHistoryStore(path).get("c1") == _entries(0, 1, 2, 3)
+
+
+def test_history_beyond_window_moves_to_history_store(fw, state_file, monkeypatch):
+    monkeypatch.setattr(card_state_module, "HISTORY_WINDOW", 3)
+    state = CardState("osmosis", "", "", history=[{"n": i} for i in range(5)])
+    snapshot = state.replace()
+    fw.save_card_state(snapshot)
+    grown = state.replace(history=state.history + [{"n": 5}])
+    fw.save_card_state(grown)
+
+    assert len(snapshot.history) == 5 and len(grown.history) == 6
+    assert grown.history_offset == 0
+    stored = fw.load_card_states()["osmosis"]
+
+    assert [entry["n"] for entry in stored.history] == [3, 4, 5]
+    assert stored.history_offset == 3
+    assert [entry["n"] for entry in stored.full_history()] == list(range(6))
+    assert [entry["n"] for entry in fw.load_card_history("osmosis")] == list(range(6))
@@ -0,0 +1,29 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+pytest.importorskip("pandas")
+
+from scripts import FileWork_v3 as fw
+from scripts.card_state import CardState
+
+
+def test_iter_deck_streams_cards_with_stored_state(state_file, tmp_path, monkeypatch):
+    deck = tmp_path / "big.json"
+    fw.writeIntoJson([[f"w{i}", f"def {i} é", ""] for i in range(300)], str(deck))
+    fw.save_card_state(CardState("w150", "", "", stability=6.0))
+    monkeypatch.setattr(fw, "_DECK_READ_CHUNK", 97)
+
+    streamed = fw.iter_deck(str(deck), batch_size=16)
+    first = next(streamed)
+    cards = [first, *streamed]
+
+    expected, _ = fw.readFromJson(str(deck))
+    assert [card.word for card in cards] == [card.word for card in expected]
+    assert cards[150].stability == 6.0
+    assert cards[299].definition == "def 299 é"
@@ -0,0 +1,37 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+pytest.importorskip("pandas")
+
+from scripts import FileWork_v3 as fw
+from scripts.card_state import CardState
+
+
+def test_review_logs_are_delta_encoded_and_expand_on_read(state_file, monkeypatch):
+    before = CardState("osmosis", "passive transport", "", history=[{"grade": "good"}] * 20)
+    after = before.replace(stability=4.0, repetitions=1, phase="review")
+    fw.save_card_state(after)
+    entry = {
+        "user_id": "default", "card_id": "osmosis", "grade": "good", "interval_days": 4,
+        "success": True, "w_version": "fsrs_v1", "before_state": before, "after_state": after,
+    }
+    stored = fw.append_review_log(entry)
+
+    assert "before_state" not in stored
+    assert stored["delta"] == {"stability": 4.0, "phase": "review", "repetitions": 1}
+    expanded = next(fw.iter_review_log(expand=True))
+    assert expanded["after_state"]["stability"] == 4.0
+    assert expanded["before_state"]["phase"] == "new"
+    assert expanded["after_state"]["definition:"] == "passive transport"
+
+    monkeypatch.setattr(fw, "LOG_FORMAT", "full")
+    fw.append_review_log(entry)
+    monkeypatch.setattr(fw, "LOG_FORMAT", "delta")
+    assert fw.convert_review_logs() == 1
+    assert all("delta" in record for record in fw.iter_review_log())
@@ -0,0 +1,39 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from scripts import migrate_fsrs_fields
+
+
+def test_files_are_migrated_on_a_pool_atomically_and_only_once(tmp_path):
+    paths = []
+    for index in range(3):
+        path = tmp_path / f"deck{index}.json"
+        payload = {"争论": {"definition:": "[v.] 争论"}, "ref": {"ref": "argue"}, "XXX": {"Name": path.stem}}
+        path.write_text(json.dumps(payload), encoding="utf-8")
+        paths.append(path)
+
+    assert migrate_fsrs_fields.migrate_files(paths, jobs=2) == paths
+
+    text = paths[0].read_text(encoding="utf-8")
+    assert "争论" in text
+    assert "\n" not in text
+    migrated = json.loads(text)
+    assert migrated["争论"]["history"] == [] and migrated["争论"]["due"] is None
+    assert migrated["ref"] == {"ref": "argue"}
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["deck0.json", "deck1.json", "deck2.json"]
+    assert migrate_fsrs_fields.migrate_files(paths, jobs=2) == []
+
+
+def test_negative_job_counts_are_rejected():
+    assert migrate_fsrs_fields.parse_args(["-j", "0"]).jobs == 0
+    with pytest.raises(SystemExit):
+        migrate_fsrs_fields.parse_args(["--jobs", "-2"])
+    with pytest.raises(ValueError):
+        migrate_fsrs_fields.migrate_files([], jobs=-1)
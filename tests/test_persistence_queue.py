@@ -0,0 +1,113 @@
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+pytest.importorskip("pandas")
+
+from scripts.card_state import CardState
+from scripts import persistence_queue
+from scripts.persistence_queue import WriteBehindQueue
+
+
+class _Recorder:
+    def __init__(self):
+        self.state_batches = []
+        self.log_batches = []
+
+    def save_states(self, states, *, user_id=None):
+        self.state_batches.append((user_id, [state.stability for state in states]))
+
+    def append_logs(self, entries):
+        self.log_batches.append(list(entries))
+
+
+def _log(card_id):
+    return {"user_id": "default", "card_id": card_id, "grade": "good"}
+
+
+def test_flush_groups_pending_grades():
+    recorder = _Recorder()
+    queue = WriteBehindQueue(
+        max_batch=100,
+        max_delay=60,
+        save_states=recorder.save_states,
+        append_logs=recorder.append_logs,
+    )
+    card = CardState("osmosis", "", "", stability=1.0)
+    queue.enqueue(card, _log("osmosis"))
+    card.stability = 2.0
+    queue.enqueue(card, _log("osmosis"))
+    queue.enqueue(CardState("argue", "", "", stability=5.0), _log("argue"), user_id="alice")
+
+    assert recorder.state_batches == []
+    assert queue.flush() == 3
+    assert sorted(recorder.state_batches) == [("alice", [5.0]), ("default", [2.0])]
+    assert len(recorder.log_batches) == 1 and len(recorder.log_batches[0]) == 3
+    assert queue.flush() == 0
+    queue.close()
+
+
+def test_size_threshold_and_close_flush():
+    recorder = _Recorder()
+    queue = WriteBehindQueue(
+        max_batch=2,
+        max_delay=60,
+        save_states=recorder.save_states,
+        append_logs=recorder.append_logs,
+    )
+    queue.enqueue(CardState("a", "", ""), _log("a"))
+    queue.enqueue(CardState("b", "", ""), _log("b"))
+    deadline = time.monotonic() + 5
+    while not recorder.log_batches and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(recorder.log_batches) == 1
+
+    queue.enqueue(CardState("c", "", ""), _log("c"))
+    queue.close()
+    assert [len(batch) for batch in recorder.log_batches] == [2, 1]
+
+
+def test_enqueued_snapshot_is_isolated_from_later_in_place_changes():
+    written = []
+    queue = WriteBehindQueue(
+        max_batch=100,
+        max_delay=60,
+        save_states=lambda states, user_id=None: written.extend(states),
+        append_logs=lambda entries: written.extend(entries),
+    )
+    card = CardState("osmosis", "", "", history=[{"grade": "good"}], custom_data={"seen": 1})
+    log = {"user_id": "default", "card_id": "osmosis", "grade": "good", "extra": {"n": 1}}
+    queue.enqueue(card, log)
+    card.history.append({"grade": "again"})
+    card.history[0]["grade"] = "hard"
+    card.custom_data["seen"] = 2
+    log["extra"]["n"] = 2
+
+    assert queue.pending_states(["osmosis"])["osmosis"].history == [{"grade": "good"}]
+    queue.flush()
+    state, entry = written
+    assert state.history == [{"grade": "good"}]
+    assert state.custom_data == {"seen": 1}
+    assert entry["extra"] == {"n": 1}
+    queue.close()
+
+
+def test_deck_reads_see_grades_still_waiting_in_the_default_queue(fw, state_file, deck_path, monkeypatch):
+    queue = WriteBehindQueue(max_batch=100, max_delay=60)
+    monkeypatch.setattr(persistence_queue, "_DEFAULT_QUEUE", queue)
+    try:
+        queue.enqueue(CardState("osmosis", "", "", stability=2.31, phase="review"))
+
+        cards, _ = fw.readFromJson(str(deck_path))
+        assert [(card.word, card.stability, card.definition) for card in cards][0] == ("osmosis", 2.31, "passive transport")
+        assert fw.load_card_states_for(["osmosis"])["osmosis"].stability == 2.31
+        assert "osmosis" not in fw.load_card_states()
+    finally:
+        queue.close()
+    assert fw.load_card_states()["osmosis"].stability == 2.31
@@ -0,0 +1,100 @@
+import gzip
+import json
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from scripts.review_log import SegmentedReviewLog
+
+
+def _entry(card_id, logged_at):
+    return {"user_id": "default", "card_id": card_id, "grade": "good", "logged_at": logged_at}
+
+
+def test_segments_rotate_and_queries_skip_unrelated_segments(tmp_path, monkeypatch):
+    log = SegmentedReviewLog(tmp_path)
+    log.append(
+        [
+            _entry("c1", "2024-01-05T10:00:00Z"),
+            _entry("c2", "2024-02-10T10:00:00Z"),
+            _entry("c1", "2024-03-01T08:00:00Z"),
+        ]
+    )
+    current = datetime.now(tz=timezone.utc).strftime("%Y-%m")
+    log.append([_entry("c3", f"{current}-01T00:00:00Z")])
+
+    assert (tmp_path / "review_log-2024-01.jsonl.gz").exists()
+    assert (tmp_path / f"review_log-{current}.jsonl").exists()
+    assert log.segment_index("2024-02")["card_ids"] == {"c2"}
+
+    opened = []
+    original = SegmentedReviewLog._open_segment
+    monkeypatch.setattr(
+        SegmentedReviewLog,
+        "_open_segment",
+        lambda self, path: opened.append(path.name) or original(self, path),
+    )
+    found = list(log.query(card_id="c1", since="2024-02-01T00:00:00Z"))
+    recent = list(log.query(since=f"{current}-01T00:00:00Z"))
+
+    assert [entry["logged_at"] for entry in found] == ["2024-03-01T08:00:00Z"]
+    assert [entry["card_id"] for entry in recent] == ["c3"]
+    assert opened == ["review_log-2024-03.jsonl.gz", f"review_log-{current}.jsonl"]
+
+
+def test_legacy_log_is_split_and_late_entries_reach_closed_segments(tmp_path):
+    legacy = tmp_path / "review_log.jsonl"
+    legacy.write_text(json.dumps(_entry("c1", "2023-12-31T23:00:00Z")) + "\n", encoding="utf-8")
+    log = SegmentedReviewLog(tmp_path, legacy_path=legacy)
+
+    log.append([_entry("c9", "2023-12-01T00:00:00Z")])
+
+    assert not legacy.exists()
+    assert (tmp_path / "review_log-2023-12.jsonl.gz").exists()
+    assert [entry["card_id"] for entry in log.query(until="2023-12-31T00:00:00Z")] == ["c9"]
+    assert log.segment_index("2023-12")["count"] == 2
+
+
+def test_appends_extend_the_index_and_rotate_once_per_month(tmp_path, monkeypatch):
+    log = SegmentedReviewLog(tmp_path)
+    current = datetime.now(tz=timezone.utc).strftime("%Y-%m")
+    log.append([_entry("c1", f"{current}-01T00:00:00Z")])
+    index_path = log.index_path(current)
+    before = index_path.read_text(encoding="utf-8")
+
+    rotations = []
+    original = SegmentedReviewLog.rotate
+    monkeypatch.setattr(SegmentedReviewLog, "rotate", lambda self, now=None: rotations.append(now) or original(self, now))
+    log.append([_entry("c1", f"{current}-01T01:00:00Z"), _entry("c2", f"{current}-01T02:00:00Z")])
+    log.append([_entry("c1", f"{current}-01T03:00:00Z")])
+
+    assert rotations == []
+    lines = index_path.read_text(encoding="utf-8").splitlines()
+    assert index_path.read_text(encoding="utf-8").startswith(before)
+    assert [json.loads(line)["card_ids"] for line in lines[2:]] == [["c2"], []]
+    reopened = SegmentedReviewLog(tmp_path)
+    assert reopened.segment_index(current)["count"] == 4
+    assert reopened.segment_index(current)["card_ids"] == {"c1", "c2"}
+
+
+def test_plain_and_compressed_segments_of_one_month_are_merged(tmp_path):
+    log = SegmentedReviewLog(tmp_path)
+    plain = log.segment_path("2024-01")
+    compressed = log.segment_path("2024-01", compressed=True)
+    first = json.dumps(_entry("c1", "2024-01-05T10:00:00Z")) + "\n"
+    second = json.dumps(_entry("c2", "2024-01-06T10:00:00Z")) + "\n"
+    with gzip.open(compressed, "wt", encoding="utf-8") as handle:
+        handle.write(first)
+    plain.write_text(second, encoding="utf-8")
+
+    assert [entry["card_id"] for entry in log.query()] == ["c1", "c2"]
+    assert not plain.exists()
+
+    # A rotation that stopped after replacing the gzip file but before
+    # deleting the plain segment must not duplicate entries.
+    plain.write_text(second, encoding="utf-8")
+    assert [entry["card_id"] for entry in SegmentedReviewLog(tmp_path).query()] == ["c1", "c2"]
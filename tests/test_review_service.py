@@ -0,0 +1,46 @@
+import asyncio
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+pytest.importorskip("pandas")
+
+from scripts import review_service
+from scripts.card_state import CardState
+
+
+class _RecordingQueue:
+    def __init__(self):
+        self.entries = []
+        self.threads = set()
+
+    def enqueue(self, state, log_entry=None, *, user_id=None):
+        self.threads.add(threading.current_thread().name)
+        self.entries.append((user_id, state.card_id, log_entry["grade"]))
+
+    def flush(self):
+        return len(self.entries)
+
+
+def test_sync_grades_reuse_one_session_loop_and_offload_writes(monkeypatch):
+    queue = _RecordingQueue()
+    monkeypatch.setattr(review_service, "get_default_queue", lambda: queue)
+    monkeypatch.setattr(asyncio, "run", None)
+    session = review_service.ReviewSession()
+    monkeypatch.setattr(review_service, "_SESSION", session)
+    try:
+        first, _ = review_service.submit_grade_sync(CardState("osmosis", "", ""), "good")
+        review_service.submit_grade_sync(first, "again", user_id="alice")
+
+        assert review_service.get_session() is session
+        assert queue.entries == [("default", "osmosis", "good"), ("alice", "osmosis", "again")]
+        assert all(name.startswith("review-io") for name in queue.threads)
+        assert review_service.flush() == 2
+    finally:
+        session.close()
@@ -0,0 +1,89 @@
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from scripts.sqlite_store import SQLiteStateStore
+
+
+def _key(record):
+    return record["user_id"], record["card_id"]
+
+
+def _record(card_id, phase="review", due_at="2024-01-02T00:00:00Z", user_id="default"):
+    return {
+        "user_id": user_id,
+        "card_id": card_id,
+        "word": card_id,
+        "state": {"phase": phase, "due_at": due_at, "stability": 1.0},
+    }
+
+
+def test_upsert_and_indexed_queries(tmp_path):
+    store = SQLiteStateStore(tmp_path / "state.sqlite3", key=_key)
+    store.put_many(
+        [
+            _record("osmosis"),
+            _record("argue", phase="learning", due_at="2024-03-01T00:00:00Z"),
+            _record("cinema", user_id="alice"),
+        ]
+    )
+    store.put(_record("osmosis", due_at="2024-02-01T00:00:00Z"))
+
+    assert len(store) == 3
+    assert store.get(("default", "osmosis"))["state"]["due_at"] == "2024-02-01T00:00:00Z"
+    assert set(store.get_many([("default", "argue"), ("alice", "cinema"), ("alice", "x")])) == {
+        ("default", "argue"),
+        ("alice", "cinema"),
+    }
+    due = store.due_records("default", "2024-02-15T00:00:00Z", phases=["review"])
+    assert [record["card_id"] for record in due] == ["osmosis"]
+    assert len(store.records_for_user("alice")) == 1
+    store.put({**_record("c-9"), "word": "ornament"})
+    assert {record["card_id"] for record in store.find("default", ["argue", "ornament"])} == {"argue", "c-9"}
+    store.close()
+
+
+def test_import_jsonl_keeps_latest_state_and_all_logs(tmp_path):
+    state_path = tmp_path / "card_state.jsonl"
+    log_path = tmp_path / "review_log.jsonl"
+    state_path.write_text(
+        "\n".join(json.dumps(_record("osmosis", phase=phase)) for phase in ("learning", "review")),
+        encoding="utf-8",
+    )
+    log_path.write_text(
+        json.dumps({"user_id": "default", "card_id": "osmosis", "grade": "good"}) + "\n",
+        encoding="utf-8",
+    )
+
+    store = SQLiteStateStore(tmp_path / "state.sqlite3", key=_key)
+    assert store.import_jsonl(state_path, log_path) == (2, 1)
+    assert store.get(("default", "osmosis"))["state"]["phase"] == "review"
+    assert [entry["grade"] for entry in store.iter_logs(card_id="osmosis")] == ["good"]
+    store.close()
+
+
+def test_time_bounds_compare_instants_not_iso_text(tmp_path):
+    store = SQLiteStateStore(tmp_path / "state.sqlite3", key=_key)
+    logged = [
+        "2024-01-02T00:00:00Z",
+        "2024-01-02T00:00:00.123456Z",
+        "2024-01-02T01:00:00+01:00",
+        "2024-01-02T00:00:01.5+00:00",
+    ]
+    store.append_logs({"user_id": "default", "card_id": f"c{n}", "logged_at": at} for n, at in enumerate(logged))
+
+    def cards(**bounds):
+        return [entry["card_id"] for entry in store.iter_logs(**bounds)]
+
+    assert cards(since="2024-01-02T00:00:00.000000+00:00", until="2024-01-02T00:00:00Z") == ["c0", "c2"]
+    assert cards(since="2024-01-02T00:00:00.1Z", until="2024-01-02T00:00:01.5Z") == ["c1", "c3"]
+    assert cards(until="2024-01-01T23:59:59.999999Z") == []
+
+    store.put(_record("osmosis", due_at="2024-01-02T00:00:00Z"))
+    assert [r["card_id"] for r in store.due_records("default", "2024-01-02T00:00:00.5Z")] == ["osmosis"]
+    assert store.get(("default", "osmosis"))["state"]["due_at"] == "2024-01-02T00:00:00Z"
+    store.close()
@@ -0,0 +1,45 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+pytest.importorskip("pandas")
+
+from scripts import FileWork_v3 as fw
+from scripts.card_state import CardState
+
+
+def test_deck_reads_share_one_state_parse(state_file, deck_path):
+    fw.save_card_state(CardState("osmosis", "", "", stability=3.5))
+    fw.load_card_states()
+    first, _ = fw.readFromJson(str(deck_path))
+    cached = fw._STATE_CACHE.cached(fw.DEFAULT_USER_ID)
+    second, _ = fw.readFromJson(str(deck_path))
+
+    assert fw._STATE_CACHE.cached(fw.DEFAULT_USER_ID) is cached
+    assert second[0].stability == 3.5
+    assert second[0].definition == "passive transport"
+    assert second[0] is not first[0]
+
+    fw.save_card_state(second[1].replace(stability=1.25))
+    updated = fw._STATE_CACHE.cached(fw.DEFAULT_USER_ID)
+    key = (fw.DEFAULT_USER_ID, "osmosis")
+    assert updated[key] is cached[key]
+    assert fw.load_card_states()["argue"].stability == 1.25
+
+
+def test_external_write_invalidates_cache(state_file, deck_path):
+    fw.save_card_state(CardState("osmosis", "", "", stability=3.5))
+    fw.readFromJson(str(deck_path))
+
+    record = fw._state_to_record(CardState("osmosis", "", "", stability=8.0))
+    with (state_file.parent / "default" / state_file.name).open("a", encoding="utf-8") as handle:
+        handle.write(json.dumps(record) + "\n")
+
+    cards, _ = fw.readFromJson(str(deck_path))
+    assert cards[0].stability == 8.0
@@ -0,0 +1,91 @@
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from scripts.card_state import CardState
+from scripts.state_index import StateOffsetIndex
+from scripts.state_store import CardStateStore
+
+
+def _key(record):
+    return record["user_id"], record["card_id"]
+
+
+def _record(card_id, stability, word=None):
+    return {"user_id": "default", "card_id": card_id, "word": word or card_id, "state": {"stability": stability}}
+
+
+def test_lookup_reads_latest_records_and_word_aliases(tmp_path):
+    path = tmp_path / "card_state.jsonl"
+    store = CardStateStore(path, key=_key, background=False)
+    store.put_many([_record("c1", 1.0, word="osmosis"), _record("c2", 2.0)])
+    index = StateOffsetIndex(path, key=_key)
+
+    found = index.lookup([("default", "osmosis"), ("default", "missing")])
+    assert found == {("default", "c1"): _record("c1", 1.0, word="osmosis")}
+
+    store.put(_record("c2", 5.0))
+    scanned_from = index._size
+    assert index.lookup([("default", "c2")])[("default", "c2")]["state"]["stability"] == 5.0
+    assert index._size > scanned_from
+
+
+def test_sidecar_survives_reopen_and_rebuilds_after_compaction(tmp_path):
+    path = tmp_path / "card_state.jsonl"
+    store = CardStateStore(path, key=_key, background=False)
+    for value in range(3):
+        store.put(_record("c1", float(value)))
+    StateOffsetIndex(path, key=_key).refresh()
+
+    lines = (tmp_path / "card_state.jsonl.idx").read_text(encoding="utf-8").splitlines()
+    assert json.loads(lines[-1])["size"] == path.stat().st_size
+
+    reopened = StateOffsetIndex(path, key=_key)
+    assert reopened.refresh() is False
+
+    store.compact()
+    assert reopened.lookup([("default", "c1")])[("default", "c1")]["state"]["stability"] == 2.0
+    assert reopened._entries[("default", "c1")][0] == 0
+
+
+def test_refresh_appends_only_new_offsets_to_the_sidecar(tmp_path):
+    path = tmp_path / "card_state.jsonl"
+    sidecar = tmp_path / "card_state.jsonl.idx"
+    store = CardStateStore(path, key=_key, background=False)
+    store.put_many([_record(f"c{n}", 1.0) for n in range(50)])
+    StateOffsetIndex(path, key=_key).refresh()
+    before = sidecar.read_bytes()
+
+    store.put(_record("c7", 2.0, word="osmosis"))
+    assert StateOffsetIndex(path, key=_key).refresh() is True
+
+    after = sidecar.read_bytes()
+    assert after.startswith(before)
+    delta = json.loads(after[len(before):])
+    assert list(delta["entries"]) == ["default\x1fc7"]
+    assert delta["words"] == {"default\x1fosmosis": "c7"}
+    reopened = StateOffsetIndex(path, key=_key)
+    assert reopened.refresh() is False
+    assert reopened.lookup([("default", "osmosis")])[("default", "c7")]["state"]["stability"] == 2.0
+
+    sidecar.write_bytes(after + b'{"size": 1')
+    torn = StateOffsetIndex(path, key=_key)
+    assert torn.refresh() is False
+    assert len(torn) == 50
+
+
+def test_cold_deck_read_uses_point_lookups(fw, state_file, deck_path):
+    fw.save_card_states([CardState(f"filler{i}", "", "") for i in range(50)])
+    fw.save_card_state(CardState("osmosis", "", "", stability=3.5))
+
+    cards, info = fw.readFromJson(str(deck_path))
+
+    assert fw._STATE_CACHE.cached(fw.DEFAULT_USER_ID) is None
+    assert [card.stability for card in cards] == [3.5, 0.0]
+    assert cards[0].definition == "passive transport"
+    assert info[0] == "deck"
+    assert (state_file.parent / "default" / "card_state.jsonl.idx").exists()
@@ -0,0 +1,30 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+pytest.importorskip("pandas")
+
+from scripts import FileWork_v3 as fw
+from scripts.card_state import CardState
+
+
+def test_load_card_states_for_fetches_only_requested_cards(state_file, monkeypatch):
+    fw.save_card_states(
+        [
+            CardState("osmosis", "", "", card_id="c-1", stability=2.0),
+            CardState("argue", "", "", stability=1.0),
+            CardState("cinema", "", "", stability=9.0),
+        ]
+    )
+    monkeypatch.setattr(fw, "_index_states_for_user", None)
+
+    found = fw.load_card_states_for(["argue", "missing"], ["osmosis"])
+
+    assert set(found) == {"argue", "osmosis"}
+    assert found["osmosis"].card_id == "c-1"
+    assert found["argue"].stability == 1.0
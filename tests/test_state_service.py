@@ -0,0 +1,121 @@
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+pytest.importorskip("pandas")
+
+from scripts import state_service
+from scripts.card_state import CardState
+from scripts.persistence_queue import WriteBehindQueue
+
+
+def test_clients_batch_writes_through_one_server_and_read_them_back(monkeypatch):
+    saved, logged = [], []
+    queue = WriteBehindQueue(
+        max_batch=100,
+        max_delay=60.0,
+        save_states=lambda states, user_id=None: saved.append((user_id, [s.card_id for s in states])),
+        append_logs=lambda entries: logged.extend(entries),
+    )
+    monkeypatch.setattr(state_service.filework, "load_card_states_for", lambda *a, **k: {})
+    server = state_service.StateServer(queue=queue).start()
+    try:
+        game = state_service.connect()
+        ui = state_service.connect(server.address)
+
+        assert game.ping() == "pong"
+        game.save_card_states([CardState("osmosis", "", "", stability=3.0)])
+        ui.save_card_states([CardState("argue", "", "")], user_id="alice")
+        game.append_review_logs(
+            [{"user_id": "default", "card_id": "osmosis", "grade": "good", "interval_days": 1, "success": True, "w_version": "fsrs_v1"}]
+        )
+        with pytest.raises(state_service.StateServiceError):
+            game.append_review_logs([{"card_id": "osmosis"}])
+
+        found = ui.load_card_states_for(["osmosis", "missing"])
+        assert set(found) == {"osmosis"}
+        assert found["osmosis"].stability == 3.0
+        assert saved == []
+
+        assert game.flush() == 2
+        assert sorted(saved) == [("alice", ["argue"]), ("default", ["osmosis"])]
+        assert [entry["card_id"] for entry in logged] == ["osmosis"]
+        game.close()
+        ui.close()
+    finally:
+        server.close()
+        queue.close()
+    assert state_service.ADDRESS_ENV not in os.environ
+
+
+def test_reads_fall_back_to_the_store_once_the_queue_has_flushed(monkeypatch):
+    saved = []
+    queue = WriteBehindQueue(
+        max_batch=100,
+        max_delay=60.0,
+        save_states=lambda states, user_id=None: saved.extend(states),
+        append_logs=lambda entries: None,
+    )
+    store = {}
+    monkeypatch.setattr(
+        state_service.filework,
+        "load_card_states_for",
+        lambda card_ids, words=(), **k: {name: store[name] for name in [*card_ids, *words] if name in store},
+    )
+    server = state_service.StateServer(queue=queue).start(publish=False)
+    try:
+        client = state_service.connect(server.address)
+        client.save_card_states([CardState("osmosis", "", "", card_id="c1", stability=1.0)])
+        assert client.load_card_states_for(["c1"], ["osmosis"])["osmosis"].stability == 1.0
+
+        assert client.flush() == 1
+        assert queue.pending_states(["c1", "osmosis"]) == {}
+        store["c1"] = CardState("osmosis", "", "", card_id="c1", stability=9.0)
+        assert client.load_card_states_for(["c1"])["c1"].stability == 9.0
+        client.close()
+    finally:
+        server.close()
+        queue.close()
+
+
+def test_game_grades_are_reviewed_by_the_server_against_the_latest_state(monkeypatch):
+    saved, logged = [], []
+    queue = WriteBehindQueue(
+        max_batch=100,
+        max_delay=60.0,
+        save_states=lambda states, user_id=None: saved.extend(states),
+        append_logs=lambda entries: logged.extend(entries),
+    )
+    store = {"osmosis": CardState("osmosis", "渗透", "", card_id="c1", stability=4.0, phase="review")}
+    monkeypatch.setattr(
+        state_service.filework,
+        "load_card_states_for",
+        lambda card_ids, words=(), **k: {name: store[name] for name in [*card_ids, *words] if name in store},
+    )
+    server = state_service.StateServer(queue=queue).start(publish=False)
+    try:
+        client = state_service.connect(server.address)
+        played = datetime(2026, 10, 1, tzinfo=timezone.utc)
+        grades = [
+            ("osmosis", "渗透", "again", played),
+            ("argue", "争论", "good", played),
+            ("osmosis", "渗透", "good", played + timedelta(minutes=1)),
+        ]
+        assert client.grade_cards(grades) == 3
+        client.flush()
+        client.close()
+    finally:
+        server.close()
+        queue.close()
+
+    by_word = {state.word: state for state in saved}
+    assert (by_word["osmosis"].card_id, by_word["osmosis"].lapses, by_word["osmosis"].repetitions) == ("c1", 1, 2)
+    assert (by_word["argue"].definition, by_word["argue"].repetitions) == ("争论", 1)
+    assert [(entry["card_id"], entry["grade"]) for entry in logged] == [("c1", "again"), ("argue", "good"), ("c1", "good")]
@@ -0,0 +1,93 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from scripts.card_state import CardState
+from scripts.state_store import CardStateStore
+
+
+def _key(record):
+    return record["user_id"], record["card_id"]
+
+
+def _record(card_id, stability, user_id="default"):
+    return {"user_id": user_id, "card_id": card_id, "word": card_id, "state": {"stability": stability}}
+
+
+def test_put_appends_and_latest_record_wins(tmp_path):
+    path = tmp_path / "card_state.jsonl"
+    store = CardStateStore(path, key=_key, background=False)
+    store.put(_record("osmosis", 1.0))
+    store.put(_record("osmosis", 2.5))
+    store.put(_record("argue", 4.0))
+
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 3
+    assert store.get(("default", "osmosis"))["state"]["stability"] == 2.5
+
+    reopened = CardStateStore(path, key=_key, background=False)
+    assert len(reopened) == 2
+    assert reopened.get(("default", "osmosis"))["state"]["stability"] == 2.5
+
+
+def test_compact_keeps_one_line_per_key(tmp_path):
+    path = tmp_path / "card_state.jsonl"
+    store = CardStateStore(path, key=_key, background=False)
+    for value in range(5):
+        store.put_many([_record("osmosis", float(value)), _record("argue", float(value), "alice")])
+    assert store.garbage == 8
+
+    store.compact()
+
+    assert store.garbage == 0
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 2
+    reopened = CardStateStore(path, key=_key, background=False)
+    assert reopened.get(("alice", "argue"))["state"]["stability"] == 4.0
+
+
+def test_background_compaction_triggers_on_garbage(tmp_path):
+    path = tmp_path / "card_state.jsonl"
+    store = CardStateStore(path, key=_key, compact_min_garbage=4, compact_ratio=1.0)
+    for value in range(10):
+        store.put(_record("osmosis", float(value)))
+    store.close()
+
+    assert path.read_text(encoding="utf-8").count("\n") == 1
+    assert store.get(("default", "osmosis"))["state"]["stability"] == 9.0
+
+
+def test_bulk_upsert_merges_unsorted_updates_through_spilled_runs(tmp_path):
+    path = tmp_path / "card_state.jsonl"
+    store = CardStateStore(path, key=_key, background=False)
+    store.put_many([_record("c3", 1.0), _record("c1", 1.0), _record("c3", 2.0)])
+
+    updates = [_record(f"c{i}", float(i)) for i in (9, 2, 5, 1, 7, 2)]
+    updates[-1] = _record("c2", 20.0)
+    count = store.bulk_upsert(iter(updates), run_size=2)
+
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert count == len(lines) == 6
+    assert [_key(record)[1] for record in store.records()] == ["c1", "c2", "c3", "c5", "c7", "c9"]
+    assert store.get(("default", "c2"))["state"]["stability"] == 20.0
+    assert store.get(("default", "c3"))["state"]["stability"] == 2.0
+    assert list(tmp_path.glob("state-run-*")) == []
+
+    store.bulk_upsert([_record("c0", 0.5), _record("c4", 4.0)], presorted=True)
+    assert len(store) == 8
+
+
+def test_bulk_save_streams_states_into_the_store(fw, state_file):
+    fw.save_card_state(CardState("osmosis", "", "", stability=1.0))
+    fw.load_card_states()
+
+    written = fw.bulk_save_card_states(
+        (CardState(f"w{i:03d}", "", "", stability=float(i)) for i in range(40)), run_size=7
+    )
+
+    assert written == 40
+    assert fw._STATE_CACHE.cached(fw.DEFAULT_USER_ID) is None
+    states = fw.load_card_states()
+    assert len(states) == 41
+    assert states["w039"].stability == 39.0
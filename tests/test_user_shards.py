@@ -0,0 +1,47 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+pytest.importorskip("pandas")
+
+from scripts import FileWork_v3 as fw
+from scripts.card_state import CardState
+
+
+def test_states_and_logs_are_sharded_per_user(state_file):
+    fw.save_card_states(
+        [CardState("osmosis", "", "", stability=1.0), CardState("argue", "", "", user_id="alice")]
+    )
+    fw.append_review_logs(
+        [
+            {"user_id": "alice", "card_id": "argue", "grade": "good", "interval_days": 1, "success": True, "w_version": "fsrs_v1"},
+        ]
+    )
+
+    assert (state_file.parent / "default" / "card_state.jsonl").exists()
+    assert (state_file.parent / "alice" / "card_state.jsonl").exists()
+    assert [entry["card_id"] for entry in fw.iter_review_log("alice")] == ["argue"]
+    assert list(fw.iter_review_log()) == []
+    assert set(fw.load_card_states("alice")) == {"argue"}
+    assert set(fw.load_card_states()) == {"osmosis"}
+
+
+def test_legacy_shared_files_are_split_on_first_use(state_file):
+    state_file.parent.mkdir(parents=True)
+    legacy = [
+        fw._state_to_record(CardState("osmosis", "", "", stability=2.0)),
+        fw._state_to_record(CardState("argue", "", "", user_id="alice")),
+    ]
+    legacy[0].pop("user_id")
+    state_file.write_text("".join(json.dumps(record) + "\n" for record in legacy), encoding="utf-8")
+
+    assert fw.load_card_states()["osmosis"].stability == 2.0
+    assert set(fw.load_card_states("alice")) == {"argue"}
+    assert not state_file.exists()
+    assert state_file.with_name("card_state.jsonl.migrated").exists()